@@ -10,11 +10,24 @@ ROOT_DIR = os.path.dirname(os.path.dirname(__file__))  # parent of /app
 if ROOT_DIR not in sys.path:
     sys.path.append(ROOT_DIR)
 
-from src.data_preprocessing import read_superstore_csv
-from src.feature_engineering import add_basic_features
+from src.data_preprocessing import load_superstore_dataset, ingest_superstore_files, resolve_superstore_files
+from src.feature_engineering import compact_dataframe, memory_report
+from src.filter_index import get_filter_index, global_filter_spec
+from src.parquet_dataset import dataset_version, open_dataset, is_partitioned_dataset
+from src.upload_cache import UploadCache, content_hash, upload_key
+from src.exports import EXPORT_FORMATS, export_key, frame_chunks, shared_export_cache
+from src.diagnostics_panel import render_diagnostics_panel
 
 st.set_page_config(page_title="Superstore Dashboard", layout="wide")
 
+# File tunggal, folder berisi banyak CSV (mis. satu per bulan/region), atau pola glob
+DATA_SOURCE = os.environ.get("SUPERSTORE_DATA", "data/raw/USSuperstoreData.csv")
+# Dataset Parquet terpartisi (python -m src.parquet_dataset): data tidak dimuat ke session,
+# filter di-push ke pyarrow dan agregat dihitung per fragmen (untuk data > RAM)
+DATASET_PATH = os.environ.get("SUPERSTORE_DATASET", "")
+# Batas memori cache upload (frame hasil parse, dibagi semua sesi)
+UPLOAD_CACHE_MB = int(os.environ.get("SUPERSTORE_UPLOAD_CACHE_MB", "1024"))
+
 # --------------------------- Komponen UI --------------------------------------
 def kpi_card(title: str, value: str, bg: str = "#F1F1F1", fg: str = "#1F2937"):
     """Kartu KPI sederhana dengan warna latar dan teks kustom."""
@@ -40,47 +53,90 @@ def kpi_card(title: str, value: str, bg: str = "#F1F1F1", fg: str = "#1F2937"):
 # ------------------------------ DATA LOADER -----------------------------------
 @st.cache_data(show_spinner=False)
 def load_default_data():
-    path = "data/raw/USSuperstoreData.csv"
-    if Path(path).exists():
-        df = read_superstore_csv(path)      # sudah menangani ; dan desimal ,
-        df = add_basic_features(df)
-        return df
-    return pd.DataFrame()
+    path = DATA_SOURCE
+    if Path(path).is_file():
+        # sudah menangani ; dan desimal ,; memakai cache Parquet bila CSV tidak berubah
+        df = load_superstore_dataset(path)
+    elif resolve_superstore_files(path):
+        # banyak file: diparse paralel (process pool), kosakata kategori disatukan, duplikat Row ID dibuang
+        df, _ = ingest_superstore_files(path)
+    else:
+        return pd.DataFrame(), pd.DataFrame()
+    df_compact = compact_dataframe(df)   # kategori + tipe numerik ringkas untuk session
+    return df_compact, memory_report(df, df_compact)
+
+@st.cache_resource(show_spinner=False)
+def get_upload_cache() -> UploadCache:
+    # Satu cache per proses: file identik (juga dari user lain) cukup diparse sekali
+    return UploadCache(max_bytes=UPLOAD_CACHE_MB * 2 ** 20)
+
+def load_uploads(files) -> tuple:
+    """(frame ringkas, memory report, laporan ingest) untuk file upload, lewat cache hash isi file."""
+    # file_id tetap selama file tidak diganti: rerun tidak membaca & meng-hash ulang isinya
+    known = st.session_state.get("upload_hashes", {})
+    hashes = {f.file_id: known.get(f.file_id) or content_hash(f.getvalue()) for f in files}
+    st.session_state["upload_hashes"] = hashes
+
+    def parse():
+        df_up, ingest = ingest_superstore_files([f.getvalue() for f in files])
+        df_compact = compact_dataframe(df_up)
+        return df_compact, memory_report(df_up, df_compact), ingest
+
+    key = upload_key([hashes[f.file_id] for f in files])
+    st.session_state["data_key"] = f"upload:{key}"
+    return get_upload_cache().get_or_load(key, parse)
 
 def apply_global_filters(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty:
         return df
-    gf = st.session_state.get("global_filters", {})
-    out = df.copy()
-    if "Order Date" in out.columns and gf.get("date_range"):
-        start, end = pd.to_datetime(gf["date_range"][0]), pd.to_datetime(gf["date_range"][1])
-        out = out[out["Order Date"].between(start, end)]
-    if "Region" in out.columns and gf.get("regions"):
-        out = out[out["Region"].isin(gf["regions"])]
-    return out
+    # Index dibangun sekali per dataset; filter hanya memilih posisi baris (tanpa copy)
+    index = get_filter_index(df, st.session_state)
+    date_range, filters = global_filter_spec(st.session_state.get("global_filters", {}))
+    return index.take(df, index.select(date_range, filters))
 
 # ------------------------------ STATE SETUP -----------------------------------
 if "data_df" not in st.session_state:
-    st.session_state["data_df"] = load_default_data()
+    if DATASET_PATH and is_partitioned_dataset(DATASET_PATH):
+        st.session_state["dataset_path"] = DATASET_PATH
+        st.session_state["data_df"], st.session_state["memory_report"] = pd.DataFrame(), pd.DataFrame()
+    else:
+        st.session_state["data_df"], st.session_state["memory_report"] = load_default_data()
+        # Identitas data untuk cache ekspor: file sumber + waktu modifikasinya
+        st.session_state["data_key"] = "default:" + "|".join(
+            f"{p}@{os.path.getmtime(p)}" for p in resolve_superstore_files(DATA_SOURCE))
 
 df_active = st.session_state["data_df"]
+# Mode out-of-core: tidak ada data di session (upload selalu memakai mode in-memory)
+dataset = open_dataset(st.session_state["dataset_path"]) if df_active.empty and st.session_state.get("dataset_path") else None
+if dataset is not None:
+    # Identitas data untuk cache ekspor: path + mtime manifest, jadi dataset yang ditulis ulang tidak memakai ekspor lama
+    st.session_state["data_key"] = f"dataset:{dataset_version(st.session_state['dataset_path'])}"
 
 # -------------------------------- SIDEBAR -------------------------------------
 with st.sidebar:
     st.header("Sumber Data")
-    uploaded = st.file_uploader("Upload CSV Superstore (pemisah ;, desimal ,)", type=["csv"])
+    uploaded = st.file_uploader("Upload CSV Superstore (pemisah ;, desimal ,)", type=["csv"],
+                                accept_multiple_files=True,
+                                help="Boleh beberapa file sekaligus (mis. satu per bulan); duplikat Row ID dibuang.")
     if uploaded:
         try:
-            df_up = read_superstore_csv(uploaded)
-            df_up = add_basic_features(df_up)
+            df_up, st.session_state["memory_report"], ingest = load_uploads(uploaded)
             st.session_state["data_df"] = df_up
             df_active = df_up
-            st.success(f"Data berhasil dimuat: {len(df_up):,} baris")
+            dataset = None
+            st.success(f"Data berhasil dimuat: {len(df_up):,} baris dari {ingest['files']} file"
+                       + (f" ({ingest['duplicates_dropped']:,} duplikat Row ID dibuang)" if ingest["duplicates_dropped"] else ""))
+            cache = get_upload_cache().stats()
+            st.caption(f"Cache upload: {cache['entries']} file set, {cache['bytes'] / 2 ** 20:,.0f}/"
+                       f"{cache['max_bytes'] / 2 ** 20:,.0f} MB, {cache['hits']} hit / {cache['misses']} parse")
         except Exception as e:
             st.error(f"Gagal membaca file. Pastikan pemisah ';' dan desimal ','. Detail: {e}")
     else:
-        if df_active.empty:
-            st.info("Menggunakan data default: letakkan file di data/raw/USSuperstoreData.csv")
+        if dataset is not None:
+            st.info(f"Dataset Parquet terpartisi: {dataset.n_rows:,} baris (tidak dimuat ke memori)")
+        elif df_active.empty:
+            st.info("Menggunakan data default: letakkan file di data/raw/USSuperstoreData.csv "
+                    "(atau set SUPERSTORE_DATA ke folder / pola glob berisi banyak CSV)")
 
     st.divider()
     st.header("Filter Global")
@@ -88,29 +144,56 @@ with st.sidebar:
     if "global_filters" not in st.session_state:
         st.session_state["global_filters"] = {}
 
-    if not df_active.empty and "Order Date" in df_active.columns:
+    if dataset is not None:
+        min_d, max_d = dataset.date_bounds()
+    elif not df_active.empty and "Order Date" in df_active.columns:
         min_d, max_d = df_active["Order Date"].min(), df_active["Order Date"].max()
+    else:
+        min_d = max_d = None
+    if min_d is not None:
         date_range = st.date_input("Rentang Tanggal", value=(min_d, max_d))
         st.session_state["global_filters"]["date_range"] = date_range
 
-    regions_all = sorted(df_active["Region"].dropna().unique().tolist()) if "Region" in df_active else []
+    if dataset is not None:
+        regions_all = dataset.vocabulary("Region")
+    else:
+        regions_all = sorted(df_active["Region"].dropna().unique().tolist()) if "Region" in df_active else []
     regions_pick = st.multiselect("Region", regions_all, default=regions_all)
     st.session_state["global_filters"]["regions"] = regions_pick
 
+    mem_rep = st.session_state.get("memory_report", pd.DataFrame())
+    if not mem_rep.empty:
+        total = mem_rep.iloc[-1]
+        with st.expander(f"Memori Data: {total['bytes_after'] / 1e6:,.1f} MB (hemat {total['saved_pct']:.0f}%)"):
+            st.dataframe(mem_rep, use_container_width=True, hide_index=True)
+
 # --------------------------------- MAIN ---------------------------------------
 st.title("Superstore Analytics & ML Dashboard")
 st.caption("Analisis penjualan, profit, dan prediksi profitabilitas pada dataset Superstore.")
 
-fdf = apply_global_filters(df_active)
+date_range, filters = global_filter_spec(st.session_state.get("global_filters", {}))
+if dataset is not None:
+    # Hanya baris 100 teratas yang dibaca; kartu dari rollup per fragmen (order unik = estimasi HLL)
+    fdf = dataset.scan(date_range=date_range, filters=filters, limit=100)
+    view = dataset.rollup(date_range, filters)
+    rows = int(view.cells["rows"].sum())
+    orders = view.kpi()["n_orders"]
+    lo, hi = dataset.date_bounds()
+    if date_range and lo is not None:
+        lo, hi = max(lo, date_range[0]), min(hi, date_range[1])
+    period = f"{lo.date()} s.d. {hi.date()}" if rows and lo is not None else "-"
+    source = "Dataset Parquet"
+else:
+    fdf = apply_global_filters(df_active)
+    rows = len(fdf)
+    orders = fdf["Order ID"].nunique() if "Order ID" in fdf else rows
+    period = "-"
+    if "Order Date" in fdf and not fdf.empty:
+        period = f"{fdf['Order Date'].min().date()} s.d. {fdf['Order Date'].max().date()}"
+    source = "Upload" if uploaded else ("Default" if not df_active.empty else "-")
 
 # Kartu status data (berwarna)
 c1, c2, c3, c4 = st.columns(4)
-rows = len(fdf)
-orders = fdf["Order ID"].nunique() if "Order ID" in fdf else rows
-period = "-"
-if "Order Date" in fdf and not fdf.empty:
-    period = f"{fdf['Order Date'].min().date()} s.d. {fdf['Order Date'].max().date()}"
-source = "Upload" if uploaded else ("Default" if not df_active.empty else "-")
 
 with c1: kpi_card("Total Baris", f"{rows:,}", bg="#E8F1FF", fg="#0F3D91")
 with c2: kpi_card("Jumlah Order Unik", f"{orders:,}", bg="#F1F1F1", fg="#333333")
@@ -132,6 +215,18 @@ if fdf.empty:
     st.warning("Belum ada data yang bisa ditampilkan. Upload file atau gunakan data default.")
 else:
     st.dataframe(fdf.head(100), use_container_width=True, height=420)
-    csv_bytes = fdf.to_csv(index=False).encode("utf-8")
-    st.download_button("Unduh data terfilter (CSV)", data=csv_bytes,
-                       file_name="superstore_filtered.csv", mime="text/csv")
+    # Ekspor baru ditulis saat tombol diklik (per chunk ke file), lalu di-cache per (data, filter, format)
+    fmt = st.radio("Format unduhan", list(EXPORT_FORMATS), horizontal=True,
+                   format_func={"csv": "CSV", "csv.gz": "CSV (gzip)", "parquet": "Parquet"}.get)
+    if dataset is not None:
+        chunks = lambda: dataset.iter_batches(date_range=date_range, filters=filters)
+    else:
+        chunks = lambda: frame_chunks(fdf)
+    key = export_key(st.session_state.get("data_key"), date_range, filters, fmt)
+    suffix, mime = EXPORT_FORMATS[fmt]
+    st.download_button(f"Unduh data terfilter ({rows:,} baris)",
+                       data=lambda: shared_export_cache().read(key, fmt, chunks),
+                       file_name=f"superstore_filtered{suffix}", mime=mime, on_click="ignore")
+
+# ---------------------------- DIAGNOSTIK PERFORMA -----------------------------
+render_diagnostics_panel()
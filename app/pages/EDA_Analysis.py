@@ -8,10 +8,15 @@ ROOT_DIR = os.path.dirname(os.path.dirname(__file__))  # parent of /app
 if ROOT_DIR not in sys.path:
     sys.path.append(ROOT_DIR)
 
+from src.filter_index import get_filter_index, global_filter_spec
+from src.rollup import get_rollup_cube
+from src.parquet_dataset import open_dataset
 from src.visualization import (
-    kpi_summary, bar_sales_profit_by_category,
-    top_subcategory_by_sales, monthly_trend, scatter_sales_profit
+    category_bar, top_subcategory_bar, monthly_line, scatter_sales_profit,
+    SCATTER_MODES, SCATTER_POINT_BUDGET
 )
+from src.instrumentation import track_stage
+from src.diagnostics_panel import render_diagnostics_panel
 
 st.set_page_config(page_title="EDA Analysis", layout="wide")
 
@@ -36,51 +41,64 @@ def kpi_card(title: str, value: str, bg: str = "#F1F1F1", fg: str = "#1F2937"):
     """
     st.markdown(html, unsafe_allow_html=True)
 
+def show_chart(fig):
+    # Serialisasi figure ke browser dicatat terpisah dari pembuatan figure (plot.*)
+    with track_stage("render.plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
+
 st.title("Analisis Bisnis (EDA)")
 
 df = st.session_state.get("data_df", pd.DataFrame())
-if df.empty:
+dataset = open_dataset(st.session_state["dataset_path"]) if df.empty and st.session_state.get("dataset_path") else None
+if df.empty and dataset is None:
     st.warning("Tidak ada data. Kembali ke Beranda untuk upload atau gunakan data default.")
     st.stop()
 
-# Terapkan filter global dari Beranda
-gf = st.session_state.get("global_filters", {})
-fdf = df.copy()
-if "Order Date" in fdf.columns and gf.get("date_range"):
-    start, end = pd.to_datetime(gf["date_range"][0]), pd.to_datetime(gf["date_range"][1])
-    fdf = fdf[fdf["Order Date"].between(start, end)]
-if "Region" in fdf.columns and gf.get("regions"):
-    fdf = fdf[fdf["Region"].isin(gf["regions"])]
+date_range, filters = global_filter_spec(st.session_state.get("global_filters", {}))
+if dataset is not None:
+    # Dataset Parquet: pilihan filter dari rollup fragmen yang lolos filter global (tanpa memuat baris)
+    base_view = dataset.rollup(date_range, filters)
+    columns = dataset.columns
+    options = lambda col, picked: base_view.where(picked).values_in(col)
+else:
+    # Terapkan filter global dari Beranda (index dipakai bersama dengan halaman utama)
+    index = get_filter_index(df, st.session_state)
+    columns = df.columns
+    options = lambda col, picked: index.values_in(col, index.select(date_range, {**filters, **picked}))
 
 # Filter khusus halaman (cascade Category -> Sub-Category)
 with st.sidebar:
     st.header("Filter Halaman")
-    cat_all = sorted(fdf["Category"].dropna().unique().tolist()) if "Category" in fdf else []
+    cat_all = sorted(options("Category", {}))
     cat_pick = st.multiselect("Category", cat_all, default=cat_all)
 
-    if cat_pick and "Category" in fdf and "Sub-Category" in fdf:
-        subcat_all = sorted(fdf[fdf["Category"].isin(cat_pick)]["Sub-Category"].dropna().unique().tolist())
-    elif "Sub-Category" in fdf:
-        subcat_all = sorted(fdf["Sub-Category"].dropna().unique().tolist())
-    else:
-        subcat_all = []
+    subcat_all = sorted(options("Sub-Category", {"Category": cat_pick}))
 
     subcat_pick = st.multiselect("Sub-Category", subcat_all, default=subcat_all)
 
     reset = st.button("Reset Filter Halaman")
 
+    st.header("Tampilan Scatter")
+    scatter_mode = st.selectbox("Mode scatter", SCATTER_MODES,
+                                help="auto: semua titik bila kecil, sampel WebGL bila melebihi batas; density: heatmap.")
+    scatter_budget = st.number_input("Batas titik scatter", min_value=1_000, value=SCATTER_POINT_BUDGET, step=5_000)
+
 if reset:
     st.rerun()
 
-mask = pd.Series(True, index=fdf.index)
-if cat_pick and "Category" in fdf:
-    mask &= fdf["Category"].isin(cat_pick)
-if subcat_pick and "Sub-Category" in fdf:
-    mask &= fdf["Sub-Category"].isin(subcat_pick)
-fdf = fdf[mask].copy()
-
-# KPI
-kpi = kpi_summary(fdf)
+page_filters = {**filters, "Category": cat_pick, "Sub-Category": subcat_pick}
+# KPI & grafik agregat dijawab dari rollup (bulan x Region x Category x Sub-Category)
+if dataset is not None:
+    view = base_view.where(page_filters)
+    # Scatter: hanya sampel (plus baris profit terendah) yang dibaca dari Parquet
+    fdf = dataset.sample_rows(["Sales", "Profit", "Quantity", "Discount", "Category"], date_range, page_filters,
+                              max_rows=int(scatter_budget), expected_rows=int(view.cells["rows"].sum()))
+else:
+    rows = index.select(date_range, page_filters)
+    fdf = index.take(df, rows)
+    cube = get_rollup_cube(df, st.session_state)
+    view = cube.query(date_range, page_filters)
+kpi = view.kpi()
 c1, c2, c3, c4 = st.columns(4)
 with c1: kpi_card("Total Sales", f"${kpi['total_sales']:,.2f}", bg="#E8F1FF", fg="#0F3D91")
 with c2: kpi_card("Total Profit", f"${kpi['total_profit']:,.2f}", bg="#E8FFF2", fg="#0C6B3E")
@@ -93,42 +111,37 @@ st.divider()
 left, right = st.columns(2)
 
 with left:
-    fig1 = bar_sales_profit_by_category(fdf)
-    if fig1 is not None:
+    if {"Category", "Sales", "Profit"}.issubset(columns):
+        fig1 = category_bar(view.by_category())
         st.subheader("Kinerja per Kategori")
-        st.plotly_chart(fig1, use_container_width=True)
+        show_chart(fig1)
 
-    fig2 = top_subcategory_by_sales(fdf, top_n=10)
-    if fig2 is not None:
+    if {"Sub-Category", "Sales"}.issubset(columns):
+        fig2 = top_subcategory_bar(view.by_subcategory(), top_n=10)
         st.subheader("Top 10 Sub-Category berdasarkan Sales")
-        st.plotly_chart(fig2, use_container_width=True)
+        show_chart(fig2)
 
 with right:
-    fig3 = monthly_trend(fdf)
-    if fig3 is not None:
+    if "Order Date" in columns and {"Sales", "Profit"}.issubset(columns):
+        fig3 = monthly_line(view.monthly())
         st.subheader("Tren Bulanan Sales dan Profit")
-        st.plotly_chart(fig3, use_container_width=True)
+        show_chart(fig3)
 
-    fig4 = scatter_sales_profit(fdf)
+    fig4 = scatter_sales_profit(fdf, max_points=int(scatter_budget), mode=scatter_mode)
     if fig4 is not None:
         st.subheader("Sebaran Sales vs Profit")
-        st.plotly_chart(fig4, use_container_width=True)
+        show_chart(fig4)
+        if dataset is not None:
+            st.caption("Dataset Parquet: scatter dari sampel acak + baris profit terendah, bukan seluruh baris.")
 
 # Tabel ringkas Top 10 dengan margin
 st.subheader("Ringkasan 10 Sub-Category Teratas (berdasarkan Sales)")
-if {"Sub-Category", "Sales"}.issubset(fdf.columns):
-    if "Order ID" in fdf:
-        orders_agg = ("Order ID", "nunique")
-    else:
-        orders_agg = ("Sales", "count")
-
+if {"Sub-Category", "Sales"}.issubset(columns):
+    # Orders = estimasi order unik (sketch HyperLogLog), atau jumlah baris bila tanpa Order ID
     tab = (
-        fdf.groupby("Sub-Category", as_index=False)
-           .agg(Sales=("Sales","sum"),
-                Profit=("Profit","sum"),
-                Orders=orders_agg)
-           .sort_values("Sales", ascending=False)
-           .head(10)
+        view.by_subcategory()
+            .sort_values("Sales", ascending=False)
+            .head(10)
     )
     tab["Margin%"] = (tab["Profit"] / tab["Sales"]).replace([float("inf"), -float("inf")], 0.0).fillna(0.0) * 100
 
@@ -136,7 +149,10 @@ if {"Sub-Category", "Sales"}.issubset(fdf.columns):
                  use_container_width=True, height=360)
 
     st.download_button("Unduh ringkasan (CSV)",
-                       data=tab.to_csv(index=False).encode("utf-8"),
+                       data=lambda: tab.to_csv(index=False).encode("utf-8"), on_click="ignore",
                        file_name="top10_subcategory.csv", mime="text/csv")
 else:
     st.info("Kolom Sub-Category atau Sales tidak tersedia.")
+
+# ---------------------------- DIAGNOSTIK PERFORMA -----------------------------
+render_diagnostics_panel()
@@ -10,25 +10,102 @@ ROOT_DIR = os.path.dirname(os.path.dirname(__file__))  # parent of /app
 if ROOT_DIR not in sys.path:
     sys.path.append(ROOT_DIR)
 
-from src.model_utils import load_model
+from src.model_training import TRAINING_ENGINES
+from src.training_jobs import ModelSlot, TrainingJobs
+from src.exports import EXPORT_FORMATS, csv_chunks, export_key, shared_export_cache
+from src.what_if import (DISCOUNT_GRID, ship_mode_days, ship_mode_axis, score_sweep, break_even_discount,
+                         break_even_from_sweep, sweep_surface)
+from src.visualization import what_if_surface, what_if_discount_curve
+from src.batch_scoring import REQUIRED_COLUMNS, history_input_columns, score_csv, score_frame
+from src.model_evaluation import CV_SCHEMES
+from src.model_utils import model_threshold
+from src.instrumentation import track_stage
+from src.diagnostics_panel import render_diagnostics_panel
 
 st.set_page_config(page_title="Profit Prediction", layout="wide")
 
 MODEL_PATH = "models/model_profit_clf.joblib"
 
 @st.cache_resource(show_spinner=False)
-def get_model():
-    if not Path(MODEL_PATH).exists():
-        return None
-    return load_model(MODEL_PATH)
+def get_model() -> ModelSlot:
+    # Satu slot per proses (dibagi antar sesi); artifact memory-mapped lebih cepat dimuat daripada joblib.
+    # Job training yang selesai menukar model di slot ini tanpa restart aplikasi.
+    return ModelSlot(MODEL_PATH)
 
-model = get_model()
-if model is None:
-    st.error("Model belum tersedia. Jalankan training terlebih dahulu untuk menghasilkan models/model_profit_clf.joblib.")
-    st.stop()
+@st.cache_resource(show_spinner=False)
+def get_training_jobs() -> TrainingJobs:
+    # Training berjalan di process pool terpisah: maksimal 1 berjalan + 2 antre untuk seluruh sesi
+    return TrainingJobs(max_running=1, max_queued=2)
 
+slot = get_model()
+jobs = get_training_jobs()
+st.session_state.setdefault("model_version", slot.version)
 df_ref = st.session_state.get("data_df", pd.DataFrame())
 
+# ---------------------------- TRAINING DI LATAR ------------------------------
+def training_status():
+    for job in jobs.jobs()[:5]:
+        label = f"Job {job['id']} ({job['params'].get('engine')}, {job['rows'] or 0:,} baris)"
+        if job["status"] in ("queued", "running"):
+            st.progress(job["progress"], text=f"{label}: {job['stage']}")
+        elif job["status"] == "done":
+            threshold_note = (f", threshold {job['result']['threshold']:.2f}"
+                              if job["result"].get("threshold") is not None else "")
+            st.success(f"{label}: selesai, F1 {job['result']['metrics']['f1']:.3f}{threshold_note}")
+        elif job["status"] == "failed":
+            st.error(f"{label}: gagal ({job['error']})")
+        else:
+            st.caption(f"{label}: dibatalkan")
+    # Model baru sudah ditukar di slot: jalankan ulang halaman agar form & batch memakainya
+    if slot.version != st.session_state["model_version"]:
+        st.session_state["model_version"] = slot.version
+        st.rerun()
+
+with st.sidebar:
+    with st.expander("Latih Ulang Model", expanded=slot.get() is None):
+        engine = st.selectbox("Engine", TRAINING_ENGINES, index=TRAINING_ENGINES.index("rf_dense"))
+        n_trees = st.number_input("Jumlah pohon / iterasi", min_value=10, max_value=1000, value=300, step=10)
+        use_history = st.checkbox("Fitur riwayat pelanggan/produk", value=False,
+                                  help="Profit rate, rata-rata discount dan frekuensi order sebelumnya per Customer ID, "
+                                       "Product ID dan Sub-Category (hanya order sebelum tanggal order baris itu).")
+        cv_scheme = st.selectbox("Validasi silang (tuning threshold)", ("-",) + CV_SCHEMES,
+                                 format_func={"-": "Tidak (threshold 0.5)", "stratified": "Stratified k-fold",
+                                              "time": "Berbasis waktu (Order Date)"}.get)
+        cost_fp = st.number_input("Biaya relatif: order rugi diprediksi untung", min_value=0.1, max_value=20.0,
+                                  value=1.0, step=0.5, disabled=cv_scheme == "-",
+                                  help="Dibanding biaya order untung yang diprediksi rugi (= 1). Threshold dipilih "
+                                       "agar total biaya pada prediksi out-of-fold minimum.")
+        if df_ref.empty:
+            st.caption("Training memakai data aktif di memori (upload / data default), bukan dataset Parquet.")
+        if st.button("Latih dari data aktif", disabled=df_ref.empty):
+            params = {"n_estimators": int(n_trees)} if engine.startswith("rf") else {"max_iter": int(n_trees)}
+            cv_params = {} if cv_scheme == "-" else {"cv": cv_scheme, "cost_fp": float(cost_fp), "cost_fn": 1.0}
+            try:
+                jobs.submit(df_ref, MODEL_PATH, on_done=slot.reload, engine=engine, clf_params=params,
+                            history_features=use_history, **cv_params)
+            except RuntimeError as e:
+                st.warning(str(e))
+        # Status diperbarui tiap 2 detik selama ada job aktif, tanpa menjalankan ulang seluruh halaman
+        st.fragment(training_status, run_every=2 if jobs.active() else None)()
+        if slot.info:
+            st.caption(f"Model aktif dari job {slot.info['id']} "
+                       f"({pd.Timestamp(slot.info['finished_at'], unit='s'):%Y-%m-%d %H:%M:%S} UTC)")
+
+try:
+    model = slot.get()
+except ValueError as e:
+    # Mis. model dengan fitur riwayat tanpa state riwayatnya: jangan diskor dengan fitur kosong
+    st.error(f"Model tidak dapat dipakai: {e}")
+    st.stop()
+if model is None:
+    st.error("Model belum tersedia. Latih model dari sidebar (Latih Ulang Model) atau jalankan training "
+             "untuk menghasilkan models/model_profit_clf.joblib.")
+    st.stop()
+# Threshold hasil tuning CV yang disimpan bersama model (0.5 bila model dilatih tanpa CV)
+threshold = model_threshold(model)
+# Kolom tambahan untuk model dengan fitur riwayat (Order Date + Customer ID/Product ID)
+history_inputs = [c for c in history_input_columns(model) if c not in REQUIRED_COLUMNS]
+
 # ---------------------------- PREDIKSI TUNGGAL -------------------------------
 st.subheader("Prediksi Tunggal")
 col_form, col_out = st.columns([1,1])
@@ -59,76 +136,193 @@ with col_form:
         days_to_ship = st.number_input("Days_to_Ship", min_value=-1, value=2, step=1,
                                        help="Selisih hari (Ship Date - Order Date). Boleh -1 untuk same-day.")
 
+        history_row = {}
+        if history_inputs:
+            # Fitur riwayat dihitung dari state riwayat yang disimpan bersama model
+            h1, h2, h3 = st.columns(3)
+            history_row["Order Date"] = pd.Timestamp(h1.date_input("Order Date", value=pd.Timestamp.today()))
+            if "Customer ID" in history_inputs:
+                history_row["Customer ID"] = h2.text_input("Customer ID", value="") or None
+            if "Product ID" in history_inputs:
+                history_row["Product ID"] = h3.text_input("Product ID", value="") or None
+
         submitted = st.form_submit_button("Prediksi")
 
+# Baris dasar dari nilai form terakhir (juga dipakai analisis what-if di bawah)
+row = pd.DataFrame([{
+    "Sales": sales,
+    "Quantity": qty,
+    "Discount": disc,
+    "Ship Mode": ship_mode,
+    "Segment": segment,
+    "Category": category,
+    "Sub-Category": subcat,
+    "Region": region,
+    "Days_to_Ship": days_to_ship,
+    **history_row
+}])
+
 with col_out:
     if submitted:
-        row = pd.DataFrame([{
-            "Sales": sales,
-            "Quantity": qty,
-            "Discount": disc,
-            "Ship Mode": ship_mode,
-            "Segment": segment,
-            "Category": category,
-            "Sub-Category": subcat,
-            "Region": region,
-            "Days_to_Ship": days_to_ship
-        }])
-        proba = model.predict_proba(row)[0][1]
-        pred = int(proba >= 0.5)
+        with track_stage("model.predict_single", rows=1):
+            proba = float(score_frame(model, row)[1][0])
+        pred = int(proba >= threshold)
         st.markdown("Hasil")
         st.write(f"Label: {'Profitable' if pred==1 else 'Not Profitable'}")
-        st.write(f"Probabilitas untung: {proba:.2%}")
+        st.write(f"Probabilitas untung: {proba:.2%} (threshold {threshold:.2f})")
+
+st.divider()
+
+# ------------------------------ ANALISIS WHAT-IF ------------------------------
+@st.fragment
+def what_if_section(row: pd.DataFrame):
+    # Fragment: mengubah variabel / discount maksimum hanya menjalankan ulang bagian ini.
+    # Hasil skoring + grafik disimpan per (baris form, versi model, pengaturan), jadi rerun
+    # karena widget lain (batch, sidebar) tidak men-skor ulang.
+    wc1, wc2 = st.columns([1, 3])
+    with wc1:
+        sweep_var = st.selectbox("Variabel sumbu Y", ["Quantity", "Sales", "Ship Mode"])
+        max_disc = st.slider("Discount maksimum", min_value=0.1, max_value=0.8, value=0.8, step=0.05)
+    key = (tuple(row.iloc[0].astype(str)), slot.version, sweep_var, float(max_disc))
+    cached = st.session_state.get("what_if")
+    if cached is None or cached["key"] != key:
+        discounts = DISCOUNT_GRID[DISCOUNT_GRID <= max_disc + 1e-9]
+        if sweep_var == "Quantity":
+            y_axis, y_values = "Quantity", list(range(1, 15))
+        elif sweep_var == "Sales":
+            y_axis, y_values = "Sales", [round(sales * f, 2) for f in (0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10)]
+        else:
+            # Ship Mode diganti bersama Days_to_Ship tipikalnya (median di data aktif)
+            y_axis, y_values = ship_mode_axis(ship_opts, ship_mode_days(df_ref if not df_ref.empty else None))
+        sweep = score_sweep(model, row, {y_axis: y_values, "Discount": discounts})
+        surface = sweep_surface(sweep, "Discount", "Ship Mode" if sweep_var == "Ship Mode" else y_axis)
+        # Kurva discount baris dasar; break-even dihitung dari sweep yang sama (tanpa skoring ulang)
+        curve = score_sweep(model, row, {"Discount": discounts})
+        base_be = break_even_from_sweep(curve, threshold).iloc[0]
+        cached = {"key": key, "discounts": discounts, "n_scenarios": len(sweep) + len(curve), "base_be": base_be,
+                  "surface_fig": what_if_surface(surface, threshold),
+                  "curve_fig": what_if_discount_curve(curve, threshold, break_even=base_be["break_even_discount"])}
+        st.session_state["what_if"] = cached
+
+    discounts, base_be = cached["discounts"], cached["base_be"]
+    with wc1:
+        if base_be["profitable_at_min"] and pd.isna(base_be["break_even_discount"]):
+            st.metric("Break-even discount", f"> {discounts[-1]:.2f}", help="Tetap diprediksi untung di seluruh rentang.")
+        elif not base_be["profitable_at_min"]:
+            st.metric("Break-even discount", "-", help="Sudah diprediksi rugi tanpa discount.")
+        else:
+            st.metric("Break-even discount", f"{base_be['break_even_discount']:.2f}",
+                      help=f"Discount terkecil dengan probabilitas untung di bawah {threshold:.2f} (interpolasi antar titik grid).")
+        st.caption(f"{cached['n_scenarios']:,} skenario diskor")
+    with wc2:
+        t1, t2 = st.tabs(["Permukaan probabilitas", "Kurva discount"])
+        with t1:
+            st.plotly_chart(cached["surface_fig"], use_container_width=True)
+        with t2:
+            st.plotly_chart(cached["curve_fig"], use_container_width=True)
+
+st.subheader("Analisis What-If (Sensitivitas)")
+st.caption("Grid Discount x variabel lain untuk baris di form di atas, diskor sekaligus dalam satu panggilan model.")
+what_if_section(row)
 
 st.divider()
 
 # ---------------------------- BATCH PREDICTION -------------------------------
 st.subheader("Prediksi Batch (CSV)")
 
-required_cols = ["Sales","Quantity","Discount","Ship Mode","Segment","Category","Sub-Category","Region","Days_to_Ship"]
+required_cols = REQUIRED_COLUMNS + history_inputs
+template_example = ["100,00", "1", "0,10", "Standard Class", "Consumer", "Technology", "Phones", "West", "2"]
+template_example += [{"Order Date": "08/11/2017", "Customer ID": "CG-12520", "Product ID": "FUR-BO-10001798"}[c]
+                     for c in history_inputs]
 
 # Template CSV (header saja + 1 baris contoh; pemisah ; dan desimal ,)
-template = ";".join(required_cols) + "\n100,00;1;0,10;Standard Class;Consumer;Technology;Phones;West;2\n"
+template = ";".join(required_cols) + "\n" + ";".join(template_example) + "\n"
 st.download_button("Unduh Template CSV", data=template.encode("utf-8"),
                    file_name="template_batch_superstore.csv", mime="text/csv")
 st.caption("Gunakan pemisah ';' dan desimal ',' sesuai contoh pada baris kedua template.")
+if history_inputs:
+    st.caption("Model memakai fitur riwayat: sertakan Order Date (dd/mm/yyyy), Customer ID dan Product ID.")
 
 batch_file = st.file_uploader("Upload CSV batch (hanya kolom fitur sesuai template)", type=["csv"], key="batch_upload")
 
 if batch_file:
     try:
-        # Baca CSV dengan aturan Superstore
-        batch_df = pd.read_csv(batch_file, sep=";", decimal=",")
-        cols = set(batch_df.columns)
-
-        # Jika Days_to_Ship tidak ada tapi ada tanggal, hitung otomatis
-        if "Days_to_Ship" not in cols and {"Order Date", "Ship Date"}.issubset(cols):
-            od = pd.to_datetime(batch_df["Order Date"], errors="coerce", dayfirst=True)
-            sd = pd.to_datetime(batch_df["Ship Date"], errors="coerce", dayfirst=True)
-            batch_df["Days_to_Ship"] = (sd - od).dt.days
-
-        # Validasi minimum kolom fitur
-        missing = [c for c in required_cols if c not in batch_df.columns]
-        if missing:
-            st.error(f"Kolom wajib tidak lengkap: {missing}")
-        else:
-            st.markdown("Pratinjau Data Batch")
-            st.dataframe(batch_df.head(50), use_container_width=True, height=300)
+        # Hasil skoring disimpan per (file, versi model): rerun karena widget lain tidak men-skor ulang
+        batch_key = (batch_file.file_id, slot.version)
+        batch = st.session_state.get("batch_result")
+        # File hasil ada di direktori ExportCache (ikut eviksi LRU-nya): skor ulang bila sudah terhapus
+        if batch is None or batch["key"] != batch_key or not os.path.exists(batch["out_path"]):
+            if batch is not None:
+                Path(batch["out_path"]).unlink(missing_ok=True)  # hasil file / model sebelumnya
+            # Skoring per chunk: satu predict_proba per chunk, hasil ditulis bertahap ke file sementara
+            bar = st.progress(0.0, text="Memproses batch...")
+            first = {}
+
+            def on_progress(done, total):
+                bar.progress(min(done / total, 1.0) if total else 1.0, text=f"Memproses batch... {done:,}/{total:,} baris")
 
-            # Prediksi
-            input_df = batch_df[required_cols].copy()
-            preds = model.predict(input_df)
-            probas = model.predict_proba(input_df)[:,1]
+            export_cache = shared_export_cache()
+            out_path = str(export_cache.path_for(export_key("batch", *batch_key), "csv"))
+            Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+            # Batch besar: pipeline sklearn (predict_proba tervektorisasi) lebih cepat daripada artifact
+            stats = score_csv(slot.get_batch(), batch_file, out_path, progress=on_progress,
+                              on_first_chunk=lambda chunk: first.setdefault("df", chunk.head(50)))
+            export_cache.evict(keep=Path(out_path))
+            bar.empty()
+            batch = {"key": batch_key, "out_path": out_path, "stats": stats,
+                     "preview": first.get("df", pd.DataFrame())}
+            st.session_state["batch_result"] = batch
+        stats, out_path = batch["stats"], batch["out_path"]
+        st.caption(f"{stats['rows']:,} baris dalam {stats['seconds']:.2f} detik ({stats['rows_per_sec']:,.0f} baris/detik)")
 
-            out = batch_df.copy()
-            out["Pred_Profitable"] = preds
-            out["Proba_Profit"] = probas
+        preview = batch["preview"]
+        st.markdown("Pratinjau Data Batch")
+        st.dataframe(preview.drop(columns=["Pred_Profitable", "Proba_Profit"], errors="ignore"),
+                     use_container_width=True, height=300)
 
-            st.markdown("Hasil Prediksi")
-            st.dataframe(out.head(50), use_container_width=True, height=360)
+        st.markdown("Hasil Prediksi")
+        st.dataframe(preview, use_container_width=True, height=360)
 
-            st.download_button("Unduh Hasil (CSV)",
-                               data=out.to_csv(index=False).encode("utf-8"),
-                               file_name="batch_predictions.csv", mime="text/csv")
+        # File hasil dibaca / dikonversi (per chunk) hanya saat tombol diklik
+        fmt = st.radio("Format hasil", list(EXPORT_FORMATS), horizontal=True,
+                       format_func={"csv": "CSV", "csv.gz": "CSV (gzip)", "parquet": "Parquet"}.get)
+        suffix, mime = EXPORT_FORMATS[fmt]
+        if fmt == "csv":
+            data = lambda: Path(out_path).read_bytes()
+        else:
+            key = export_key("batch", *batch_key, fmt)
+            data = lambda: shared_export_cache().read(key, fmt, lambda: csv_chunks(out_path))
+        st.download_button("Unduh Hasil", data=data, file_name=f"batch_predictions{suffix}", mime=mime,
+                           on_click="ignore")
+
+        # Sweep discount yang sama untuk setiap baris batch (dibaca per chunk dari file hasil)
+        if st.button("Hitung break-even discount per baris"):
+            # Biaya sebanding dengan baris x titik discount (waktu predict model), jadi tampilkan progres
+            be_bar = st.progress(0.0, text="Menghitung break-even...")
+            parts, offset = [], 0
+            for chunk in csv_chunks(out_path, chunk_rows=10_000):
+                be = break_even_discount(slot.get_batch(), chunk)
+                be["row"] += offset
+                offset += len(chunk)
+                parts.append(be)
+                total = stats["rows"]
+                be_bar.progress(min(offset / total, 1.0) if total else 1.0,
+                                text=f"Menghitung break-even... {offset:,}/{total:,} baris")
+            be_bar.empty()
+            batch["break_even"] = pd.concat(parts, ignore_index=True)
+        be_all = batch.get("break_even")
+        if be_all is not None:
+            never = be_all["break_even_discount"].isna().mean()
+            st.caption(f"Median break-even discount {be_all['break_even_discount'].median():.2f}; "
+                       f"{never:.0%} baris tetap untung sampai discount {DISCOUNT_GRID[-1]:.2f}; "
+                       f"{(~be_all['profitable_at_min']).mean():.0%} baris sudah rugi tanpa discount.")
+            st.dataframe(be_all.head(200), use_container_width=True, height=300)
+            st.download_button("Unduh break-even (CSV)", data=lambda: be_all.to_csv(index=False).encode("utf-8"),
+                               file_name="batch_break_even.csv", mime="text/csv", on_click="ignore")
+    except ValueError as e:
+        st.error(str(e))
     except Exception as e:
         st.error(f"Gagal memproses file. Pastikan pemisah ';' dan desimal ','. Detail: {e}")
+
+# ---------------------------- DIAGNOSTIK PERFORMA -----------------------------
+render_diagnostics_panel()
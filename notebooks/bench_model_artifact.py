@@ -0,0 +1,109 @@
+"""
+Load time and memory of the model formats: joblib pipeline vs the memory-mapped artifact.
+
+    python notebooks/bench_model_artifact.py [--model models/model_profit_clf.joblib] [--procs 4]
+
+Each format is loaded by --procs concurrent worker processes that stay alive until all have
+reported, so Pss (proportional set size, Linux) shows how much of the model is shared between them.
+"pred ms" is the median single-row predict_proba time after the first call (one-row DataFrame).
+Writes the artifact next to the joblib file first if it does not exist yet.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import os
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # parent of /notebooks
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+# ------------------------------------
+
+FORMATS = ("joblib", "artifact-mmap", "artifact-copy")
+
+def memory_mb() -> dict:
+    """Rss / RssAnon (private heap) / Pss in MB from /proc; empty off Linux."""
+    out = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "RssAnon:", "RssFile:")):
+                    k, v = line.split(":")
+                    out[k] = int(v.split()[0]) / 1024
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    out["Pss"] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return out
+
+def worker(fmt: str, model_path: str):
+    import pandas as pd
+    from src.model_utils import load_model, load_model_artifact, artifact_path_for
+    from src.batch_scoring import REQUIRED_COLUMNS
+    row = pd.DataFrame([{"Sales": 100.0, "Quantity": 2, "Discount": 0.2, "Ship Mode": "Standard Class",
+                         "Segment": "Consumer", "Category": "Technology", "Sub-Category": "Phones",
+                         "Region": "West", "Days_to_Ship": 3}])[REQUIRED_COLUMNS]
+    before = memory_mb()
+    t0 = time.perf_counter()
+    if fmt == "joblib":
+        model = load_model(model_path)
+        model.set_params(clf__n_jobs=1)
+    else:
+        model = load_model_artifact(artifact_path_for(model_path), mmap=(fmt == "artifact-mmap"))
+    load_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    model.predict_proba(row)
+    first_s = time.perf_counter() - t0
+    after = memory_mb()
+    times = []
+    for _ in range(50):  # steady-state single-row latency (median)
+        t0 = time.perf_counter()
+        model.predict_proba(row)
+        times.append(time.perf_counter() - t0)
+    print(json.dumps({"format": fmt, "load_ms": load_s * 1e3, "first_predict_ms": first_s * 1e3,
+                      "predict_ms": sorted(times)[len(times) // 2] * 1e3, "before": before, "after": after}),
+          flush=True)
+    sys.stdin.readline()  # stay resident until the parent has read every worker
+
+def run_format(fmt: str, model_path: str, procs: int) -> list:
+    ps = [subprocess.Popen([sys.executable, "-W", "ignore", __file__, "--worker", fmt, "--model", model_path],
+                           stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, cwd=ROOT_DIR)
+          for _ in range(procs)]
+    results = [json.loads(p.stdout.readline()) for p in ps]
+    for p in ps:
+        p.communicate("\n")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="models/model_profit_clf.joblib")
+    parser.add_argument("--procs", type=int, default=4)
+    parser.add_argument("--worker", choices=FORMATS)
+    args = parser.parse_args()
+    if args.worker:
+        worker(args.worker, args.model)
+        return
+
+    from src.model_utils import load_model, save_model_artifact, artifact_path_for, is_model_artifact
+    art = artifact_path_for(args.model)
+    if not is_model_artifact(os.path.join(ROOT_DIR, art)):
+        save_model_artifact(load_model(os.path.join(ROOT_DIR, args.model)), os.path.join(ROOT_DIR, art))
+    size = lambda p: (sum(f.stat().st_size for f in Path(p).rglob("*") if f.is_file()) if Path(p).is_dir()
+                      else Path(p).stat().st_size) / 1e6
+    print(f"joblib {size(os.path.join(ROOT_DIR, args.model)):.1f} MB | artifact {size(os.path.join(ROOT_DIR, art)):.1f} MB on disk")
+
+    print(f"{'format':<14} {'load ms':>9} {'1st pred ms':>11} {'pred ms':>8} {'dRSS MB':>8} {'dAnon MB':>9} {'Pss MB':>7}  (mean of {args.procs} procs)")
+    for fmt in FORMATS:
+        res = run_format(fmt, args.model, args.procs)
+        mean = lambda f: sum(f(r) for r in res) / len(res)
+        d = lambda k: mean(lambda r: r["after"].get(k, 0) - r["before"].get(k, 0))
+        print(f"{fmt:<14} {mean(lambda r: r['load_ms']):9.1f} {mean(lambda r: r['first_predict_ms']):11.1f} "
+              f"{mean(lambda r: r['predict_ms']):8.2f} "
+              f"{d('VmRSS'):8.1f} {d('RssAnon'):9.1f} {mean(lambda r: r['after'].get('Pss', 0)):7.1f}")
+
+if __name__ == "__main__":
+    main()
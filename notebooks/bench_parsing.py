@@ -0,0 +1,54 @@
+import argparse
+import io
+import time
+
+import os, sys
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))  # parent of /notebooks
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+# ------------------------------------
+
+import pandas as pd
+from src.data_preprocessing import read_superstore_csv, PARSE_ENGINES
+
+# Edge cases: EU thousands, blanks, NA tokens, bad numbers/dates, padded categoricals, leading-zero codes
+EDGE_CSV = (
+    "Row ID;Order Date;Ship Date;Postal Code;Sales;Quantity;Discount;Profit;Region\n"
+    "1;08/11/16;11/11/16;05408;1.234,56;2;0;-3,5;  West \n"
+    "2;;;;;;;;\n"
+    "3;NA;x;42420;abc;1;0,2;1e3;null\n"
+    "4;31/12/16;02/01/17;N/A;N/A;3;0,45;12;East\n"
+)
+
+def check_equivalence(source) -> None:
+    """engine='fast' must reproduce engine='pandas' exactly (values, dtypes, column order)."""
+    if isinstance(source, bytes):
+        ref = read_superstore_csv(io.BytesIO(source), engine="pandas")
+        fast = read_superstore_csv(io.BytesIO(source), engine="fast")
+    else:
+        ref = read_superstore_csv(source, engine="pandas")
+        fast = read_superstore_csv(source, engine="fast")
+    pd.testing.assert_frame_equal(ref, fast, check_exact=True)
+
+def time_engine(path: str, engine: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        read_superstore_csv(path, engine=engine)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Equivalence check + timing for read_superstore_csv engines")
+    parser.add_argument("--csv", default="data/raw/USSuperstoreData.csv")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    check_equivalence(EDGE_CSV.encode("latin1"))
+    check_equivalence(args.csv)
+    print("Equivalence: OK (fast == pandas)")
+
+    timings = {engine: time_engine(args.csv, engine, args.repeat) for engine in PARSE_ENGINES}
+    for engine, secs in timings.items():
+        print(f"{engine:>7}: {secs:.3f}s")
+    print(f"Speed-up: {timings['pandas'] / timings['fast']:.1f}x")
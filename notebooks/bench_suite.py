@@ -0,0 +1,204 @@
+"""
+End-to-end benchmark on synthetic Superstore data, with regression check against a baseline.
+
+    python notebooks/bench_suite.py --rows 1000000                       # run, write JSON
+    python notebooks/bench_suite.py --rows 1000000 --update-baseline     # store as baseline
+    python notebooks/bench_suite.py --rows 1000000 --max-slowdown 0.25   # exit 1 on regression
+
+Stages: generate (synthetic CSV), read_csv (read_superstore_csv, fast engine), features
+(add_basic_features), eda_aggregations (visualization KPI/category/sub-category/monthly),
+train (train_profit_classifier, chunked load included), batch_score (score_csv).
+Per stage: wall seconds, rows/s and peak RSS above the stage's starting RSS (sampled every 10 ms).
+"""
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import os
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # parent of /notebooks
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+# ------------------------------------
+
+from src.instrumentation import current_rss_mb
+
+STAGES = ("generate", "read_csv", "features", "eda_aggregations", "train", "batch_score")
+
+def release_memory():
+    """Return freed heap to the OS (glibc) so a stage's peak is not hidden by earlier stages' arenas."""
+    import gc
+    gc.collect()
+    try:
+        import ctypes
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+class StageMeter:
+    """Times a block and samples RSS in a background thread to report its peak over the start."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+
+    def __enter__(self):
+        release_memory()
+        self.start_rss = self.peak_rss = current_rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        self.t0 = time.perf_counter()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, current_rss_mb())
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.t0
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, current_rss_mb())
+        return False
+
+def run_suite(rows: int, workdir: Path, seed: int = 0, engine: str = "hist_gb", stages=STAGES,
+              reuse_data: bool = True) -> dict:
+    import pandas as pd
+    import sklearn
+    from src.synthetic_data import write_synthetic_csv
+    from src.data_preprocessing import read_superstore_csv, DEFAULT_CHUNKSIZE
+    from src.feature_engineering import add_basic_features
+    from src.visualization import kpi_summary, bar_sales_profit_by_category, top_subcategory_by_sales, monthly_trend
+    from src.model_training import train_profit_classifier
+    from src.model_utils import load_model
+    from src.batch_scoring import score_csv
+
+    workdir.mkdir(parents=True, exist_ok=True)
+    csv_path = workdir / f"superstore_{rows}_{seed}.csv"
+    model_path = workdir / "bench_model.joblib"
+    results = {}
+    state = {}
+
+    def stage(name, fn):
+        if name not in stages:
+            return
+        print(f"  {name:<17}", end="", flush=True)
+        with StageMeter() as m:
+            fn()
+        results[name] = {"seconds": m.seconds, "rows_per_s": rows / m.seconds if m.seconds > 0 else None,
+                         "peak_rss_mb": m.peak_rss - m.start_rss}
+        print(f"{m.seconds:9.2f} s {results[name]['peak_rss_mb']:9.1f} MB")
+
+    if not (reuse_data and csv_path.exists()):
+        stage("generate", lambda: write_synthetic_csv(str(csv_path), rows, seed=seed))
+    elif "generate" in stages:
+        print(f"  generate          reused {csv_path.name}")
+    def frame(key):  # stages may run alone: rebuild what an earlier stage would have left
+        if key not in state:
+            if "raw" not in state:
+                state["raw"] = read_superstore_csv(str(csv_path), engine="fast")
+            if key == "df":
+                state["df"] = add_basic_features(state.pop("raw"))
+        return state[key]
+
+    stage("read_csv", lambda: state.update(raw=read_superstore_csv(str(csv_path), engine="fast")))
+    stage("features", lambda: state.update(df=add_basic_features(frame("raw"))))
+
+    def eda():
+        df = frame("df")
+        kpi_summary(df)
+        bar_sales_profit_by_category(df)
+        top_subcategory_by_sales(df, top_n=10)
+        monthly_trend(df)
+    stage("eda_aggregations", eda)
+    state.clear()
+
+    stage("train", lambda: train_profit_classifier(str(csv_path), str(model_path), engine=engine,
+                                                   chunksize=DEFAULT_CHUNKSIZE, artifact=False))
+
+    def batch():
+        model = load_model(str(model_path))
+        with tempfile.TemporaryDirectory() as tmp, open(csv_path, "rb") as src:
+            score_csv(model, src, str(Path(tmp) / "scored.csv"))
+    if "batch_score" in stages and not model_path.exists():
+        print("  batch_score       skipped (no trained model; include the train stage)")
+    else:
+        stage("batch_score", batch)
+
+    return {
+        "meta": {
+            "rows": rows, "seed": seed, "engine": engine,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(), "pandas": pd.__version__, "sklearn": sklearn.__version__,
+            "platform": platform.platform(), "cpu_count": os.cpu_count(),
+        },
+        "stages": results,
+    }
+
+def compare(results: dict, baseline: dict, max_slowdown: float, max_memory_growth: float,
+            min_seconds: float = 0.05, min_mb: float = 16.0) -> list:
+    """Regressions as (stage, metric, baseline, current); tiny stages/allocations are ignored as noise."""
+    regressions = []
+    for name, cur in results["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if base is None:
+            continue
+        if cur["seconds"] > max(base["seconds"] * (1 + max_slowdown), base["seconds"] + min_seconds):
+            regressions.append((name, "seconds", base["seconds"], cur["seconds"]))
+        if cur["peak_rss_mb"] > max(base["peak_rss_mb"] * (1 + max_memory_growth), base["peak_rss_mb"] + min_mb):
+            regressions.append((name, "peak_rss_mb", base["peak_rss_mb"], cur["peak_rss_mb"]))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Superstore end-to-end benchmark")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engine", default="hist_gb", help="training engine (rf_dense is slow at millions of rows)")
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "superstore_bench"))
+    parser.add_argument("--no-reuse", action="store_true", help="regenerate the synthetic CSV")
+    parser.add_argument("--out", default=None, help="results JSON (default bench_results/bench_<rows>.json)")
+    parser.add_argument("--baseline", default=None, help="baseline JSON (default bench_results/baseline_<rows>.json)")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--max-slowdown", type=float, default=0.25, help="allowed relative time increase")
+    parser.add_argument("--max-memory-growth", type=float, default=0.25, help="allowed relative peak RSS increase")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="absolute slack per stage (timer noise)")
+    parser.add_argument("--min-mb", type=float, default=16.0, help="absolute slack per stage (allocator noise)")
+    args = parser.parse_args(argv)
+
+    results_dir = Path(ROOT_DIR) / "bench_results"
+    out = Path(args.out or results_dir / f"bench_{args.rows}.json")
+    baseline_path = Path(args.baseline or results_dir / f"baseline_{args.rows}.json")
+
+    print(f"Benchmark: {args.rows:,} rows, engine={args.engine}")
+    results = run_suite(args.rows, Path(args.workdir), args.seed, args.engine, args.stages, not args.no_reuse)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2))
+    print(f"Results: {out}")
+
+    if args.update_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(results, indent=2))
+        print(f"Baseline updated: {baseline_path}")
+        return 0
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}; run with --update-baseline to create one")
+        return 0
+    baseline = json.loads(baseline_path.read_text())
+    if baseline["meta"]["rows"] != args.rows:
+        print(f"Baseline was recorded at {baseline['meta']['rows']:,} rows; not comparable")
+        return 2
+    regressions = compare(results, baseline, args.max_slowdown, args.max_memory_growth, args.min_seconds, args.min_mb)
+    for name, metric, base, cur in regressions:
+        print(f"REGRESSION {name}.{metric}: {base:.2f} -> {cur:.2f} ({(cur / base - 1) * 100 if base else float('inf'):+.0f}%)")
+    if regressions:
+        return 1
+    print("No regressions against baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Compare training engines on the same stratified split.
+
+    python notebooks/bench_training.py [--csv data/raw/USSuperstoreData.csv] [--engines rf_dense rf_sparse hist_gb]
+                                       [--high-card target]   # also use City/State/Postal Code/Product ID/Customer ID
+
+Each engine trains in its own process so the reported peak RSS (ru_maxrss above the
+post-load baseline) is not polluted by the others. Reports fit time, peak memory, pickled
+model size, predict_proba throughput on the test split and accuracy/precision/recall/F1.
+"""
+import argparse
+import io
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import os
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # parent of /notebooks
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+# ------------------------------------
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024  # bytes on macOS, KB on Linux
+
+def run_engine(engine: str, csv_path: str, high_card: str = None, random_state: int = 42) -> dict:
+    from joblib import dump
+    from src.data_preprocessing import load_superstore_dataset
+    from src.model_training import build_pipeline, training_split, classification_metrics, get_high_cardinality_columns
+
+    df = load_superstore_dataset(csv_path)
+    extra = get_high_cardinality_columns(df) if high_card else []
+    X_train, X_test, y_train, y_test, _, num_features, cat_features = training_split(
+        df, random_state=random_state, extra_features=extra
+    )
+    del df
+    baseline = peak_rss_mb()
+    pipe = build_pipeline(num_features, cat_features, engine=engine, random_state=random_state,
+                          high_card_features=extra, high_card_encoding=high_card or "target")
+
+    t0 = time.perf_counter()
+    pipe.fit(X_train, y_train)
+    fit_s = time.perf_counter() - t0
+    peak = peak_rss_mb() - baseline
+
+    t0 = time.perf_counter()
+    proba = pipe.predict_proba(X_test)
+    predict_s = time.perf_counter() - t0
+    y_pred = pipe.classes_.take(proba.argmax(axis=1))
+
+    buf = io.BytesIO()
+    dump(pipe, buf)
+    metrics = classification_metrics(y_test, y_pred)
+    metrics.pop("report")
+    return {"engine": engine, "n_train": len(X_train), "n_test": len(X_test), "fit_s": fit_s,
+            "peak_mb": peak, "model_mb": buf.tell() / 1e6, "predict_rows_per_s": len(X_test) / predict_s,
+            **metrics}
+
+def main():
+    from src.model_training import TRAINING_ENGINES, HIGH_CARD_ENCODINGS
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--csv", default="data/raw/USSuperstoreData.csv")
+    parser.add_argument("--engines", nargs="+", default=list(TRAINING_ENGINES), choices=TRAINING_ENGINES)
+    parser.add_argument("--high-card", choices=HIGH_CARD_ENCODINGS)
+    parser.add_argument("--worker", choices=TRAINING_ENGINES)
+    args = parser.parse_args()
+    if args.worker:
+        print(json.dumps(run_engine(args.worker, args.csv, args.high_card)))
+        return
+
+    rows = []
+    for engine in args.engines:
+        cmd = [sys.executable, "-W", "ignore", __file__, "--worker", engine, "--csv", args.csv]
+        if args.high_card:
+            cmd += ["--high-card", args.high_card]
+        out = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT_DIR)
+        if out.returncode != 0:
+            print(f"{engine:<10} failed: {out.stderr.strip().splitlines()[-1]}")
+            continue
+        rows.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    if not rows:
+        return
+
+    print(f"train/test rows: {rows[0]['n_train']:,}/{rows[0]['n_test']:,}")
+    print(f"{'engine':<10} {'fit s':>7} {'peak MB':>8} {'model MB':>9} {'pred rows/s':>12} "
+          f"{'acc':>6} {'prec':>6} {'rec':>6} {'f1':>6}")
+    for r in rows:
+        print(f"{r['engine']:<10} {r['fit_s']:7.2f} {r['peak_mb']:8.1f} {r['model_mb']:9.1f} "
+              f"{r['predict_rows_per_s']:12,.0f} {r['accuracy']:6.3f} {r['precision']:6.3f} "
+              f"{r['recall']:6.3f} {r['f1']:6.3f}")
+
+if __name__ == "__main__":
+    main()
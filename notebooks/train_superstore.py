@@ -7,13 +7,23 @@ if ROOT_DIR not in sys.path:
 # ------------------------------------
 
 from src.model_training import train_profit_classifier
+from src.feature_store import DEFAULT_STORE_DIR
 
 if __name__ == "__main__":
     CSV_PATH = "data/raw/USSuperstoreData.csv"
     MODEL_OUT = "models/model_profit_clf.joblib"
+    ENGINE = sys.argv[1] if len(sys.argv) > 1 else "rf_dense"  # rf_dense | rf_sparse | hist_gb
+    HIGH_CARD = (sys.argv[2] or None) if len(sys.argv) > 2 else None  # None | hash | target | frequency | rare
+    CV = sys.argv[3] if len(sys.argv) > 3 else None            # None | stratified | time (threshold tuning)
     Path("models").mkdir(parents=True, exist_ok=True)
 
-    result = train_profit_classifier(CSV_PATH, MODEL_OUT)
+    result = train_profit_classifier(CSV_PATH, MODEL_OUT, engine=ENGINE, high_card_encoding=HIGH_CARD,
+                                     feature_store=DEFAULT_STORE_DIR, cv=CV)
     print("Training done ✅")
     print("Metrics:", result["metrics"])
+    print("Feature store:", result["feature_store"])
+    if result["cv"]:
+        print("CV average precision:", result["cv"]["average_precision"])
+        print("Threshold:", result["threshold"], result["cv"]["threshold"])
     print("Model saved to:", result["model_path"])
+    print("Artifact saved to:", result["artifact_path"])
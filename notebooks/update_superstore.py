@@ -0,0 +1,29 @@
+from pathlib import Path
+
+import os, sys
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))  # parent of /notebooks
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+# ------------------------------------
+
+from src.incremental_training import update_profit_classifier
+
+if __name__ == "__main__":
+    CSV_PATH = sys.argv[1] if len(sys.argv) > 1 else "data/raw/USSuperstoreData.csv"
+    MODEL_OUT = "models/model_profit_clf.joblib"
+    STRATEGY = sys.argv[2] if len(sys.argv) > 2 else "warm_start"  # warm_start | sliding_window
+    Path("models").mkdir(parents=True, exist_ok=True)
+
+    result = update_profit_classifier(CSV_PATH, MODEL_OUT, strategy=STRATEGY)
+    if result.get("skipped_backdated"):
+        print(f"⚠️ {result['skipped_backdated']} baris baru bertanggal sebelum watermark Order Date dilewati "
+              "(file tanpa Row ID); jalankan training penuh untuk memasukkannya")
+    if result["status"] == "up_to_date":
+        print("Tidak ada baris baru sejak watermark:", result["watermark"])
+        sys.exit(0)
+    print(f"Update ({result['mode']}) done ✅ — {result['new_rows']} baris baru, {result['n_trees']} trees")
+    print("Metrics:", {k: round(v, 4) for k, v in result["metrics"].items() if k != "report"})
+    if result["drift_vs_full"] is not None:
+        print("Selisih vs full retrain:", {k: round(v, 4) for k, v in result["drift_vs_full"].items()})
+        print("⚠️ Drift melebihi toleransi" if result["drifted"] else "Tidak ada drift berarti")
+    print("Model saved to:", result["model_path"])
@@ -0,0 +1,136 @@
+import time
+from typing import Callable, Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from .model_training import HIGH_CARDINALITY_COLUMNS
+from .history_features import HistoryState, history_feature_columns
+from .model_utils import DEFAULT_THRESHOLD, model_history_columns, model_threshold
+from .instrumentation import instrumented
+
+# Model input columns expected in a batch file (pemisah ';', desimal ',')
+REQUIRED_COLUMNS = ["Sales", "Quantity", "Discount", "Ship Mode", "Segment", "Category", "Sub-Category", "Region", "Days_to_Ship"]
+DEFAULT_BATCH_CHUNKSIZE = 50_000
+
+def prepare_batch_frame(batch_df: pd.DataFrame) -> pd.DataFrame:
+    """Derive Days_to_Ship from Order/Ship Date when the file does not carry it."""
+    cols = set(batch_df.columns)
+    if "Days_to_Ship" not in cols and {"Order Date", "Ship Date"}.issubset(cols):
+        od = pd.to_datetime(batch_df["Order Date"], errors="coerce", dayfirst=True)
+        sd = pd.to_datetime(batch_df["Ship Date"], errors="coerce", dayfirst=True)
+        batch_df["Days_to_Ship"] = (sd - od).dt.days
+    return batch_df
+
+def history_input_columns(model) -> list:
+    """Columns a frame needs so `model`'s history features can be computed ([] without history)."""
+    state = getattr(model, "history_state_", None)
+    return state.input_columns() if state is not None and model_history_columns(model) else []
+
+def missing_columns(df: pd.DataFrame, model=None) -> list:
+    required = REQUIRED_COLUMNS + [c for c in history_input_columns(model) if c not in REQUIRED_COLUMNS]
+    return [c for c in required if c not in df.columns]
+
+def add_model_history(model, df: pd.DataFrame, state: Optional[HistoryState] = None,
+                      absorb: bool = False) -> pd.DataFrame:
+    """
+    df with the history features `model` was trained with, from its saved HistoryState (or `state`)
+    plus df's own earlier-day orders; Order Date strings are parsed day-first as in the batch files.
+    absorb=True also adds df's orders to `state` (chunked files: later chunks see earlier ones).
+    Unchanged for models without history features; ValueError when the model has no state.
+    """
+    cols = model_history_columns(model)
+    if not cols:
+        return df
+    state = state if state is not None else getattr(model, "history_state_", None)
+    if state is None:
+        raise ValueError("Model was trained with history features but carries no history state")
+    inputs = df[[c for c in state.input_columns() + ["Discount"] if c in df.columns]]
+    if "Order Date" in inputs.columns and not pd.api.types.is_datetime64_any_dtype(inputs["Order Date"]):
+        inputs = inputs.assign(**{"Order Date": pd.to_datetime(inputs["Order Date"], errors="coerce", dayfirst=True)})
+    if "Order Date" not in inputs.columns:
+        feats = pd.DataFrame(np.nan, index=df.index, columns=cols)
+    else:
+        feats = state.update(inputs) if absorb else state.features(inputs)
+    feats = feats.reindex(columns=cols)
+    return pd.concat([df.drop(columns=cols, errors="ignore"), feats], axis=1)
+
+@instrumented("model.predict")
+def score_frame(model, df: pd.DataFrame, threshold: Optional[float] = None,
+                history: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (labels, P(profitable)) from a single predict_proba pass.
+    Labels use `threshold` (default: the one stored with the model, see model_threshold); at 0.5
+    they are classes_[argmax], i.e. exactly what model.predict would return.
+    High-cardinality columns (City, Product ID, ...) are passed along when the frame has them;
+    models trained without them ignore them, models trained with them fill absent ones.
+    History features are computed with add_model_history (history=False: df already has them).
+    """
+    if history:
+        df = add_model_history(model, df)
+    optional = HIGH_CARDINALITY_COLUMNS + history_feature_columns()
+    proba = model.predict_proba(df[REQUIRED_COLUMNS + [c for c in optional if c in df.columns]])
+    classes = np.asarray(model.classes_)
+    pos = int(np.flatnonzero(classes == 1)[0]) if (classes == 1).any() else proba.shape[1] - 1
+    threshold = model_threshold(model) if threshold is None else threshold
+    if threshold == DEFAULT_THRESHOLD or len(classes) != 2:
+        labels = classes.take(proba.argmax(axis=1))
+    else:
+        labels = classes.take(np.where(proba[:, pos] >= threshold, pos, 1 - pos))
+    return labels, proba[:, pos]
+
+def count_data_rows(source) -> int:
+    """Number of data lines (excluding the header) without parsing; rewinds file-like sources."""
+    n = 0
+    last = b"\n"
+    f = open(source, "rb") if isinstance(source, str) else source
+    try:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            n += block.count(b"\n")
+            last = block[-1:]
+    finally:
+        if isinstance(source, str):
+            f.close()
+        else:
+            f.seek(0)
+    if last != b"\n":
+        n += 1  # last line without trailing newline
+    return max(n - 1, 0)
+
+@instrumented("model.batch_score")
+def score_csv(model, source, dest, chunksize: int = DEFAULT_BATCH_CHUNKSIZE,
+              progress: Optional[Callable[[int, int], None]] = None,
+              on_first_chunk: Optional[Callable[[pd.DataFrame], None]] = None) -> Dict:
+    """
+    Stream a batch CSV (';' separator, ',' decimal) through the model chunk by chunk and append
+    the input columns + Pred_Profitable + Proba_Profit to `dest` (path or text buffer) as CSV.
+    progress(rows_done, rows_total) is called after each chunk; on_first_chunk receives the first
+    scored chunk (for previews). Raises ValueError when required columns are missing.
+    Models with history features see the orders of earlier chunks as history too.
+    """
+    total = count_data_rows(source)
+    history = getattr(model, "history_state_", None)
+    history = history.copy() if history is not None else None
+    done = 0
+    t0 = time.perf_counter()
+    # IDs/codes stay text (keeps leading zeros of Postal Code, as in training)
+    reader = pd.read_csv(source, sep=";", decimal=",", chunksize=chunksize,
+                         dtype={c: str for c in HIGH_CARDINALITY_COLUMNS})
+    with reader:
+        for i, chunk in enumerate(reader):
+            chunk = prepare_batch_frame(chunk)
+            if i == 0:
+                missing = missing_columns(chunk, model)
+                if missing:
+                    raise ValueError(f"Kolom wajib tidak lengkap: {missing}")
+            scored = add_model_history(model, chunk, history, absorb=True) if history is not None else chunk
+            labels, proba = score_frame(model, scored, history=False)
+            chunk["Pred_Profitable"] = labels
+            chunk["Proba_Profit"] = proba
+            chunk.to_csv(dest, index=False, header=(i == 0), mode="w" if i == 0 else "a")
+            if i == 0 and on_first_chunk is not None:
+                on_first_chunk(chunk)
+            done += len(chunk)
+            if progress is not None:
+                progress(done, total)
+    seconds = time.perf_counter() - t0
+    return {"rows": done, "seconds": seconds, "rows_per_sec": done / seconds if seconds > 0 else float("nan")}
@@ -0,0 +1,44 @@
+from typing import Callable, Iterable, Optional, Tuple
+import pandas as pd
+
+from .rollup import RollupView, merge_rollups, rollup_cells
+
+def reduce_eda_aggregates(chunks: Iterable[pd.DataFrame], merge_every: int = 16) -> Optional[RollupView]:
+    """
+    Reduce featurized chunks (see iter_superstore_csv, ParquetDataset.iter_batches) into the
+    RollupView the EDA page reads (KPIs, per Category/Sub-Category, monthly). Each chunk becomes
+    rollup cells + HyperLogLog Order ID sketches right away and partial results are merged every
+    `merge_every` chunks, so memory is bounded by the number of (month, dimension) cells, not by
+    rows or distinct orders. None when there are no chunks.
+    """
+    cells, pairs = [], []
+    has_orders = has_target = False
+    for chunk in chunks:
+        has_orders |= "Order ID" in chunk.columns
+        has_target |= "Profitable" in chunk.columns
+        c, p = rollup_cells(chunk)
+        cells.append(c)
+        pairs.append(p)
+        if len(cells) >= merge_every:
+            c, p = merge_rollups(cells, pairs)
+            cells, pairs = [c], [p]
+    if not cells:
+        return None
+    c, p = merge_rollups(cells, pairs)
+    return RollupView(c, p, has_orders=has_orders, has_target=has_target)
+
+def collect_training_frame(chunks: Iterable[pd.DataFrame],
+                           feature_columns: Callable[[pd.DataFrame], Tuple[list, list]],
+                           target: str = "Profitable") -> pd.DataFrame:
+    """
+    Keep only the model features (as returned by `feature_columns`, e.g. get_feature_columns)
+    and the target of each chunk, dropping rows without a target, so the training frame
+    never holds the wide string columns of the full export.
+    """
+    parts = []
+    for chunk in chunks:
+        num_features, cat_features = feature_columns(chunk)
+        parts.append(chunk.loc[chunk[target].notna(), num_features + cat_features + [target]])
+    if not parts:
+        return pd.DataFrame()
+    return pd.concat(parts, ignore_index=True)
@@ -0,0 +1,133 @@
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+
+# Array names persisted for a compiled forest (see model_training.export_compiled_forest)
+FOREST_ARRAYS = ("left", "right", "feature", "threshold", "missing_left", "leaf_proba", "roots", "enc_source")
+# Optional precomputed hot-path layouts; persisted so memory-mapped artifacts need no private copies
+DERIVED_ARRAYS = ("children",)
+SMALL_BATCH_ROWS = 64
+
+def interleave_children(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """[left0, right0, left1, right1, ...] so the next node is children[2*node + went_right]."""
+    children = np.empty(2 * len(left), dtype=left.dtype)
+    children[0::2] = left
+    children[1::2] = right
+    return children
+
+class CompiledForest:
+    """
+    Array-only evaluator for a fitted Pipeline(ColumnTransformer(OneHotEncoder + passthrough),
+    RandomForestClassifier), produced by model_training.export_compiled_forest.
+
+    All trees live in flat node arrays (children, split feature, threshold, missing-value direction,
+    per-class leaf probabilities); rows are routed through every tree at once, one depth level per step.
+    Needs only NumPy/pandas at inference time and exposes predict/predict_proba/classes_ like the pipeline.
+
+    meta: input_columns, categories {column: [values]}, classes.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Dict):
+        missing = [k for k in FOREST_ARRAYS if k not in arrays]
+        if missing:
+            raise ValueError(f"Compiled forest is missing arrays: {missing}")
+        self.arrays = arrays
+        self.meta = meta
+        for k in FOREST_ARRAYS:
+            setattr(self, k, np.asarray(arrays[k]))  # plain ndarray views: memmap subclass indexing is slower
+        self.input_columns: List[str] = list(meta["input_columns"])
+        self.categories: Dict[str, list] = {c: list(v) for c, v in meta["categories"].items()}
+        self.classes_ = np.asarray(meta["classes"])
+        self.n_trees = len(self.roots)
+        self.n_encoded = len(self.enc_source)
+
+        # Hot-path layouts: interleaved children (2*node + went_right), NaN handling only if needed
+        self._is_leaf = self.left < 0
+        self._children = np.asarray(arrays["children"]) if "children" in arrays else None
+        if self._children is None:
+            self._children = interleave_children(self.left, self.right)
+        self._blocks = []  # (input column, first encoded column, category index or None, has NaN category)
+        for j, col in enumerate(self.input_columns):
+            cols = np.flatnonzero(self.enc_source == j)
+            if not len(cols):
+                continue
+            if col in self.categories:
+                cats = self.categories[col]
+                known = pd.Index([c for c in cats if not pd.isna(c)], dtype=object)
+                lookup = {v: i for i, v in enumerate(known)}
+                self._blocks.append((col, int(cols[0]), (known, lookup), len(known) < len(cats)))
+            else:
+                self._blocks.append((col, int(cols[0]), None, False))
+
+    # ------------------------------------------------------------------ encode
+    def encode(self, X) -> np.ndarray:
+        """
+        Raw features (DataFrame, array or dict records) -> encoded float64 matrix laid out like the ColumnTransformer output
+        (unknown categories encode as all zeros, like handle_unknown="ignore"). Numeric inputs are
+        rounded through float32, as sklearn trees do before comparing against thresholds.
+        """
+        if isinstance(X, dict):
+            X = [X]
+        if isinstance(X, list) and all(isinstance(r, dict) for r in X):
+            # JSON-style records: read columns straight from the dicts, no DataFrame round trip
+            column = lambda col: np.array([r.get(col) for r in X], dtype=object)
+        else:
+            if not isinstance(X, pd.DataFrame):
+                X = pd.DataFrame(X, columns=self.input_columns)
+            column = lambda col: X[col].to_numpy()
+        out = np.zeros((len(X), self.n_encoded), dtype=np.float64)
+        small = len(X) <= SMALL_BATCH_ROWS
+        for col, first, cat_lookup, nan_is_category in self._blocks:
+            values = column(col)
+            if cat_lookup is not None:
+                # One-hot block is contiguous in category order; NaN (if seen in training) is last
+                known, lookup = cat_lookup
+                if small:  # dict lookups beat Index.get_indexer's fixed overhead on a few rows
+                    codes = np.array([lookup.get(v, -1) for v in values], dtype=np.intp)
+                else:
+                    codes = known.get_indexer(values.astype(object))
+                if nan_is_category:
+                    codes[pd.isna(values)] = len(known)
+                hit = np.flatnonzero(codes >= 0)
+                out[hit, first + codes[hit]] = 1.0
+            else:
+                num = pd.to_numeric(values, errors="coerce") if values.dtype == object else values
+                out[:, first] = np.asarray(num, dtype=np.float64).astype(np.float32)
+        return out
+
+    # ----------------------------------------------------------------- predict
+    def _leaves(self, Xe: np.ndarray) -> np.ndarray:
+        """Leaf node index (global) per (row, tree); finished (row, tree) pairs drop out each level."""
+        n, width = Xe.shape
+        node = np.tile(self.roots, n)                               # flat (row, tree)
+        base = np.repeat(np.arange(n, dtype=np.intp) * width, self.n_trees)
+        flat = Xe.ravel()
+        has_nan = bool(np.isnan(flat).any())
+        active = np.flatnonzero(~self._is_leaf[node])
+        while len(active):
+            nd = node[active]
+            x = flat[base[active] + self.feature[nd]]
+            went_right = x > self.threshold[nd]
+            if has_nan:
+                nan = np.isnan(x)
+                went_right[nan] = ~self.missing_left[nd[nan]]
+            nd = self._children[2 * nd + went_right]
+            node[active] = nd
+            active = active[~self._is_leaf[nd]]
+        return node.reshape(n, self.n_trees)
+
+    def predict_proba(self, X, block_rows: int = 2048) -> np.ndarray:
+        """Class probabilities (mean of per-tree leaf distributions); rows are routed in blocks to bound memory."""
+        Xe = self.encode(X)
+        out = np.empty((Xe.shape[0], len(self.classes_)))
+        for start in range(0, Xe.shape[0], block_rows):
+            leaves = self._leaves(Xe[start:start + block_rows])
+            for k in range(out.shape[1]):
+                out[start:start + len(leaves), k] = self.leaf_proba[:, k][leaves].mean(axis=1)
+        return out
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(self.predict_proba(X).argmax(axis=1))
+
+    def derived_arrays(self) -> Dict[str, np.ndarray]:
+        return {"children": self._children}
@@ -1,12 +1,149 @@
+import hashlib
+import inspect
+import json
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from glob import glob
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
 import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+from .instrumentation import instrumented
+from .worker_pool import worker_context
 
-def read_superstore_csv(path: str) -> pd.DataFrame:
+DEFAULT_CACHE_DIR = "data/cache"
+CACHE_FORMAT_VERSION = 1
+DEFAULT_CHUNKSIZE = 200_000
+PARSE_ENGINES = ("pandas", "fast")
+# Cells read as missing by both parse engines (pandas' default NA tokens, spelled out so both engines agree)
+NA_VALUES = ("", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+             "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null")
+# Day-first layouts tried when pandas can't guess the format (it has no guess for 2-digit years: 08/11/16)
+DATE_FORMATS = ("%d/%m/%y", "%d/%m/%Y", "%Y-%m-%d", "%d-%m-%y", "%d-%m-%Y", "%d.%m.%y", "%d.%m.%Y")
+
+@instrumented("parse.read_csv")
+def read_superstore_csv(path: str, engine: str = "pandas", date_format: Optional[str] = None) -> pd.DataFrame:
     """
     Read Superstore CSV that uses semicolon (;) separator and comma decimal (e.g., 261,96).
     Auto-fixes common types: dates, numeric columns, strip spaces.
+    engine="fast" reads with pyarrow and converts each distinct value only once;
+    the result is identical to engine="pandas".
+    """
+    if engine not in PARSE_ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {PARSE_ENGINES}")
+    if engine == "fast":
+        df = _read_raw_pyarrow(path)
+    else:
+        # Read as string first to normalize manually
+        df = pd.read_csv(path, sep=';', dtype=str, encoding='latin1',
+                         na_values=list(NA_VALUES), keep_default_na=False)
+    return normalize_superstore_frame(df, engine=engine, date_format=date_format)
+
+def iter_superstore_csv(path, chunksize: int = DEFAULT_CHUNKSIZE, features: bool = True,
+                        engine: str = "pandas", date_format: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """
+    Stream a Superstore CSV in chunks of `chunksize` rows, each normalized like
+    read_superstore_csv (and featurized with add_basic_features when `features`).
+    Only one raw string chunk is alive at a time, so peak memory is bounded by the chunk size.
     """
-    # Read as string first to normalize manually
-    df = pd.read_csv(path, sep=';', dtype=str, encoding='latin1')
+    from .feature_engineering import add_basic_features
+
+    reader = pd.read_csv(path, sep=';', dtype=str, encoding='latin1',
+                         na_values=list(NA_VALUES), keep_default_na=False, chunksize=chunksize)
+    with reader:
+        for raw in reader:
+            chunk = normalize_superstore_frame(raw, engine=engine, date_format=date_format)
+            del raw
+            yield add_basic_features(chunk) if features else chunk
+
+def _read_raw_pyarrow(path) -> pd.DataFrame:
+    """
+    All-string read through pyarrow's multithreaded CSV reader, with the same NA tokens
+    as pandas. Falls back to the pandas reader when pyarrow is not installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+    except ImportError:
+        return pd.read_csv(path, sep=';', dtype=str, encoding='latin1',
+                           na_values=list(NA_VALUES), keep_default_na=False)
+
+    read_opts = pacsv.ReadOptions(encoding='latin1')
+    parse_opts = pacsv.ParseOptions(delimiter=';')
+    # Column types must be given by name; pyarrow would otherwise infer ints (e.g. Postal Code 05408 -> 5408)
+    names = pacsv.open_csv(path, read_options=read_opts, parse_options=parse_opts).schema.names
+    if hasattr(path, "seek"):
+        path.seek(0)
+    convert_opts = pacsv.ConvertOptions(
+        column_types={n: pa.string() for n in names},
+        null_values=list(NA_VALUES),
+        strings_can_be_null=True,
+        quoted_strings_can_be_null=True,
+    )
+    table = pacsv.read_csv(path, read_options=read_opts, parse_options=parse_opts, convert_options=convert_opts)
+    return table.to_pandas()
+
+def _map_unique(s: pd.Series, convert: Callable[[pd.Series], pd.Series]) -> pd.Series:
+    """
+    Apply `convert` to the distinct values of `s` only and broadcast the result back.
+    NaN is kept as its own value and the distinct values keep their order of appearance,
+    so dtype inference (and format inference for dates) sees the same inputs as a full pass.
+    """
+    codes, uniques = pd.factorize(s, use_na_sentinel=False)
+    converted = convert(pd.Series(uniques, dtype=s.dtype, name=s.name))
+    return pd.Series(converted.array.take(codes), index=s.index, name=s.name)
+
+def _to_number(s: pd.Series, as_int: bool = False) -> pd.Series:
+    # Replace decimal comma with dot, remove thousand separators if any
+    s = (
+        s.str.replace('.', '', regex=False)  # remove thousands like 1.234,56 (EU)
+         .str.replace(',', '.', regex=False) # decimal comma -> dot
+    )
+    # Quantity should be int if possible
+    if as_int:
+        return pd.to_numeric(s, errors='coerce').astype('Int64')
+    return pd.to_numeric(s, errors='coerce')
+
+def _guess_date_format(s: pd.Series) -> Optional[str]:
+    """
+    Format of the first non-missing value (the one pandas' own inference looks at), or None.
+    Values in another layout then become NaT, as when pandas infers the format itself.
+    """
+    first = s.dropna()
+    if first.empty:
+        return None
+    first = str(first.iloc[0]).strip()
+    fmt = guess_datetime_format(first, dayfirst=True)
+    if fmt:
+        return fmt
+    for fmt in DATE_FORMATS:
+        try:
+            pd.to_datetime(first, format=fmt)
+            return fmt
+        except ValueError:
+            continue
+    return None
+
+def _to_date(s: pd.Series, date_format: Optional[str] = None) -> pd.Series:
+    fmt = date_format or _guess_date_format(s)
+    if fmt:
+        return pd.to_datetime(s, errors='coerce', format=fmt)
+    with warnings.catch_warnings():  # no common format: element-wise dateutil parsing is intended here
+        warnings.filterwarnings("ignore", message="Could not infer format", category=UserWarning)
+        return pd.to_datetime(s, errors='coerce', dayfirst=True)
+
+def normalize_superstore_frame(df: pd.DataFrame, engine: str = "pandas", date_format: Optional[str] = None) -> pd.DataFrame:
+    """Normalize an all-string Superstore frame (numbers, dates, whitespace, column names)."""
+    if engine == "fast":
+        convert = _map_unique
+    else:
+        convert = lambda s, fn: fn(s)
 
     # Standardize column names (strip spaces)
     df.columns = [c.strip() for c in df.columns]
@@ -15,28 +152,239 @@ def read_superstore_csv(path: str) -> pd.DataFrame:
     num_cols = ["Sales", "Profit", "Quantity", "Discount"]
     for col in num_cols:
         if col in df.columns:
-            # Replace decimal comma with dot, remove thousand separators if any
-            df[col] = (
-                df[col]
-                .str.replace('.', '', regex=False)  # remove thousands like 1.234,56 (EU)
-                .str.replace(',', '.', regex=False) # decimal comma -> dot
-            )
-            # Quantity should be int if possible
-            if col == "Quantity":
-                df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
-            else:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
+            df[col] = convert(df[col], lambda s: _to_number(s, as_int=(col == "Quantity")))
 
     # Dates
     for dcol in ["Order Date", "Ship Date", "Order Date ", "Ship Date "]:
         if dcol in df.columns:
-            df[dcol.strip()] = pd.to_datetime(df[dcol], errors='coerce', dayfirst=True)
+            df[dcol.strip()] = convert(df[dcol], lambda s: _to_date(s, date_format))
 
     # Trim whitespace for categoricals
-    df = df.apply(lambda s: s.str.strip() if s.dtype == "object" else s)
+    # (object or pandas' "str" dtype: with pandas >= 3 text columns are no longer object)
+    df = df.apply(lambda s: convert(s, lambda v: v.str.strip()) if pd.api.types.is_string_dtype(s.dtype) else s)
 
     # Unify canonical date column names
     if "Order Date " in df.columns: df = df.rename(columns={"Order Date ": "Order Date"})
     if "Ship Date " in df.columns:  df = df.rename(columns={"Ship Date ": "Ship Date"})
 
     return df
+
+
+def row_id_column(df: pd.DataFrame) -> Optional[str]:
+    """
+    Name of the Row ID column, tolerating the UTF-8 byte-order mark of the export
+    (read as latin1 it arrives as "ï»¿Row ID"); None when the frame has no Row ID.
+    """
+    for c in df.columns:
+        if str(c).replace("ï»¿", "").lstrip("\ufeff").strip() == "Row ID":
+            return c
+    return None
+
+def file_fingerprint(path: str, chunk_size: int = 1 << 20) -> str:
+    """Content hash (blake2b) of a file, read in blocks so large exports stay cheap on memory."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Content hash of a frame (column names + per-row value hashes); categorical codes don't matter."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update("|".join(map(str, df.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+def normalization_fingerprint() -> str:
+    """Hash of the normalization/feature code, so cached outputs expire when the code changes."""
+    from . import feature_engineering
+    h = hashlib.blake2b(digest_size=16)
+    h.update(inspect.getsource(sys.modules[__name__]).encode("utf-8"))
+    h.update(inspect.getsource(feature_engineering).encode("utf-8"))
+    h.update(f"{pd.__version__}|{CACHE_FORMAT_VERSION}".encode("utf-8"))
+    return h.hexdigest()
+
+def _cached_content_hash(path: Path, manifest_path: Path) -> str:
+    """
+    Reuse the content hash recorded in the manifest when size and mtime are unchanged,
+    otherwise re-hash the file.
+    """
+    st = path.stat()
+    if manifest_path.exists():
+        try:
+            manifest = json.loads(manifest_path.read_text())
+            if manifest.get("size") == st.st_size and manifest.get("mtime_ns") == st.st_mtime_ns:
+                return manifest["content_hash"]
+        except (ValueError, KeyError):
+            pass
+    return file_fingerprint(str(path))
+
+@instrumented("load.dataset")
+def load_superstore_dataset(path: str, cache_dir: str = DEFAULT_CACHE_DIR, use_cache: bool = True,
+                            engine: str = "fast") -> pd.DataFrame:
+    """
+    read_superstore_csv + add_basic_features, served from a Parquet copy when possible.
+    The cache key combines the CSV content hash with a hash of the normalization code,
+    so a changed file or a changed pipeline both trigger a fresh parse. Cache entries are named
+    per resolved source path (same-named files in different folders don't evict each other).
+    """
+    from .feature_engineering import add_basic_features
+
+    src = Path(path)
+    if not use_cache:
+        return add_basic_features(read_superstore_csv(str(src), engine=engine))
+
+    cache = Path(cache_dir)
+    source_id = hashlib.blake2b(str(src.resolve()).encode("utf-8"), digest_size=6).hexdigest()
+    entry = f"{src.stem}.{source_id}"  # stem kept for readability, hash for uniqueness
+    manifest_path = cache / f"{entry}.json"
+    content_hash = _cached_content_hash(src, manifest_path)
+    key = hashlib.blake2b(f"{content_hash}|{normalization_fingerprint()}".encode("utf-8"), digest_size=16).hexdigest()
+    parquet_path = cache / f"{entry}-{key}.parquet"
+
+    if parquet_path.exists():
+        try:
+            return pd.read_parquet(parquet_path)
+        except Exception:
+            parquet_path.unlink(missing_ok=True)  # corrupt/partial file -> rebuild
+
+    df = add_basic_features(read_superstore_csv(str(src), engine=engine))
+
+    # Write atomically (per-process temp names: ingestion workers may cache concurrently)
+    # and drop stale copies of the same source
+    cache.mkdir(parents=True, exist_ok=True)
+    for old in cache.glob(f"{entry}-*.parquet"):
+        if old != parquet_path:
+            old.unlink(missing_ok=True)
+    tmp = parquet_path.with_name(f".{parquet_path.name}.tmp-{os.getpid()}")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, parquet_path)
+    st = src.stat()
+    tmp = manifest_path.with_name(f".{manifest_path.name}.tmp-{os.getpid()}")
+    tmp.write_text(json.dumps({
+        "source": str(src.resolve()),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "content_hash": content_hash,
+        "cache_key": key,
+        "rows": int(len(df)),
+    }, indent=2))
+    os.replace(tmp, manifest_path)
+    return df
+
+# --------------------------- Multi-file ingestion ------------------------------
+def resolve_superstore_files(source: Union[str, Sequence[str]]) -> List[str]:
+    """A directory (its *.csv files), a glob pattern or a list of paths -> sorted CSV paths."""
+    if not isinstance(source, (str, Path)):
+        return [str(p) for p in source]
+    path = Path(source)
+    if path.is_dir():
+        return sorted(str(p) for p in path.iterdir() if p.is_file() and p.suffix.lower() == ".csv")
+    if path.is_file():
+        return [str(path)]
+    return sorted(glob(str(source)))
+
+def _load_partition(source, engine: str, cache_dir: str, use_cache: bool, categorical: bool) -> pd.DataFrame:
+    """
+    One file (path, served from the Parquet cache when possible) or upload (bytes), featurized.
+    String dimensions are sent back as categoricals: codes pickle far smaller than Python strings.
+    """
+    from .feature_engineering import add_basic_features, CATEGORICAL_COLUMNS
+
+    if isinstance(source, (bytes, bytearray)):
+        import io
+        df = add_basic_features(read_superstore_csv(io.BytesIO(source), engine=engine))
+    else:
+        df = load_superstore_dataset(source, cache_dir=cache_dir, use_cache=use_cache, engine=engine)
+    if categorical:
+        for col in CATEGORICAL_COLUMNS:
+            if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype("category")
+    return df
+
+def unify_partitions(parts: List[pd.DataFrame]) -> List[pd.DataFrame]:
+    """
+    Align partitions in place for a cheap concat: one Row ID column name, categorical columns
+    recoded to the union vocabulary (stable_categories order) and all-empty columns cast to the
+    dtype the other files have, so concat neither falls back to object nor re-encodes strings.
+    """
+    from .feature_engineering import stable_categories
+
+    id_name = next((row_id_column(p) for p in parts if row_id_column(p) is not None), None)
+    columns = list(dict.fromkeys(c for p in parts for c in p.columns))
+    for i, p in enumerate(parts):
+        own = row_id_column(p)
+        if own is not None and own != id_name:  # e.g. one file exported with a BOM, another without
+            parts[i] = p = p.rename(columns={own: id_name})
+
+    for col in columns:
+        present = [p for p in parts if col in p.columns]
+        cats = [p[col].dtype.categories for p in present if isinstance(p[col].dtype, pd.CategoricalDtype)]
+        if cats:
+            dtype = pd.CategoricalDtype(stable_categories(col, pd.Series(cats[0].append(cats[1:]))))
+            for p in present:  # one shared dtype object: concat then skips comparing vocabularies
+                p[col] = p[col].astype(dtype)
+            continue
+        ref = next((p[col].dtype for p in present if p[col].notna().any()), None)
+        if ref is not None:
+            for p in present:
+                if p[col].dtype != ref and not p[col].notna().any():
+                    p[col] = p[col].astype(ref)
+    return parts
+
+@instrumented("load.files", rows=lambda res, args, kwargs: len(res[0]))
+def ingest_superstore_files(sources: Union[str, Sequence], workers: Optional[int] = None, engine: str = "fast",
+                            cache_dir: str = DEFAULT_CACHE_DIR, use_cache: bool = True, dedupe: bool = True,
+                            categorical: bool = True) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Load many Superstore exports (e.g. one per month or region) into one frame.
+
+    `sources` is a directory, a glob, or a list of paths / raw upload bytes. Files are parsed in a
+    process pool (`workers`, default one per CPU) with the same rules as load_superstore_dataset
+    (per-file Parquet cache included), vocabularies and dtypes are unified across files, and rows
+    repeating a Row ID are dropped, keeping the copy from the last file in sorted order (a later
+    export restating a row wins). Duplicates are filtered per part before the single concat.
+    Returns (frame, report) with files, rows read/kept and timings.
+    """
+    sources = resolve_superstore_files(sources) if isinstance(sources, (str, Path)) else list(sources)
+    if not sources:
+        raise FileNotFoundError("No Superstore CSV files found")
+    t0 = time.perf_counter()
+    workers = min(workers or os.cpu_count() or 1, len(sources))
+    load = partial(_load_partition, engine=engine, cache_dir=cache_dir, use_cache=use_cache, categorical=categorical)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=worker_context()) as pool:
+            parts = list(pool.map(load, sources))
+    else:
+        parts = [load(s) for s in sources]
+    parse_seconds = time.perf_counter() - t0
+
+    unify_partitions(parts)
+    rows_read = sum(len(p) for p in parts)
+    id_col = row_id_column(parts[0])
+    if dedupe and id_col is not None and all(id_col in p.columns for p in parts):
+        ids = pd.concat([p[id_col] for p in parts], ignore_index=True)
+        keep = ~ids.duplicated(keep="last").to_numpy()
+        start = 0
+        for i, p in enumerate(parts):
+            mask = keep[start:start + len(p)]
+            start += len(p)
+            if not mask.all():
+                parts[i] = p[mask]
+    df = pd.concat(parts, ignore_index=True)
+    del parts
+
+    report = {
+        "files": len(sources),
+        "workers": workers,
+        "rows_read": rows_read,
+        "rows": int(len(df)),
+        "duplicates_dropped": rows_read - int(len(df)),
+        "parse_seconds": parse_seconds,
+        "seconds": time.perf_counter() - t0,
+    }
+    return df, report
+
+def load_superstore_files(sources: Union[str, Sequence], workers: Optional[int] = None, **kwargs) -> pd.DataFrame:
+    """ingest_superstore_files without the report."""
+    return ingest_superstore_files(sources, workers=workers, **kwargs)[0]
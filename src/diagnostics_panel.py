@@ -0,0 +1,26 @@
+import streamlit as st
+
+from .instrumentation import (
+    METRICS, PROFILE_MODES, profiling_mode, set_profiling, stage_summary, recent_stages,
+    metrics_json, metrics_text
+)
+
+def render_diagnostics_panel():
+    """Sidebar panel "Diagnostik Performa" shared by every page: profiling mode, stage totals, recent stages, exports."""
+    with st.sidebar:
+        with st.expander("Diagnostik Performa"):
+            mode = st.selectbox("Profiling tahap", PROFILE_MODES, index=PROFILE_MODES.index(profiling_mode()),
+                                help="cprofile/sample memprofil tiap tahap terluar (berlaku untuk seluruh proses).")
+            set_profiling(mode)
+            st.caption("Total per tahap sejak proses dimulai (waktu, baris, selisih RSS)")
+            st.dataframe(stage_summary(), use_container_width=True, hide_index=True)
+            st.caption("Tahap terakhir")
+            st.dataframe(recent_stages(limit=30), use_container_width=True, hide_index=True)
+            profiled = [r for r in METRICS.records() if r["profile"]]
+            if profiled:
+                st.caption(f"Profil terakhir: {profiled[-1]['stage']}")
+                st.code(profiled[-1]["profile"], language="text")
+            st.download_button("Unduh metrik (JSON)", data=metrics_json, file_name="stage_metrics.json",
+                               mime="application/json", on_click="ignore")
+            st.download_button("Unduh metrik (teks Prometheus)", data=metrics_text, file_name="stage_metrics.txt",
+                               mime="text/plain", on_click="ignore")
@@ -0,0 +1,93 @@
+from typing import Sequence
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.base import BaseEstimator, TransformerMixin
+
+def _column_salt(name: str) -> np.uint64:
+    """Per-column constant mixed into the value hashes so equal values in different columns land apart."""
+    return np.uint64(pd.util.hash_array(np.array([name], dtype=object))[0])
+
+class ColumnFiller(BaseEstimator, TransformerMixin):
+    """
+    Adds any of `columns` that the input lacks as all-missing, so a pipeline trained with extra
+    (optional) features still scores frames that only carry the base features.
+    """
+
+    def __init__(self, columns: Sequence[str] = ()):
+        self.columns = columns
+
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X):
+        missing = [c for c in self.columns if c not in X.columns]
+        if not missing:
+            return X
+        X = X.copy()
+        for c in missing:
+            X[c] = pd.Series(np.nan, index=X.index, dtype=object)
+        return X
+
+class HashingEncoder(BaseEstimator, TransformerMixin):
+    """
+    Signed feature hashing of categorical columns into a sparse CSR matrix with `n_features`
+    columns (one non-zero per non-missing cell). Stateless apart from the column list, so
+    memory does not depend on the vocabulary size and unseen values need no special handling.
+    """
+
+    def __init__(self, n_features: int = 2 ** 16, alternate_sign: bool = True):
+        self.n_features = n_features
+        self.alternate_sign = alternate_sign
+
+    def fit(self, X, y=None):
+        self.feature_names_in_ = np.asarray(list(X.columns), dtype=object)
+        self.n_features_in_ = len(self.feature_names_in_)
+        return self
+
+    def transform(self, X):
+        n = len(X)
+        rows, cols, vals = [], [], []
+        for name in self.feature_names_in_:
+            values = X[name].astype(object).to_numpy()
+            present = ~pd.isna(values)
+            h = pd.util.hash_array(values[present].astype(str).astype(object), categorize=True) ^ _column_salt(name)
+            rows.append(np.flatnonzero(present))
+            cols.append((h % np.uint64(self.n_features)).astype(np.int64))
+            sign = np.where((h >> np.uint64(63)) == 1, -1.0, 1.0) if self.alternate_sign else np.ones(len(h))
+            vals.append(sign)
+        out = sparse.csr_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+                                shape=(n, self.n_features))
+        out.sum_duplicates()  # cells of different columns colliding in one bucket add up, as in FeatureHasher
+        return out
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray([f"hash_{i}" for i in range(self.n_features)], dtype=object)
+
+class FrequencyEncoder(BaseEstimator, TransformerMixin):
+    """Replaces each category by its share of the training rows (unseen values -> 0); one dense column per input."""
+
+    def __init__(self, min_count: int = 1):
+        self.min_count = min_count
+
+    def fit(self, X, y=None):
+        self.feature_names_in_ = np.asarray(list(X.columns), dtype=object)
+        self.n_features_in_ = len(self.feature_names_in_)
+        self.frequencies_ = {}
+        for name in self.feature_names_in_:
+            counts = X[name].astype(object).value_counts(dropna=False)
+            counts = counts[counts >= self.min_count]
+            self.frequencies_[name] = (pd.Index(counts.index, dtype=object), (counts / len(X)).to_numpy(np.float64))
+        return self
+
+    def transform(self, X):
+        out = np.zeros((len(X), self.n_features_in_), dtype=np.float64)
+        for j, name in enumerate(self.feature_names_in_):
+            index, freq = self.frequencies_[name]
+            codes = index.get_indexer(X[name].astype(object).to_numpy())
+            hit = codes >= 0
+            out[hit, j] = freq[codes[hit]]
+        return out
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray([f"{c}_freq" for c in self.feature_names_in_], dtype=object)
@@ -0,0 +1,146 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .instrumentation import instrumented
+
+# format -> (file suffix, MIME type)
+EXPORT_FORMATS = {
+    "csv": (".csv", "text/csv"),
+    "csv.gz": (".csv.gz", "application/gzip"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+EXPORT_CHUNK_ROWS = 100_000
+GZIP_LEVEL = 6
+DEFAULT_EXPORT_DIR = os.path.join(tempfile.gettempdir(), "superstore_exports")
+DEFAULT_EXPORT_MAX_BYTES = 1024 ** 3
+
+def frame_chunks(df: pd.DataFrame, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Row slices of `df` (views, no copy of the whole frame)."""
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+def csv_chunks(path: str, chunk_rows: int = EXPORT_CHUNK_ROWS, **read_kwargs) -> Iterator[pd.DataFrame]:
+    """An exported/scored CSV read back in chunks (to convert it to another format)."""
+    with pd.read_csv(path, chunksize=chunk_rows, **read_kwargs) as reader:
+        yield from reader
+
+def _parquet_table(chunk: pd.DataFrame, schema: Optional[pa.Schema]) -> pa.Table:
+    # Categoricals as plain strings: Parquet dictionary-encodes them anyway, and chunks with
+    # different category sets then share one schema
+    cats = {c: chunk[c].astype(chunk[c].dtype.categories.dtype) for c in chunk.columns
+            if isinstance(chunk[c].dtype, pd.CategoricalDtype)}
+    if cats:
+        chunk = chunk.assign(**cats)
+    table = pa.Table.from_pandas(chunk, preserve_index=False)
+    return table if schema is None else table.cast(schema)
+
+@instrumented("export.write", rows=lambda res, args, kwargs: res["rows"])
+def write_export(chunks: Iterable[pd.DataFrame], path: str, fmt: str = "csv") -> Dict:
+    """
+    Write frames one after another as one CSV, gzip CSV or Parquet file (one row group per
+    chunk), so the full export never exists as a single string or table. Returns rows/bytes.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {tuple(EXPORT_FORMATS)}")
+    rows = 0
+    if fmt == "parquet":
+        writer = None
+        try:
+            for chunk in chunks:
+                table = _parquet_table(chunk, writer.schema if writer is not None else None)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema, compression="zstd")
+                writer.write_table(table)
+                rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            pq.write_table(pa.table({}), path)
+    else:
+        # gzip level 6 (zlib's default) instead of gzip.open's 9: about a third faster, files ~2% larger
+        f = (gzip.open(path, "wt", compresslevel=GZIP_LEVEL, encoding="utf-8", newline="") if fmt == "csv.gz"
+             else open(path, "w", encoding="utf-8", newline=""))
+        with f:
+            for i, chunk in enumerate(chunks):
+                chunk.to_csv(f, index=False, header=(i == 0))
+                rows += len(chunk)
+    return {"rows": rows, "bytes": os.path.getsize(path)}
+
+def export_key(*parts) -> str:
+    """Cache key from JSON-able parts (dataset identity, filter state, format, ...)."""
+    blob = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.blake2b(blob.encode("utf-8"), digest_size=16).hexdigest()
+
+class ExportCache:
+    """
+    Export files on disk keyed by (dataset, filter state, format), shared by every session.
+    A file is written only when first requested (written to a temp name, then renamed);
+    least recently used files are removed while the directory exceeds `max_bytes`.
+    """
+
+    def __init__(self, root: str = DEFAULT_EXPORT_DIR, max_bytes: int = DEFAULT_EXPORT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, key: str, fmt: str) -> Path:
+        return self.root / f"{key}{EXPORT_FORMATS[fmt][0]}"
+
+    def get_or_write(self, key: str, fmt: str, chunks: Callable[[], Iterable[pd.DataFrame]]) -> Path:
+        """Path of the export for `key`, writing it from chunks() the first time it is asked for."""
+        path = self.path_for(key, fmt)
+        with self._lock:
+            lock = self._locks.setdefault(str(path), threading.Lock())
+        with lock:
+            if path.exists():
+                os.utime(path)  # last access, for LRU eviction
+                return path
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{path.name}.tmp-{os.getpid()}-{threading.get_ident()}")
+            try:
+                write_export(chunks(), str(tmp), fmt)
+                os.replace(tmp, path)
+            finally:
+                tmp.unlink(missing_ok=True)
+        self.evict(keep=path)
+        return path
+
+    def read(self, key: str, fmt: str, chunks: Callable[[], Iterable[pd.DataFrame]]) -> bytes:
+        return self.get_or_write(key, fmt, chunks).read_bytes()
+
+    def evict(self, keep: Optional[Path] = None):
+        files = sorted((p for p in self.root.glob("*") if p.is_file() and not p.name.startswith(".")),
+                       key=lambda p: p.stat().st_mtime)
+        total = sum(p.stat().st_size for p in files)
+        for p in files:  # oldest first
+            if total <= self.max_bytes:
+                break
+            if p == keep:
+                continue
+            total -= p.stat().st_size
+            p.unlink(missing_ok=True)
+
+    def clear(self):
+        for p in self.root.glob("*"):
+            p.unlink(missing_ok=True)
+
+_shared_cache: Optional[ExportCache] = None
+
+def shared_export_cache() -> ExportCache:
+    """Process-wide ExportCache in DEFAULT_EXPORT_DIR, used by every dashboard page."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = ExportCache()
+    return _shared_cache
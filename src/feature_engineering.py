@@ -1,6 +1,9 @@
 import pandas as pd
 import numpy as np
 
+from .instrumentation import instrumented
+
+@instrumented("features.basic")
 def add_basic_features(df: pd.DataFrame) -> pd.DataFrame:
     """
     Add derived features for ML & EDA.
@@ -33,3 +36,78 @@ def add_basic_features(df: pd.DataFrame) -> pd.DataFrame:
         out.loc[out["Days_to_Ship"] < -1, "Days_to_Ship"] = np.nan  # invalid negatives
 
     return out
+
+# Known Superstore vocabularies: listed first so category codes are the same for every upload/session
+CATEGORY_VOCABULARIES = {
+    "Ship Mode": ["First Class", "Same Day", "Second Class", "Standard Class"],
+    "Segment": ["Consumer", "Corporate", "Home Office"],
+    "Region": ["Central", "East", "South", "West"],
+    "Category": ["Furniture", "Office Supplies", "Technology"],
+    "Sub-Category": ["Accessories", "Appliances", "Art", "Binders", "Bookcases", "Chairs", "Copiers",
+                     "Envelopes", "Fasteners", "Furnishings", "Labels", "Machines", "Paper", "Phones",
+                     "Storage", "Supplies", "Tables"],
+}
+CATEGORICAL_COLUMNS = ["Ship Mode", "Segment", "Region", "Category", "Sub-Category", "Country", "State",
+                       "City", "Postal Code", "Order ID", "Customer ID", "Customer Name", "Product ID",
+                       "Product Name"]
+INTEGER_COLUMNS = ["Quantity", "Days_to_Ship", "Order_Year", "Profitable"]
+
+def stable_categories(col: str, values: pd.Series) -> list:
+    """Known vocabulary first, then any other observed values in sorted order."""
+    known = CATEGORY_VOCABULARIES.get(col, [])
+    extra = pd.Index(values.dropna().unique()).difference(known, sort=True)
+    return list(known) + extra.tolist()
+
+@instrumented("features.compact")
+def compact_dataframe(df: pd.DataFrame, float32: bool = False) -> pd.DataFrame:
+    """
+    Memory-compact copy of an add_basic_features frame for long-lived (session) storage.
+    - string dimensions/IDs -> categorical with stable category order (when that is smaller)
+    - integer-valued columns -> smallest (nullable) integer type
+    - Order_Month -> native monthly Period
+    - floats stay float64 unless float32=True (Sales/Profit totals are shown to the cent)
+    """
+    out = df.copy()
+
+    for col in CATEGORICAL_COLUMNS:
+        if col in out.columns and not isinstance(out[col].dtype, pd.CategoricalDtype):
+            cat = out[col].astype(pd.CategoricalDtype(stable_categories(col, out[col])))
+            # Near-unique IDs (e.g. Order ID) can be smaller as plain strings
+            if col in CATEGORY_VOCABULARIES or cat.memory_usage(deep=True) < out[col].memory_usage(deep=True):
+                out[col] = cat
+
+    for col in INTEGER_COLUMNS:
+        if col not in out.columns:
+            continue
+        s = out[col]
+        if pd.api.types.is_float_dtype(s):
+            if not (s.dropna() % 1 == 0).all():
+                continue
+            s = s.astype("Int64")
+        out[col] = pd.to_numeric(s, downcast="integer")
+
+    if "Order_Month" in out.columns and not isinstance(out["Order_Month"].dtype, pd.PeriodDtype):
+        out["Order_Month"] = pd.PeriodIndex(out["Order_Month"], freq="M")
+
+    if float32:
+        for col in out.select_dtypes(include="float64").columns:
+            out[col] = out[col].astype("float32")
+
+    return out
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Per-column dtype and deep memory (bytes) before/after compaction, with a TOTAL row."""
+    b = before.memory_usage(deep=True, index=False)
+    a = after.memory_usage(deep=True, index=False).reindex(b.index)
+    rep = pd.DataFrame({
+        "column": b.index,
+        "dtype_before": [str(before[c].dtype) for c in b.index],
+        "dtype_after": [str(after[c].dtype) if c in after.columns else "-" for c in b.index],
+        "bytes_before": b.values,
+        "bytes_after": a.values,
+    })
+    total = pd.DataFrame([{"column": "TOTAL", "dtype_before": "", "dtype_after": "",
+                           "bytes_before": b.sum(), "bytes_after": a.sum()}])
+    rep = pd.concat([rep, total], ignore_index=True)
+    rep["saved_pct"] = (1 - rep["bytes_after"] / rep["bytes_before"]) * 100
+    return rep
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from joblib import dump, load
+from scipy import sparse
+
+from .history_features import HistoryState
+
+DEFAULT_STORE_DIR = "data/feature_store"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+DEFAULT_MAX_AGE_DAYS = 30.0
+STORE_FORMAT_VERSION = 2
+ENTRY_META = "meta.json"
+MATRIX_NAMES = ("X_train", "X_test")
+# Per-row arrays stored next to the labels; the day_* ones (Order Date as days) only when the data has dates
+LABEL_NAMES = ("y_train", "y_test", "day_train", "day_test")
+HISTORY_DIR = "history"
+
+def fingerprint(parts: Dict) -> str:
+    """Stable hash of a JSON-able description (data hash, feature lists, split and prep parameters)."""
+    blob = json.dumps({"format": STORE_FORMAT_VERSION, **parts}, sort_keys=True, default=repr)
+    return hashlib.blake2b(blob.encode("utf-8"), digest_size=16).hexdigest()
+
+def _dir_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+class FeatureStore:
+    """
+    On-disk cache of encoded training matrices: one directory per key holding the fitted
+    preprocessing (joblib), compressed X_train/X_test (.npz, dense or CSR), labels, the
+    history state when history features were built, and a meta.json with the key parts. Entries unused for `max_age_days` are dropped, then the
+    least recently used ones until the store fits in `max_bytes`.
+    """
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age_days: float = DEFAULT_MAX_AGE_DAYS):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Feature set for `key` (prep, X_train, X_test, y_train, y_test, day_*, history_state + stored extras) or None."""
+        entry = self.root / key
+        meta_path = entry / ENTRY_META
+        if not meta_path.exists():
+            return None
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            out = dict(meta["extras"])
+            out["prep"] = load(entry / "prep.joblib")
+            for name in MATRIX_NAMES:
+                out[name] = (sparse.load_npz(entry / f"{name}.npz") if meta["sparse"][name]
+                             else np.load(entry / f"{name}.npz")["data"])
+            with np.load(entry / "labels.npz") as labels:
+                out.update({name: labels[name] for name in labels.files})
+            out["history_state"] = HistoryState.load(entry / HISTORY_DIR) if out.get("history") else None
+        except Exception:
+            shutil.rmtree(entry, ignore_errors=True)  # partial/corrupt entry -> rebuild
+            return None
+        os.utime(meta_path)  # last access, for LRU/age eviction
+        return out
+
+    def put(self, key: str, feature_set: Dict, parts: Optional[Dict] = None) -> Path:
+        """
+        Store prep + matrices + labels; other JSON-able items of `feature_set` (feature lists,
+        row counts) come back from get(). Written to a temp dir and renamed into place.
+        """
+        entry = self.root / key
+        tmp = self.root / f".{key}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        is_sparse = {}
+        for name in MATRIX_NAMES:
+            X = feature_set[name]
+            is_sparse[name] = sparse.issparse(X)
+            if is_sparse[name]:
+                sparse.save_npz(tmp / f"{name}.npz", sparse.csr_matrix(X), compressed=True)
+            else:
+                np.savez_compressed(tmp / f"{name}.npz", data=np.asarray(X))
+        np.savez_compressed(tmp / "labels.npz", **{name: np.asarray(feature_set[name])
+                                                   for name in LABEL_NAMES if feature_set.get(name) is not None})
+        dump(feature_set["prep"], tmp / "prep.joblib")
+        if feature_set.get("history_state") is not None:
+            feature_set["history_state"].save(tmp / HISTORY_DIR)
+        extras = {k: v for k, v in feature_set.items()
+                  if k not in ("prep", "history_state") + LABEL_NAMES + MATRIX_NAMES}
+        meta = {"key": key, "parts": parts or {}, "sparse": is_sparse, "extras": extras,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "bytes": _dir_bytes(tmp)}
+        (tmp / ENTRY_META).write_text(json.dumps(meta, indent=2, default=repr), encoding="utf-8")
+
+        shutil.rmtree(entry, ignore_errors=True)
+        try:
+            tmp.rename(entry)
+        except OSError:  # another process stored the same key meanwhile
+            shutil.rmtree(tmp, ignore_errors=True)
+        self.evict(keep=key)
+        return entry
+
+    def entries(self) -> pd.DataFrame:
+        """key, bytes, created_at, last_access (datetime) per stored entry, most recent first."""
+        rows = []
+        if self.root.exists():
+            for meta_path in self.root.glob(f"*/{ENTRY_META}"):
+                try:
+                    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+                except ValueError:
+                    continue
+                rows.append({"key": meta_path.parent.name, "bytes": meta.get("bytes", 0),
+                             "created_at": meta.get("created_at"),
+                             "last_access": pd.Timestamp(meta_path.stat().st_mtime, unit="s")})
+        df = pd.DataFrame(rows, columns=["key", "bytes", "created_at", "last_access"])
+        return df.sort_values("last_access", ascending=False, ignore_index=True)
+
+    def evict(self, keep: Optional[str] = None) -> List[str]:
+        """Drop entries older than max_age_days (by last access), then LRU until under max_bytes."""
+        entries = self.entries()
+        removed = []
+        cutoff = pd.Timestamp(time.time() - self.max_age_days * 86400, unit="s")
+        total = int(entries["bytes"].sum())
+        for row in entries.iloc[::-1].itertuples():  # oldest first
+            if row.key == keep:
+                continue
+            if row.last_access < cutoff or total > self.max_bytes:
+                shutil.rmtree(self.root / row.key, ignore_errors=True)
+                total -= row.bytes
+                removed.append(row.key)
+        return removed
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
@@ -0,0 +1,123 @@
+import weakref
+from typing import Dict, Iterable, MutableMapping, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+from .instrumentation import instrumented
+
+DEFAULT_BITMAP_COLUMNS = ("Region", "Category", "Sub-Category")
+
+class FilterIndex:
+    """
+    Row-selection index built once per dataset.
+    - rows are ordered by `date_col`; a date range is two binary searches -> a contiguous slice
+    - each value of the bitmap columns has a packed bitmap over that date order
+    select() returns positional row numbers (ascending, i.e. original order) without copying the frame.
+    """
+
+    def __init__(self, df: pd.DataFrame, date_col: str = "Order Date",
+                 bitmap_cols: Sequence[str] = DEFAULT_BITMAP_COLUMNS):
+        self.n_rows = len(df)
+        self._source = weakref.ref(df)
+        self.date_col = date_col if date_col in df.columns else None
+
+        if self.date_col:
+            dates = df[self.date_col].to_numpy()
+            self.order = np.argsort(dates, kind="stable")  # NaT sorts last
+            self.sorted_dates = dates[self.order]
+            self.n_dated = int((~np.isnat(dates)).sum())
+        else:
+            self.order = np.arange(self.n_rows)
+            self.sorted_dates = None
+            self.n_dated = 0
+
+        self.values: Dict[str, list] = {}
+        self.codes: Dict[str, np.ndarray] = {}       # per row, original order (-1 = missing)
+        self.bitmaps: Dict[str, Dict] = {}           # value -> packed bits, date order
+        for col in bitmap_cols:
+            if col not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[col])
+            codes = codes.astype(np.int16 if len(uniques) < 2**15 else np.int32)
+            self.values[col] = list(uniques)
+            self.codes[col] = codes
+            sorted_codes = codes[self.order]
+            self.bitmaps[col] = {v: np.packbits(sorted_codes == k) for k, v in enumerate(uniques)}
+
+    def is_for(self, df: pd.DataFrame) -> bool:
+        return self._source() is df and len(df) == self.n_rows
+
+    def _date_bounds(self, date_range) -> Tuple[int, int]:
+        """[lo, hi) slice of the date order with start <= date <= end (inclusive, like Series.between)."""
+        if self.sorted_dates is None or not date_range:
+            return 0, self.n_rows
+        dated = self.sorted_dates[:self.n_dated]
+        start = pd.Timestamp(date_range[0]).to_datetime64()
+        end = pd.Timestamp(date_range[1]).to_datetime64()
+        lo = int(np.searchsorted(dated, start, side="left"))
+        hi = int(np.searchsorted(dated, end, side="right"))
+        return lo, max(lo, hi)
+
+    @instrumented("filter.select", rows=lambda rows, args, kwargs: len(rows))
+    def select(self, date_range: Optional[Sequence] = None,
+               filters: Optional[Dict[str, Iterable]] = None) -> np.ndarray:
+        """
+        Positions of rows inside `date_range` (start, end) whose value is in `filters[col]`
+        for every column. An empty/None value list means "no filter" for that column,
+        matching the dashboard multiselects.
+        """
+        lo, hi = self._date_bounds(date_range)
+        if hi <= lo:
+            return np.empty(0, dtype=np.int64)
+
+        # Work on the packed bytes that cover [lo, hi) only
+        b_lo, b_hi = lo // 8, (hi + 7) // 8
+        acc = None
+        for col, picked in (filters or {}).items():
+            if not picked or col not in self.bitmaps:
+                continue
+            col_bits = np.zeros(b_hi - b_lo, dtype=np.uint8)
+            for v in picked:
+                bm = self.bitmaps[col].get(v)
+                if bm is not None:
+                    col_bits |= bm[b_lo:b_hi]
+            acc = col_bits if acc is None else (acc & col_bits)
+
+        if acc is None:
+            pos = np.arange(lo, hi)
+        else:
+            bits = np.unpackbits(acc)[lo - b_lo * 8: hi - b_lo * 8]
+            pos = lo + np.flatnonzero(bits)
+        rows = self.order[pos]
+        rows.sort()
+        return rows
+
+    def values_in(self, col: str, rows: np.ndarray) -> list:
+        """Distinct (non-missing) values of a bitmap column among the selected rows."""
+        if col not in self.codes:
+            return []
+        codes = self.codes[col][rows]
+        present = np.bincount(codes[codes >= 0], minlength=len(self.values[col])) > 0
+        return [v for v, ok in zip(self.values[col], present) if ok]
+
+    @instrumented("filter.take")
+    def take(self, df: pd.DataFrame, rows: np.ndarray) -> pd.DataFrame:
+        """Rows of `df` at `rows`; the frame itself is returned when nothing was filtered out."""
+        if len(rows) == self.n_rows:
+            return df
+        return df.take(rows)
+
+def get_filter_index(df: pd.DataFrame, store: MutableMapping, key: str = "filter_index") -> FilterIndex:
+    """FilterIndex for `df`, reused from `store` (e.g. st.session_state) until the frame is replaced."""
+    idx = store.get(key)
+    if not isinstance(idx, FilterIndex) or not idx.is_for(df):
+        idx = FilterIndex(df)
+        store[key] = idx
+    return idx
+
+def global_filter_spec(gf: Dict) -> Tuple[Optional[Tuple], Dict[str, list]]:
+    """(date_range, filters) for FilterIndex.select from the dashboard's `global_filters` state."""
+    date_range = None
+    if gf.get("date_range") and len(gf["date_range"]) == 2:
+        date_range = (pd.to_datetime(gf["date_range"][0]), pd.to_datetime(gf["date_range"][1]))
+    return date_range, {"Region": list(gf.get("regions") or [])}
@@ -0,0 +1,239 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .instrumentation import instrumented
+
+# Entity column -> feature prefix
+HISTORY_KEYS = {"Customer ID": "cust", "Product ID": "prod", "Sub-Category": "subcat"}
+HISTORY_WINDOW_DAYS = 90
+HISTORY_META = "meta.json"
+# Per (key, order day) totals kept for the lookups (and by HistoryState between updates)
+_TOTALS = ("lines", "labeled", "profitable", "discounted", "discount_sum")
+_NO_DAY = np.iinfo(np.int64).min
+
+def history_feature_columns(keys: Optional[Dict[str, str]] = None,
+                            window_days: int = HISTORY_WINDOW_DAYS) -> List[str]:
+    """Names of the columns add_history_features produces, per key prefix."""
+    cols = []
+    for prefix in (keys or HISTORY_KEYS).values():
+        cols += [f"{prefix}_prior_lines", f"{prefix}_prior_profit_rate", f"{prefix}_prior_avg_discount",
+                 f"{prefix}_days_since_prev", f"{prefix}_{window_days}d_lines", f"{prefix}_{window_days}d_profit_rate"]
+    return cols
+
+def _order_days(df: pd.DataFrame) -> np.ndarray:
+    """Order Date as int64 days since epoch (_NO_DAY where missing)."""
+    days = df["Order Date"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    days[df["Order Date"].isna().to_numpy()] = _NO_DAY
+    return days
+
+def key_totals(df: pd.DataFrame, key: str) -> pd.DataFrame:
+    """
+    Order lines of `df` summed per (key value, order day): lines, labeled (Profitable known),
+    profitable, discounted (Discount known), discount_sum. Rows without key or date are left out.
+    """
+    n = len(df)
+    profitable = pd.to_numeric(df["Profitable"], errors="coerce") if "Profitable" in df.columns \
+        else pd.Series(np.nan, index=df.index)
+    discount = pd.to_numeric(df["Discount"], errors="coerce") if "Discount" in df.columns \
+        else pd.Series(np.nan, index=df.index)
+    day = _order_days(df)
+    ok = (day != _NO_DAY) & df[key].notna().to_numpy()
+    frame = pd.DataFrame({
+        "key": df[key].to_numpy(), "day": day, "lines": np.ones(n),
+        "labeled": profitable.notna().to_numpy(dtype=float), "profitable": profitable.fillna(0).to_numpy(dtype=float),
+        "discounted": discount.notna().to_numpy(dtype=float), "discount_sum": discount.fillna(0).to_numpy(dtype=float),
+    })[ok]
+    return merge_totals(frame)
+
+def merge_totals(*tables: pd.DataFrame) -> pd.DataFrame:
+    """Sum several key_totals tables (e.g. stored history + newly arrived orders) into one."""
+    frame = pd.concat(tables, ignore_index=True) if len(tables) > 1 else tables[0]
+    out = frame.groupby(["key", "day"], sort=False, observed=True)[list(_TOTALS)].sum().reset_index()
+    out["key"] = out["key"].astype(object)
+    return out
+
+# Composite sort key: key code in the high 32 bits, day (+ offset, always positive) in the low 32
+_DAY_OFFSET = 1 << 31
+
+def _composite(codes: np.ndarray, days: np.ndarray) -> np.ndarray:
+    return codes.astype(np.int64) * (1 << 32) + (days + _DAY_OFFSET)
+
+class _TotalsIndex:
+    """
+    A key_totals table sorted once by (key code, day) with prefix sums of every total, so any
+    "days before d" or "days in [d - window, d)" range of a key is two binary searches and a
+    subtraction. Built once per table (HistoryState caches it between scoring calls).
+    """
+
+    def __init__(self, totals: pd.DataFrame):
+        codes, uniques = pd.factorize(totals["key"].to_numpy())
+        self.keys = pd.Index(uniques)
+        comp = _composite(codes, totals["day"].to_numpy())
+        order = np.argsort(comp, kind="stable")
+        self.comp = comp[order]
+        self.day = totals["day"].to_numpy()[order]
+        self.prefix = {t: np.concatenate([[0.0], np.cumsum(totals[t].to_numpy()[order])]) for t in _TOTALS}
+
+    def lookup(self, keys: pd.Series, days: np.ndarray, window_days: int) -> Dict[str, np.ndarray]:
+        """
+        Per query (key, day): totals over the key's orders on days strictly before `day`, all of
+        them and those within the last `window_days`, plus the latest such day (_NO_DAY if none).
+        O(Q log G) for Q queries against G totals rows.
+        """
+        qcode, quniq = pd.factorize(keys)
+        known = np.append(self.keys.get_indexer(np.asarray(quniq, dtype=object)), -1)
+        qcode = known[qcode]  # factorize's -1 (missing key) picks the appended -1
+        valid = (qcode >= 0) & (days != _NO_DAY)
+        qc = np.where(valid, qcode, 0)
+        qcomp = _composite(qc, np.where(valid, days, 0))
+        # Binary searches in query order: sorted probes walk the totals sequentially (several times faster)
+        qorder = np.argsort(qcomp)
+        start, hi, lo = (np.empty(len(qcomp), dtype=np.intp) for _ in range(3))
+        start[qorder] = np.searchsorted(self.comp, _composite(qc[qorder], np.full(len(qc), -_DAY_OFFSET)))  # key's first
+        hi[qorder] = np.searchsorted(self.comp, qcomp[qorder], side="left")                 # first on/after the day
+        lo[qorder] = np.searchsorted(self.comp, qcomp[qorder] - window_days, side="left")   # first inside the window
+        hi = np.where(valid, hi, start)
+
+        out = {t: self.prefix[t][hi] - self.prefix[t][start] for t in _TOTALS}
+        out.update({f"window_{t}": self.prefix[t][hi] - self.prefix[t][np.maximum(lo, start)]
+                    for t in ("lines", "labeled", "profitable")})
+        out["prev_day"] = np.where(hi > start, self.day[np.maximum(hi - 1, 0)], _NO_DAY)
+        return out
+
+def _ratio(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(den > 0, num / np.where(den > 0, den, 1), np.nan)
+
+def _history_frame(indexes: Dict[str, list], df: pd.DataFrame, keys: Dict[str, str],
+                   window_days: int) -> pd.DataFrame:
+    """Features of df's rows summed over several totals indexes per key (totals are additive)."""
+    days = _order_days(df)
+    cols = {}
+    for key, prefix in keys.items():
+        if key not in df.columns or not indexes.get(key):
+            continue
+        r = None
+        for index in indexes[key]:
+            part = index.lookup(df[key], days, window_days)
+            if r is None:
+                r = part
+            else:
+                r = {k: np.maximum(r[k], v) if k == "prev_day" else r[k] + v for k, v in part.items()}
+        unknown = (days == _NO_DAY) | df[key].isna().to_numpy()
+        feats = {
+            f"{prefix}_prior_lines": r["lines"],
+            f"{prefix}_prior_profit_rate": _ratio(r["profitable"], r["labeled"]),
+            f"{prefix}_prior_avg_discount": _ratio(r["discount_sum"], r["discounted"]),
+            f"{prefix}_days_since_prev": np.where(r["prev_day"] != _NO_DAY, days - r["prev_day"], np.nan),
+            f"{prefix}_{window_days}d_lines": r["window_lines"],
+            f"{prefix}_{window_days}d_profit_rate": _ratio(r["window_profitable"], r["window_labeled"]),
+        }
+        for name, values in feats.items():
+            values = values.astype(float)
+            values[unknown] = np.nan  # no key or no order date: history unknown, not empty
+            cols[name] = values
+    return pd.DataFrame(cols, index=df.index)
+
+class HistoryState:
+    """
+    Per (key, order day) totals of every order absorbed so far, for Customer ID / Product ID /
+    Sub-Category. Features of new orders only need these totals, not the old rows, so monthly
+    increments cost O(new rows + totals) instead of recomputing over the full history.
+    Orders arriving late (dated before absorbed ones) are handled: lookups are by date, not arrival.
+    A model trained with history features keeps the state of its training data next to it
+    (model_utils.history_path_for) so scoring computes the same features.
+    """
+
+    def __init__(self, keys: Optional[Dict[str, str]] = None, window_days: int = HISTORY_WINDOW_DAYS):
+        self.keys = dict(keys or HISTORY_KEYS)
+        self.window_days = window_days
+        self.totals: Dict[str, pd.DataFrame] = {}
+        self._indexes: Dict[str, _TotalsIndex] = {}
+
+    def _index(self, key: str) -> _TotalsIndex:
+        if key not in self._indexes:
+            self._indexes[key] = _TotalsIndex(self.totals[key])
+        return self._indexes[key]
+
+    def input_columns(self) -> List[str]:
+        """Columns a frame needs for features(): Order Date and the keys this state has history for."""
+        return ["Order Date"] + [k for k in self.keys if k in self.totals]
+
+    def copy(self) -> "HistoryState":
+        """Independent state over the same totals (absorb on the copy leaves this one unchanged)."""
+        other = HistoryState(self.keys, self.window_days)
+        other.totals = dict(self.totals)
+        other._indexes = dict(self._indexes)
+        return other
+
+    def features(self, df: pd.DataFrame) -> pd.DataFrame:
+        """History features of `df`'s rows from absorbed orders plus df's own earlier-day orders (state unchanged)."""
+        indexes = {}
+        for key in self.keys:
+            if key in df.columns:
+                own = key_totals(df, key)
+                indexes[key] = ([self._index(key)] if key in self.totals else []) + ([_TotalsIndex(own)] if len(own) else [])
+        return _history_frame(indexes, df, self.keys, self.window_days)
+
+    def absorb(self, df: pd.DataFrame):
+        """Add df's orders to the stored totals."""
+        for key in self.keys:
+            if key in df.columns:
+                new = key_totals(df, key)
+                self.totals[key] = merge_totals(self.totals[key], new) if key in self.totals else new
+                self._indexes.pop(key, None)
+
+    def update(self, df: pd.DataFrame) -> pd.DataFrame:
+        """features(df), then absorb df so later updates see it as history."""
+        feats = self.features(df)
+        self.absorb(df)
+        return feats
+
+    def rows(self) -> int:
+        return int(sum(len(t) for t in self.totals.values()))
+
+    def save(self, path: str):
+        """One Parquet file of totals per key plus meta.json (written to temp names, then renamed)."""
+        root = Path(path)
+        root.mkdir(parents=True, exist_ok=True)
+        files = {}
+        for i, (key, table) in enumerate(self.totals.items()):
+            files[key] = f"totals_{i}.parquet"
+            tmp = root / f".{files[key]}.tmp"
+            table.assign(key=table["key"].astype(str)).to_parquet(tmp, index=False)
+            os.replace(tmp, root / files[key])
+        meta = {"keys": self.keys, "window_days": self.window_days, "files": files}
+        tmp = root / f".{HISTORY_META}.tmp"
+        tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        os.replace(tmp, root / HISTORY_META)
+
+    @classmethod
+    def load(cls, path: str) -> "HistoryState":
+        root = Path(path)
+        meta = json.loads((root / HISTORY_META).read_text(encoding="utf-8"))
+        state = cls(meta["keys"], meta["window_days"])
+        for key, name in meta["files"].items():
+            table = pd.read_parquet(root / name)
+            table["key"] = table["key"].astype(object)
+            state.totals[key] = table
+        return state
+
+@instrumented("features.history")
+def add_history_features(df: pd.DataFrame, keys: Optional[Dict[str, str]] = None,
+                         window_days: int = HISTORY_WINDOW_DAYS, state: Optional[HistoryState] = None) -> pd.DataFrame:
+    """
+    Add leakage-safe history per Customer ID, Product ID and Sub-Category (keys missing from
+    `df` are skipped), using only orders on days strictly before each row's Order Date:
+    - <p>_prior_lines, <p>_prior_profit_rate, <p>_prior_avg_discount (expanding)
+    - <p>_days_since_prev (days since the previous order day)
+    - <p>_<window>d_lines, <p>_<window>d_profit_rate (rolling window of `window_days` days)
+    Rates are NaN without prior labeled rows. Same-day orders never see each other.
+    With `state`, orders stored there count as history too (the state is not modified).
+    """
+    state = state if state is not None else HistoryState(keys, window_days)
+    return pd.concat([df, state.features(df)], axis=1)
@@ -0,0 +1,283 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+
+from .data_preprocessing import DEFAULT_CHUNKSIZE, iter_superstore_csv, row_id_column, file_fingerprint
+from .model_training import (
+    DEFAULT_MODEL_PATH, build_pipeline, classification_metrics, get_feature_columns,
+    get_high_cardinality_columns, save_trained_model
+)
+from .model_utils import load_model
+
+INCREMENTAL_STRATEGIES = ("warm_start", "sliding_window")
+DRIFT_METRICS = ("accuracy", "precision", "recall", "f1")
+STATE_FILE = "state.json"
+HISTORY_FILE = "history.parquet"
+
+def incremental_state_dir(model_out: str) -> Path:
+    """models/model_profit_clf.joblib -> models/model_profit_clf.incremental (watermark + featurized history)"""
+    return Path(model_out).with_suffix(".incremental")
+
+def _load_state(state_dir: Path) -> Optional[Dict]:
+    path = state_dir / STATE_FILE
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_atomic(path: Path, write):
+    tmp = path.with_name(path.name + ".tmp")
+    write(tmp)
+    os.replace(tmp, path)
+
+# ------------------------------ Watermark -------------------------------------
+def _row_ids(df: pd.DataFrame) -> Optional[pd.Series]:
+    col = row_id_column(df)
+    return pd.to_numeric(df[col], errors="coerce") if col is not None else None
+
+def _row_hashes(df: pd.DataFrame) -> List[str]:
+    """Content hash per row (hex strings, JSON-safe), independent of the column order."""
+    return [f"{h:016x}" for h in pd.util.hash_pandas_object(df[sorted(df.columns)], index=False).tolist()]
+
+def select_new_rows(df: pd.DataFrame, watermark: Optional[Dict], occurrences: Optional[Dict] = None) -> pd.DataFrame:
+    """
+    Rows beyond the watermark: Row ID > last seen Row ID when the file has Row IDs,
+    otherwise Order Date > last seen Order Date, plus rows on that date beyond the ones already
+    seen (watermark["order_date_rows"]: row hash -> count), so orders appended later for the
+    last day are not skipped. `occurrences` counts boundary-day rows across the chunks of one
+    file (pass the same dict for every chunk). Everything is new without a watermark.
+    Without Row IDs, rows appended later but dated before the watermark are never selected;
+    backdated_rows() counts them.
+    """
+    if not watermark:
+        return df
+    ids = _row_ids(df)
+    if ids is not None and watermark.get("row_id") is not None:
+        return df[(ids > watermark["row_id"]).to_numpy()]
+    if "Order Date" in df.columns and watermark.get("order_date"):
+        last = pd.Timestamp(watermark["order_date"])
+        keep = (df["Order Date"] > last).to_numpy().copy()
+        seen = watermark.get("order_date_rows")
+        boundary = np.flatnonzero((df["Order Date"] == last).to_numpy())
+        if seen is not None and len(boundary):
+            occurrences = {} if occurrences is None else occurrences
+            for pos, h in zip(boundary, _row_hashes(df.iloc[boundary])):
+                occurrences[h] = occurrences.get(h, 0) + 1
+                keep[pos] = occurrences[h] > seen.get(h, 0)
+        return df[keep]
+    raise ValueError("Cannot find new rows: the file has neither Row ID nor Order Date")
+
+def advance_watermark(watermark: Optional[Dict], df: pd.DataFrame) -> Dict:
+    """Move the watermark past `df` (rows returned by select_new_rows)."""
+    wm = dict(watermark or {"row_id": None, "order_date": None})
+    ids = _row_ids(df)
+    if ids is not None and ids.notna().any():
+        wm["row_id"] = max(float(ids.max()), wm["row_id"] if wm["row_id"] is not None else float("-inf"))
+    if "Order Date" in df.columns and df["Order Date"].notna().any():
+        last = df["Order Date"].max()
+        current = pd.Timestamp(wm["order_date"]) if wm["order_date"] else None
+        if current is None or last >= current:
+            # Rows seen on the last date: a later date starts a new count, the same date adds to it
+            counts = dict(wm.get("order_date_rows") or {}) if last == current else {}
+            for h in _row_hashes(df[(df["Order Date"] == last).to_numpy()]):
+                counts[h] = counts.get(h, 0) + 1
+            wm["order_date"], wm["order_date_rows"] = last.isoformat(), counts
+    return wm
+
+def order_date_counts(df: pd.DataFrame) -> pd.Series:
+    """Rows per Order Date of one chunk; add up the chunks of a file with add_date_counts."""
+    return df["Order Date"].value_counts() if "Order Date" in df.columns else pd.Series(dtype="int64")
+
+def add_date_counts(total: Optional[pd.Series], counts: pd.Series) -> pd.Series:
+    return counts if total is None else total.add(counts, fill_value=0)
+
+def rows_before(date_counts: Optional[pd.Series], day) -> int:
+    if date_counts is None or day is None:
+        return 0
+    return int(date_counts[date_counts.index < pd.Timestamp(day)].sum())
+
+def backdated_rows(watermark: Optional[Dict], date_counts: Optional[pd.Series]) -> Optional[int]:
+    """
+    Order Date watermark only: rows of the file dated before the watermark that were not there
+    at the last run (watermark["rows_before_date"]). select_new_rows skips them; None when the
+    watermark uses Row ID or predates this count.
+    """
+    if not watermark or watermark.get("row_id") is not None or watermark.get("rows_before_date") is None:
+        return None
+    return max(rows_before(date_counts, watermark.get("order_date")) - watermark["rows_before_date"], 0)
+
+def holdout_mask(df: pd.DataFrame, test_size: float = 0.2) -> np.ndarray:
+    """
+    Deterministic holdout by hashing Row ID (or the feature values), so a row stays in the
+    same split across increments and metrics of successive models remain comparable.
+    """
+    ids = _row_ids(df)
+    keys = ids.astype("string") if ids is not None else df.drop(columns=["Profitable"], errors="ignore")
+    h = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+    return (h % np.uint64(10_000)) < np.uint64(int(test_size * 10_000))
+
+# ------------------------------ Ensemble update -------------------------------
+def grow_forest(pipe: Pipeline, X: pd.DataFrame, y: pd.Series, n_new_trees: int = 50,
+                strategy: str = "warm_start") -> Pipeline:
+    """
+    Add `n_new_trees` trees fitted on (X, y) to the pipeline's RandomForest, keeping the fitted
+    preprocessing (encoder layouts must not move under the existing trees; unseen categories
+    are handled as at prediction time). warm_start grows the forest; sliding_window then drops
+    the same number of oldest trees, so the ensemble size stays constant and follows recent data.
+    """
+    if strategy not in INCREMENTAL_STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy!r}; expected one of {INCREMENTAL_STRATEGIES}")
+    clf = pipe.named_steps["clf"]
+    if not isinstance(clf, RandomForestClassifier):
+        raise ValueError("Incremental updates need a RandomForest engine (rf_dense / rf_sparse)")
+    if set(np.unique(y)) != set(clf.classes_.tolist()):
+        raise ValueError("The update window must contain every class the model was trained on")
+
+    Xt = pipe[:-1].transform(X)
+    n_old = len(clf.estimators_)
+    clf.set_params(warm_start=True, n_estimators=n_old + n_new_trees)
+    clf.fit(Xt, y)
+    if strategy == "sliding_window":
+        clf.estimators_ = clf.estimators_[n_new_trees:]
+        clf.set_params(n_estimators=len(clf.estimators_))
+    clf.set_params(warm_start=False)
+    return pipe
+
+# --------------------------------- Driver -------------------------------------
+def update_profit_classifier(csv_path: str, model_out: str = DEFAULT_MODEL_PATH, strategy: str = "warm_start",
+                             n_new_trees: int = 50, window_rows: Optional[int] = None, test_size: float = 0.2,
+                             compare_full: bool = True, drift_tolerance: float = 0.01,
+                             chunksize: int = DEFAULT_CHUNKSIZE, engine: str = "rf_dense",
+                             high_card_encoding: Optional[str] = None, random_state: int = 42,
+                             artifact: bool = True) -> Dict:
+    """
+    Incremental training on rows appended since the last run.
+
+    First run (no state next to `model_out`): full fit on every row, then the watermark and the
+    featurized history are stored in <model>.incremental/. Later runs stream `csv_path` in chunks,
+    keep only rows past the watermark, append them to the cached history and update the forest
+    with grow_forest (new trees fitted on the last `window_rows` training rows, all by default).
+    Holdout rows (hash of Row ID) never train. Without Row IDs, rows appended with an Order Date
+    before the watermark are skipped; "skipped_backdated" reports how many (None with Row IDs). With `compare_full`, a full retrain on the same split
+    is fitted too and the report flags metrics that drift more than `drift_tolerance` from it.
+    engine / high_card_encoding only apply to the first run; later runs keep the stored settings.
+    """
+    state_dir = incremental_state_dir(model_out)
+    state = _load_state(state_dir)
+    if state is not None:
+        engine, high_card_encoding = state["engine"], state["high_card_encoding"]
+    if engine not in ("rf_dense", "rf_sparse"):
+        raise ValueError("Incremental updates need a RandomForest engine (rf_dense / rf_sparse)")
+    watermark = state["watermark"] if state else None
+
+    # 1) Ingest only new rows (chunked; older rows are never re-featurized)
+    parts, seen_wm, occurrences, date_counts = [], watermark, {}, None
+    for chunk in iter_superstore_csv(csv_path, chunksize=chunksize):
+        date_counts = add_date_counts(date_counts, order_date_counts(chunk))
+        new = select_new_rows(chunk, watermark, occurrences)
+        if new.empty:
+            continue
+        num_features, cat_features = get_feature_columns(new)
+        id_col = row_id_column(new)
+        keep = num_features + cat_features + (get_high_cardinality_columns(new) if high_card_encoding else [])
+        part = new.loc[new["Profitable"].notna(), keep + ["Profitable"]].copy()
+        if id_col is not None:
+            part["Row ID"] = new[id_col]
+        if "Order Date" in new.columns:
+            part["Order Date"] = new["Order Date"]
+        parts.append(part)
+        seen_wm = advance_watermark(seen_wm, new)
+    skipped_backdated = backdated_rows(watermark, date_counts)
+    if not parts:
+        return {"status": "up_to_date", "new_rows": 0, "skipped_backdated": skipped_backdated,
+                "watermark": watermark, "model_path": model_out}
+    if seen_wm.get("order_date"):
+        seen_wm["rows_before_date"] = rows_before(date_counts, seen_wm["order_date"])
+    new_rows = pd.concat(parts, ignore_index=True)
+
+    # 2) Featurized history (cached) + new rows, fixed hash holdout
+    history_path = state_dir / HISTORY_FILE
+    history = pd.read_parquet(history_path) if state is not None and history_path.exists() else new_rows.iloc[:0]
+    data = pd.concat([history, new_rows], ignore_index=True)
+    data["Profitable"] = data["Profitable"].astype(int)
+    num_features, cat_features = get_feature_columns(data)
+    high_card = get_high_cardinality_columns(data) if high_card_encoding else []
+    feature_cols = num_features + cat_features + high_card
+    is_test = holdout_mask(data, test_size)
+    train, test = data[~is_test], data[is_test]
+    X_test, y_test = test[feature_cols], test["Profitable"]
+
+    def fresh_fit() -> Pipeline:
+        pipe = build_pipeline(num_features, cat_features, engine=engine, random_state=random_state,
+                              high_card_features=high_card, high_card_encoding=high_card_encoding or "target")
+        return pipe.fit(train[feature_cols], train["Profitable"])
+
+    # 3) Fit: full on the first run, grow/refresh the forest afterwards
+    t0 = time.perf_counter()
+    previous_metrics = None
+    if state is None:
+        mode, pipe = "full", fresh_fit()
+    else:
+        mode, pipe = strategy, load_model(model_out)
+        previous_metrics = classification_metrics(y_test, pipe.predict(X_test))
+        window = train.sort_values([c for c in ("Order Date", "Row ID") if c in train.columns], kind="stable")
+        if window_rows:
+            window = window.tail(window_rows)
+        grow_forest(pipe, window[feature_cols], window["Profitable"], n_new_trees=n_new_trees, strategy=strategy)
+    fit_seconds = time.perf_counter() - t0
+    metrics = classification_metrics(y_test, pipe.predict(X_test))
+
+    # 4) Drift versus a full retrain on the same split
+    full_metrics, drift, drifted, full_seconds = None, None, None, None
+    if compare_full and state is not None:
+        t0 = time.perf_counter()
+        full = fresh_fit()
+        full_seconds = time.perf_counter() - t0
+        full_metrics = classification_metrics(y_test, full.predict(X_test))
+        drift = {k: metrics[k] - full_metrics[k] for k in DRIFT_METRICS}
+        drifted = any(abs(v) > drift_tolerance for v in drift.values())
+
+    # 5) Persist model, history and watermark (state last: a crash before it just repeats the update)
+    artifact_path = save_trained_model(pipe, model_out, feature_cols, metrics, file_fingerprint(csv_path), artifact)
+    state_dir.mkdir(parents=True, exist_ok=True)
+    _write_atomic(history_path, lambda p: data.to_parquet(p, index=False))
+    new_state = {
+        "engine": engine,
+        "high_card_encoding": high_card_encoding,
+        "watermark": seen_wm,
+        "n_rows": int(len(data)),
+        "n_trees": int(len(pipe.named_steps["clf"].estimators_)) if hasattr(pipe.named_steps["clf"], "estimators_") else None,
+        "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "updates": (state or {}).get("updates", []) + [{
+            "mode": mode, "new_rows": int(len(new_rows)),
+            "metrics": {k: metrics[k] for k in DRIFT_METRICS},
+        }],
+    }
+    _write_atomic(state_dir / STATE_FILE, lambda p: p.write_text(json.dumps(new_state, indent=2), encoding="utf-8"))
+
+    strip = lambda m: {k: m[k] for k in DRIFT_METRICS} if m else None
+    return {
+        "status": "updated",
+        "mode": mode,
+        "new_rows": int(len(new_rows)),
+        "skipped_backdated": skipped_backdated,
+        "n_train": int(len(train)),
+        "n_test": int(len(test)),
+        "n_trees": new_state["n_trees"],
+        "fit_seconds": fit_seconds,
+        "metrics": metrics,
+        "previous_metrics": strip(previous_metrics),
+        "full_retrain_metrics": strip(full_metrics),
+        "full_retrain_seconds": full_seconds,
+        "drift_vs_full": drift,
+        "drifted": drifted,
+        "watermark": seen_wm,
+        "model_path": model_out,
+        "artifact_path": artifact_path,
+    }
@@ -0,0 +1,257 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+PROFILE_MODES = ("off", "cprofile", "sample")
+PROFILE_ENV = "SUPERSTORE_PROFILE"   # e.g. SUPERSTORE_PROFILE=cprofile streamlit run app/app.py
+PROFILE_TOP_N = 25
+SAMPLE_INTERVAL_S = 0.005
+
+def current_rss_mb() -> float:
+    """Resident set size of this process (Linux /proc; peak RSS from getrusage elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / 2 ** 20 if sys.platform == "darwin" else rss / 1024
+
+class StageMetrics:
+    """
+    Per-stage wall time, rows and RSS delta (thread-safe): lifetime totals per stage plus the
+    most recent `window` records (with the profile text when profiling was on).
+    """
+
+    def __init__(self, window: int = 500):
+        self._lock = threading.Lock()
+        self._records = deque(maxlen=window)
+        self._totals: Dict[str, Dict] = {}
+        self.started = time.time()
+
+    def record(self, rec: Dict):
+        with self._lock:
+            self._records.append(rec)
+            t = self._totals.setdefault(rec["stage"], {"calls": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                                       "rows": 0, "max_rss_delta_mb": 0.0})
+            t["calls"] += 1
+            t["errors"] += int(rec["error"] is not None)
+            t["seconds"] += rec["seconds"]
+            t["max_seconds"] = max(t["max_seconds"], rec["seconds"])
+            t["rows"] += rec["rows"] or 0
+            t["max_rss_delta_mb"] = max(t["max_rss_delta_mb"], rec["rss_delta_mb"])
+
+    def records(self, stage: Optional[str] = None) -> List[Dict]:
+        with self._lock:
+            return [r for r in self._records if stage is None or r["stage"] == stage]
+
+    def reset(self):
+        with self._lock:
+            self._records.clear()
+            self._totals.clear()
+            self.started = time.time()
+
+    def snapshot(self) -> Dict:
+        """JSON-able totals per stage (with p50/p95 ms over the recent window) and the recent records."""
+        with self._lock:
+            records = list(self._records)
+            totals = {k: dict(v) for k, v in self._totals.items()}
+        for stage, t in totals.items():
+            recent = np.array([r["seconds"] for r in records if r["stage"] == stage]) * 1000.0
+            t["mean_ms"] = t["seconds"] / t["calls"] * 1000.0
+            t["p50_ms"] = float(np.percentile(recent, 50)) if len(recent) else None
+            t["p95_ms"] = float(np.percentile(recent, 95)) if len(recent) else None
+            t["rows_per_s"] = t["rows"] / t["seconds"] if t["rows"] and t["seconds"] > 0 else None
+        return {"uptime_s": time.time() - self.started, "pid": os.getpid(), "rss_mb": current_rss_mb(),
+                "stages": totals, "recent": records}
+
+METRICS = StageMetrics()
+
+# ------------------------------- Profiling ------------------------------------
+_profile_mode = os.environ.get(PROFILE_ENV, "off")
+if _profile_mode not in PROFILE_MODES:
+    _profile_mode = "off"
+_profile_lock = threading.Lock()   # one profiler at a time (cProfile is process-wide on 3.12+)
+_local = threading.local()
+
+def set_profiling(mode: str = "off"):
+    """Profile every outermost stage with cProfile, a stack sampler ("sample") or not at all."""
+    global _profile_mode
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profiling mode {mode!r}, expected one of {PROFILE_MODES}")
+    _profile_mode = mode
+
+def profiling_mode() -> str:
+    return _profile_mode
+
+class _CProfiler:
+    def __init__(self):
+        self._prof = cProfile.Profile()
+
+    def start(self):
+        self._prof.enable()
+
+    def stop(self) -> str:
+        self._prof.disable()
+        out = io.StringIO()
+        pstats.Stats(self._prof, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+        return out.getvalue()
+
+class _StackSampler:
+    """Samples the calling thread's stack every SAMPLE_INTERVAL_S; reports inclusive hits per function."""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_S):
+        self.interval = interval
+        self.target = threading.get_ident()
+        self.hits = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stage-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            seen = set()
+            while frame is not None:
+                code = frame.f_code
+                key = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                if key not in seen:  # recursion counts once per sample
+                    seen.add(key)
+                    self.hits[key] += 1
+                frame = frame.f_back
+            self.samples += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stop.set()
+        self._thread.join()
+        lines = [f"{self.samples} samples every {self.interval * 1000:.0f} ms (inclusive)"]
+        for key, n in self.hits.most_common(PROFILE_TOP_N):
+            lines.append(f"{n:7d} {n / max(self.samples, 1):7.1%}  {key}")
+        return "\n".join(lines)
+
+# ---------------------------- Stage recording ---------------------------------
+class _Stage:
+    def __init__(self, name: str, rows: Optional[int]):
+        self.name = name
+        self.rows = rows
+
+@contextmanager
+def track_stage(name: str, rows: Optional[int] = None, metrics: StageMetrics = METRICS):
+    """
+    Record wall time, rows and RSS delta of the block as stage `name`; set `.rows` on the
+    yielded handle when the count is known only at the end. Nested stages are recorded too
+    (with their parent); only the outermost one is profiled.
+    """
+    handle = _Stage(name, rows)
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    parent = stack[-1] if stack else None
+    profiler = None
+    if parent is None and _profile_mode != "off" and _profile_lock.acquire(blocking=False):
+        profiler = _CProfiler() if _profile_mode == "cprofile" else _StackSampler()
+        profiler.start()
+    stack.append(name)
+    error = None
+    rss0 = current_rss_mb()
+    t0 = time.perf_counter()
+    try:
+        yield handle
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - t0
+        rss_delta = current_rss_mb() - rss0
+        stack.pop()
+        profile = None
+        if profiler is not None:
+            profile = profiler.stop()
+            _profile_lock.release()
+        metrics.record({
+            "stage": name, "parent": parent, "started_at": time.time() - seconds, "seconds": seconds,
+            "rows": None if handle.rows is None else int(handle.rows), "rss_delta_mb": rss_delta,
+            "thread": threading.current_thread().name, "error": error, "profile": profile,
+        })
+
+def _default_rows(result, args) -> Optional[int]:
+    """Rows of the returned frame, of a stats dict with "rows", else of the first frame argument."""
+    if isinstance(result, pd.DataFrame):
+        return len(result)
+    if isinstance(result, dict) and isinstance(result.get("rows"), (int, np.integer)):
+        return int(result["rows"])
+    for a in args:
+        if isinstance(a, pd.DataFrame):
+            return len(a)
+    return None
+
+def instrumented(stage: str, rows: Optional[Callable] = None):
+    """
+    Decorator: record each call as `stage`. `rows(result, args, kwargs)` gives the row count;
+    by default the returned DataFrame, a {"rows": n} result or the first DataFrame argument.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track_stage(stage) as s:
+                result = func(*args, **kwargs)
+                s.rows = rows(result, args, kwargs) if rows is not None else _default_rows(result, args)
+            return result
+        return wrapper
+    return decorate
+
+# -------------------------------- Export --------------------------------------
+def metrics_json(metrics: StageMetrics = METRICS, recent: bool = True) -> str:
+    snap = metrics.snapshot()
+    if not recent:
+        snap.pop("recent")
+    return json.dumps(snap, indent=2, default=str)
+
+def metrics_text(metrics: StageMetrics = METRICS, prefix: str = "superstore_stage") -> str:
+    """Prometheus text exposition of the per-stage totals."""
+    snap = metrics.snapshot()
+    series = [
+        ("calls_total", "counter", "calls"), ("errors_total", "counter", "errors"),
+        ("seconds_total", "counter", "seconds"), ("rows_total", "counter", "rows"),
+        ("seconds_max", "gauge", "max_seconds"), ("rss_delta_mb_max", "gauge", "max_rss_delta_mb"),
+    ]
+    lines = []
+    for suffix, kind, field in series:
+        lines.append(f"# TYPE {prefix}_{suffix} {kind}")
+        for stage, t in sorted(snap["stages"].items()):
+            lines.append(f'{prefix}_{suffix}{{stage="{stage}"}} {t[field]}')
+    lines.append("# TYPE process_resident_memory_mb gauge")
+    lines.append(f"process_resident_memory_mb {snap['rss_mb']:.1f}")
+    return "\n".join(lines) + "\n"
+
+def stage_summary(metrics: StageMetrics = METRICS) -> pd.DataFrame:
+    """Per-stage totals as a table, slowest total first (for the dashboard diagnostics panel)."""
+    stages = metrics.snapshot()["stages"]
+    cols = ["stage", "calls", "seconds", "mean_ms", "p50_ms", "p95_ms", "max_seconds", "rows", "rows_per_s",
+            "max_rss_delta_mb", "errors"]
+    df = pd.DataFrame([{"stage": k, **v} for k, v in stages.items()], columns=cols)
+    return df.sort_values("seconds", ascending=False, ignore_index=True)
+
+def recent_stages(metrics: StageMetrics = METRICS, limit: int = 50) -> pd.DataFrame:
+    """Latest stage records, newest first, without the profile text."""
+    recs = metrics.records()[-limit:][::-1]
+    cols = ["started_at", "stage", "parent", "seconds", "rows", "rss_delta_mb", "thread", "error"]
+    df = pd.DataFrame(recs, columns=cols + ["profile"])
+    df["started_at"] = pd.to_datetime(df["started_at"], unit="s")
+    df["has_profile"] = df["profile"].notna()
+    return df[cols + ["has_profile"]]
@@ -0,0 +1,168 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.base import clone
+from sklearn.metrics import average_precision_score, precision_recall_curve
+from sklearn.model_selection import StratifiedKFold, TimeSeriesSplit
+
+from .worker_pool import worker_context
+
+CV_SCHEMES = ("stratified", "time")
+DEFAULT_CV_FOLDS = 5
+# Cost of a loss-making order predicted profitable (FP) / a profitable order predicted loss-making (FN)
+DEFAULT_COST_FP = 1.0
+DEFAULT_COST_FN = 1.0
+PR_CURVE_POINTS = 200
+
+def cv_folds(y: np.ndarray, scheme: str = "stratified", n_splits: int = DEFAULT_CV_FOLDS,
+             days: Optional[np.ndarray] = None, random_state: int = 42) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    (train_idx, test_idx) per fold.
+    stratified - shuffled StratifiedKFold on the labels; every row is out-of-fold once
+    time       - forward chaining over Order Date days (`days`, NaN = unknown): fold k trains on
+                 every day before its test block, so the earliest block is never out-of-fold and
+                 rows of one day never sit on both sides. Rows without a day are left out.
+    """
+    if scheme == "stratified":
+        skf = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+        return list(skf.split(np.zeros(len(y)), y))
+    if scheme == "time":
+        if days is None:
+            raise ValueError("Time-based CV needs Order Date")
+        days = np.asarray(days, dtype=float)
+        udays = np.unique(days[~np.isnan(days)])
+        if len(udays) <= n_splits:
+            raise ValueError(f"Time-based CV needs more than {n_splits} distinct order days")
+        folds = []
+        for tr, te in TimeSeriesSplit(n_splits=n_splits).split(udays):
+            first, last = udays[te[0]], udays[te[-1]]
+            folds.append((np.flatnonzero(days < first), np.flatnonzero((days >= first) & (days <= last))))
+        return folds
+    raise ValueError(f"Unknown CV scheme {scheme!r}; expected one of {CV_SCHEMES}")
+
+# ------------------------- Shared (memory-mapped) matrix -----------------------
+def share_matrix(X, root: str) -> Dict:
+    """
+    Write a dense or CSR matrix as .npy files under `root`; the returned spec is all a worker
+    needs to open it with open_matrix (memory maps: no pickled copy per process).
+    """
+    if sparse.issparse(X):
+        X = sparse.csr_matrix(X)
+        for name in ("data", "indices", "indptr"):
+            np.save(os.path.join(root, f"X_{name}.npy"), getattr(X, name))
+        return {"root": root, "kind": "csr", "shape": list(X.shape)}
+    np.save(os.path.join(root, "X.npy"), np.ascontiguousarray(X, dtype=np.float64))
+    return {"root": root, "kind": "dense", "shape": list(np.shape(X))}
+
+def open_matrix(spec: Dict):
+    root = spec["root"]
+    if spec["kind"] == "csr":
+        arrays = [np.load(os.path.join(root, f"X_{n}.npy"), mmap_mode="r") for n in ("data", "indices", "indptr")]
+        return sparse.csr_matrix(tuple(arrays), shape=tuple(spec["shape"]), copy=False)
+    return np.load(os.path.join(root, "X.npy"), mmap_mode="r")
+
+def _positive_column(classes) -> int:
+    classes = np.asarray(classes)
+    return int(np.flatnonzero(classes == 1)[0]) if (classes == 1).any() else len(classes) - 1
+
+def _fit_fold(spec: Dict, clf, train_idx: np.ndarray, test_idx: np.ndarray) -> np.ndarray:
+    """Runs in a worker: fit `clf` on the training rows of the shared matrix, P(profitable) of the test rows."""
+    X = open_matrix(spec)
+    y = np.load(os.path.join(spec["root"], "y.npy"), mmap_mode="r")
+    clf.fit(X[train_idx], np.asarray(y[train_idx]))
+    return clf.predict_proba(X[test_idx])[:, _positive_column(clf.classes_)]
+
+# ------------------------------ Threshold tuning -------------------------------
+def cost_optimal_threshold(y: np.ndarray, proba: np.ndarray, cost_fp: float = DEFAULT_COST_FP,
+                           cost_fn: float = DEFAULT_COST_FN) -> Dict:
+    """
+    Threshold t (profitable when proba >= t) minimizing cost_fp * FP + cost_fn * FN on (y, proba).
+    Every distinct probability is a candidate (one sort + cumulative sums); t is placed halfway
+    to the next lower probability so the counts hold for values between the two.
+    """
+    y = np.asarray(y, dtype=np.int64)
+    order = np.argsort(-proba, kind="stable")
+    p, yy = proba[order], y[order]
+    last = np.r_[np.flatnonzero(np.diff(p) != 0), len(p) - 1]   # last row of each distinct value
+    tp = np.cumsum(yy)[last]
+    fp = np.cumsum(1 - yy)[last]
+    n_pos = int(yy.sum())
+    fn = n_pos - tp
+    cost = cost_fp * fp + cost_fn * fn
+    best = int(np.argmin(cost))
+    if cost_fn * n_pos < cost[best]:  # predicting nothing profitable is cheapest
+        return {"threshold": float(np.nextafter(p[0], np.inf)), "cost": float(cost_fn * n_pos), "tp": 0, "fp": 0,
+                "fn": n_pos, "precision": 0.0, "recall": 0.0, "cost_fp": cost_fp, "cost_fn": cost_fn}
+    lower = p[last[best] + 1] if last[best] + 1 < len(p) else 0.0
+    return {
+        "threshold": float((p[last[best]] + lower) / 2),
+        "cost": float(cost[best]),
+        "tp": int(tp[best]), "fp": int(fp[best]), "fn": int(fn[best]),
+        "precision": float(tp[best] / max(tp[best] + fp[best], 1)),
+        "recall": float(tp[best] / max(n_pos, 1)),
+        "cost_fp": cost_fp, "cost_fn": cost_fn,
+    }
+
+def pr_curve(y: np.ndarray, proba: np.ndarray, points: int = PR_CURVE_POINTS) -> Dict[str, list]:
+    """Precision/recall per threshold, thinned to at most `points` entries (JSON-able, for metadata)."""
+    precision, recall, thresholds = precision_recall_curve(y, proba)
+    keep = np.unique(np.linspace(0, len(thresholds) - 1, min(points, len(thresholds))).round().astype(int))
+    return {"threshold": thresholds[keep].tolist(), "precision": precision[keep].tolist(),
+            "recall": recall[keep].tolist()}
+
+# ---------------------------------- Driver ------------------------------------
+def cross_validate_oof(X, y: np.ndarray, clf, scheme: str = "stratified", n_splits: int = DEFAULT_CV_FOLDS,
+                       days: Optional[np.ndarray] = None, workers: Optional[int] = None,
+                       cost_fp: float = DEFAULT_COST_FP, cost_fn: float = DEFAULT_COST_FN,
+                       random_state: int = 42) -> Dict:
+    """
+    k-fold CV of an unfitted `clf` on an encoded matrix, folds fitted in a process pool of
+    `workers` (default: one per fold, capped at the CPU count; 1 = in this process). The
+    matrix and labels are written once as .npy files and memory-mapped by every worker.
+    Returns out-of-fold P(profitable) ("oof", NaN where a row was never tested), per-fold
+    average precision, the PR curve and the cost-optimal threshold over all out-of-fold rows.
+    """
+    y = np.asarray(y, dtype=np.int64)
+    folds = cv_folds(y, scheme, n_splits, days, random_state)
+    workers = workers or min(len(folds), os.cpu_count() or 1)
+    clf = clone(clf)
+    if workers > 1 and "n_jobs" in clf.get_params():
+        clf.set_params(n_jobs=max(1, (os.cpu_count() or 1) // workers))  # folds already run in parallel
+
+    root = tempfile.mkdtemp(prefix="superstore_cv_")
+    try:
+        spec = share_matrix(X, root)
+        np.save(os.path.join(root, "y.npy"), y)
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=worker_context()) as pool:
+                probas = list(pool.map(_fit_fold, [spec] * len(folds), [clone(clf) for _ in folds],
+                                       [tr for tr, _ in folds], [te for _, te in folds]))
+        else:
+            probas = [_fit_fold(spec, clone(clf), tr, te) for tr, te in folds]
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    oof = np.full(len(y), np.nan)
+    fold_metrics = []
+    for k, ((tr, te), p) in enumerate(zip(folds, probas)):
+        oof[te] = p
+        fold_metrics.append({"fold": k, "n_train": int(len(tr)), "n_test": int(len(te)),
+                             "average_precision": float(average_precision_score(y[te], p))
+                             if len(np.unique(y[te])) > 1 else None})
+    tested = ~np.isnan(oof)
+    return {
+        "scheme": scheme,
+        "n_splits": n_splits,
+        "workers": workers,
+        "oof": oof,
+        "oof_rows": int(tested.sum()),
+        "folds": fold_metrics,
+        "average_precision": float(average_precision_score(y[tested], oof[tested])),
+        "pr_curve": pr_curve(y[tested], oof[tested]),
+        "threshold": cost_optimal_threshold(y[tested], oof[tested], cost_fp, cost_fn),
+    }
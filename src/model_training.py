@@ -1,79 +1,453 @@
-from typing import Dict, Tuple
+import inspect
+from typing import Callable, Dict, Optional, Sequence, Tuple, Union
 import numpy as np
 import pandas as pd
+import sklearn
 from sklearn.model_selection import train_test_split
 from sklearn.compose import ColumnTransformer
-from sklearn.preprocessing import OneHotEncoder
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, TargetEncoder
 from sklearn.pipeline import Pipeline
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, classification_report
-from .data_preprocessing import read_superstore_csv
-from .feature_engineering import add_basic_features
-from .model_utils import save_model
+from .data_preprocessing import (load_superstore_dataset, iter_superstore_csv, file_fingerprint, frame_fingerprint,
+                                 normalization_fingerprint)
+from .chunked_aggregation import collect_training_frame
+from .model_utils import (save_model, save_model_artifact, remove_model_artifact, artifact_path_for,
+                          model_history_columns, save_history_state)
+from .compiled_model import CompiledForest
+from . import encoders
+from . import history_features as history_features_module
+from .encoders import ColumnFiller, HashingEncoder, FrequencyEncoder
+from .feature_store import FeatureStore, fingerprint
+from .model_evaluation import DEFAULT_CV_FOLDS, DEFAULT_COST_FP, DEFAULT_COST_FN, cross_validate_oof
+from .history_features import HISTORY_KEYS, HistoryState, history_feature_columns
+from .instrumentation import instrumented, track_stage
 
 DEFAULT_MODEL_PATH = "models/model_profit_clf.joblib"
 
+NUMERIC_FEATURES = ["Sales", "Quantity", "Discount", "Days_to_Ship"]
+CATEGORICAL_FEATURES = ["Ship Mode", "Segment", "Category", "Sub-Category", "Region"]
+
 def get_feature_columns(df: pd.DataFrame) -> Tuple[list, list]:
-    num_features = [c for c in ["Sales", "Quantity", "Discount", "Days_to_Ship"] if c in df.columns]
-    cat_features = [c for c in ["Ship Mode", "Segment", "Category", "Sub-Category", "Region"] if c in df.columns]
+    num_features = [c for c in NUMERIC_FEATURES if c in df.columns]
+    cat_features = [c for c in CATEGORICAL_FEATURES if c in df.columns]
     return num_features, cat_features
 
-def train_profit_classifier(csv_path: str, model_out: str = DEFAULT_MODEL_PATH, test_size: float = 0.2, random_state: int = 42) -> Dict:
-    # Load & FE
-    df = read_superstore_csv(csv_path)
-    df = add_basic_features(df)
+TRAINING_ENGINES = ("rf_dense", "rf_sparse", "hist_gb")
 
-    # Drop rows without target
-    df = df.dropna(subset=["Profitable"])
+# Optional high-cardinality features (hundreds to thousands of values each) and their encoders:
+#   hash      - signed feature hashing into a fixed-width sparse matrix
+#   target    - out-of-fold (cross-fitted) mean target per value, sklearn TargetEncoder
+#   frequency - share of training rows per value
+#   rare      - sparse one-hot with values seen < RARE_MIN_FREQUENCY times bucketed together
+HIGH_CARDINALITY_COLUMNS = ["City", "State", "Postal Code", "Product ID", "Customer ID"]
+HIGH_CARD_ENCODINGS = ("hash", "target", "frequency", "rare")
+SPARSE_ENCODINGS = ("hash", "rare")
+HASH_FEATURES = 2 ** 12
+RARE_MIN_FREQUENCY = 10
+
+def get_high_cardinality_columns(df: pd.DataFrame) -> list:
+    return [c for c in HIGH_CARDINALITY_COLUMNS if c in df.columns]
+
+def build_high_card_encoder(encoding: str, random_state: int = 42):
+    if encoding == "hash":
+        return HashingEncoder(n_features=HASH_FEATURES)
+    if encoding == "target":
+        return TargetEncoder(target_type="binary", cv=5, shuffle=True, random_state=random_state)
+    if encoding == "frequency":
+        return FrequencyEncoder()
+    if encoding == "rare":
+        return OneHotEncoder(handle_unknown="infrequent_if_exist", min_frequency=RARE_MIN_FREQUENCY, sparse_output=True)
+    raise ValueError(f"Unknown high-cardinality encoding {encoding!r}; expected one of {HIGH_CARD_ENCODINGS}")
+
+def build_pipeline(num_features: list, cat_features: list, engine: str = "rf_dense", random_state: int = 42,
+                   high_card_features: Sequence[str] = (), high_card_encoding: str = "target",
+                   history_features: Sequence[str] = ()) -> Pipeline:
+    """
+    Unfitted prep + classifier pipeline for `engine`:
+      rf_dense  - dense one-hot + RandomForest (original setup)
+      rf_sparse - sparse (CSR) one-hot + RandomForest; same trees, memory ~ non-zeros instead of rows x categories
+      hist_gb   - ordinal codes + HistGradientBoosting with native categorical splits (no one-hot at all)
+    With `high_card_features`, those columns go through `high_card_encoding` (see HIGH_CARD_ENCODINGS)
+    behind a ColumnFiller step, so inputs carrying only the base features still score.
+    `history_features` (see history_features.py) pass through as numbers behind the same filler.
+    Sparse encodings keep the whole design matrix sparse; hist_gb accepts only target/frequency.
+    """
+    high_card = list(high_card_features)
+    sparse_high_card = bool(high_card) and high_card_encoding in SPARSE_ENCODINGS
+    extra = [("hicard", build_high_card_encoder(high_card_encoding, random_state), high_card)] if high_card else []
 
-    # Features/Target
+    if engine in ("rf_dense", "rf_sparse"):
+        sparse = engine == "rf_sparse"
+        preproc = ColumnTransformer(
+            transformers=[
+                ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=sparse), cat_features),
+            ] + extra,
+            remainder="passthrough",
+            sparse_threshold=1.0 if sparse or sparse_high_card else 0.0
+        )
+        clf = RandomForestClassifier(
+            n_estimators=300,
+            random_state=random_state,
+            n_jobs=-1
+        )
+    elif engine == "hist_gb":
+        if sparse_high_card:
+            raise ValueError("hist_gb needs dense input; use high_card_encoding 'target' or 'frequency'")
+        # Unknown/missing categories -> NaN, which HistGradientBoosting routes as missing values
+        preproc = ColumnTransformer(
+            transformers=[
+                ("cat", OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=np.nan,
+                                       encoded_missing_value=np.nan), cat_features),
+            ] + extra,
+            remainder="passthrough"
+        )
+        clf = HistGradientBoostingClassifier(
+            categorical_features=list(range(len(cat_features))),  # cat block comes first in the output
+            max_iter=300,
+            early_stopping=False,
+            random_state=random_state
+        )
+    else:
+        raise ValueError(f"Unknown training engine {engine!r}; expected one of {TRAINING_ENGINES}")
+
+    steps = [("prep", preproc), ("clf", clf)]
+    if high_card or history_features:
+        steps.insert(0, ("fill", ColumnFiller(high_card + list(history_features))))
+    return Pipeline(steps=steps)
+
+def training_split(df: pd.DataFrame, test_size: float = 0.2, random_state: int = 42, extra_features: Sequence[str] = ()):
+    """
+    (X_train, X_test, y_train, y_test, feature_cols, num_features, cat_features), stratified on Profitable.
+    feature_cols also holds `extra_features` (e.g. high-cardinality columns).
+    """
+    df = df.dropna(subset=["Profitable"])
     num_features, cat_features = get_feature_columns(df)
-    feature_cols = num_features + cat_features
+    feature_cols = num_features + cat_features + [c for c in extra_features if c in df.columns]
     X = df[feature_cols].copy()
     y = df["Profitable"].astype(int)
-
-    # Train-test split
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=test_size, random_state=random_state, stratify=y
     )
+    return X_train, X_test, y_train, y_test, feature_cols, num_features, cat_features
 
-    # Preprocess
-    preproc = ColumnTransformer(
-        transformers=[
-            ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=False), cat_features),
-        ],
-        remainder="passthrough"
-    )
+def classification_metrics(y_true, y_pred) -> Dict:
+    return {
+        "accuracy": float(accuracy_score(y_true, y_pred)),
+        "precision": float(precision_score(y_true, y_pred, zero_division=0)),
+        "recall": float(recall_score(y_true, y_pred, zero_division=0)),
+        "f1": float(f1_score(y_true, y_pred, zero_division=0)),
+        "report": classification_report(y_true, y_pred, zero_division=0)
+    }
 
-    # Model
-    clf = RandomForestClassifier(
-        n_estimators=300,
-        random_state=random_state,
-        n_jobs=-1
-    )
+def save_trained_model(pipe: Pipeline, model_out: str, feature_cols: list, metrics: Dict,
+                       data_fingerprint: Optional[str] = None, artifact: bool = True,
+                       threshold: Optional[float] = None, history_state: Optional[HistoryState] = None) -> Optional[str]:
+    """
+    joblib dump + memory-mapped artifact; returns the artifact path (None when not written).
+    Only one-hot forests compile to an artifact; a stale one is dropped so loaders don't pick up an old model.
+    A decision `threshold` is kept as pipe.decision_threshold_ and in the artifact meta (see
+    model_utils.model_threshold); without one, a threshold the pipeline already carries is kept.
+    A pipeline with history features (pipe.history_features_) needs the `history_state` of its
+    training data, saved next to it (model_utils.history_path_for) so scoring can rebuild them.
+    """
+    if threshold is not None:
+        pipe.decision_threshold_ = float(threshold)
+    threshold = getattr(pipe, "decision_threshold_", None)
+    if model_history_columns(pipe):
+        history_state = history_state if history_state is not None else getattr(pipe, "history_state_", None)
+        if history_state is None:
+            raise ValueError("A model with history features needs its history state to be saved")
+    else:
+        history_state = None
+    state_attr = pipe.__dict__.pop("history_state_", None)  # saved separately, not inside the joblib
+    save_model(pipe, model_out)
+    if state_attr is not None:
+        pipe.history_state_ = state_attr
+    save_history_state(history_state, model_out)
+    compiled = None
+    if artifact:
+        try:
+            compiled = export_compiled_forest(pipe)
+        except ValueError:
+            compiled = None
+    if compiled is None:
+        remove_model_artifact(artifact_path_for(model_out))
+        return None
+    return save_model_artifact(compiled, artifact_path_for(model_out), feature_columns=feature_cols,
+                               metrics=metrics, data_fingerprint=data_fingerprint, threshold=threshold)
 
-    pipe = Pipeline(steps=[("prep", preproc), ("clf", clf)])
+def _numeric_matrix(X):
+    """
+    Dense prep output is an object array when nullable columns (Int64 Quantity) pass through;
+    convert to float64 (NA -> NaN) as the estimators' input validation would.
+    """
+    if isinstance(X, np.ndarray) and X.dtype == object:
+        return pd.DataFrame(X).apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    return X
 
-    # Fit
-    pipe.fit(X_train, y_train)
-
-    # Evaluate
-    y_pred = pipe.predict(X_test)
-    metrics = {
-        "accuracy": float(accuracy_score(y_test, y_pred)),
-        "precision": float(precision_score(y_test, y_pred, zero_division=0)),
-        "recall": float(recall_score(y_test, y_pred, zero_division=0)),
-        "f1": float(f1_score(y_test, y_pred, zero_division=0)),
-        "report": classification_report(y_test, y_pred, zero_division=0)
+def feature_store_key(data_fingerprint: str, engine: str, high_card_encoding: Optional[str],
+                      test_size: float, random_state: int, history_features: bool = False) -> Tuple[str, Dict]:
+    """
+    (key, parts) of the encoded train/test matrices for a training configuration. Classifier
+    hyperparameters are not part of it, so sweeps over them share one entry.
+    """
+    pipe = build_pipeline(NUMERIC_FEATURES, CATEGORICAL_FEATURES, engine=engine, random_state=random_state,
+                          high_card_features=HIGH_CARDINALITY_COLUMNS if high_card_encoding else (),
+                          high_card_encoding=high_card_encoding or "target",
+                          history_features=history_feature_columns() if history_features else ())
+    parts = {
+        "data": data_fingerprint,
+        "features": [NUMERIC_FEATURES, CATEGORICAL_FEATURES, HIGH_CARDINALITY_COLUMNS if high_card_encoding else [],
+                     history_feature_columns() if history_features else []],
+        "split": {"test_size": test_size, "random_state": random_state, "stratify": "Profitable"},
+        "prep": pipe[:-1].get_params(deep=True),
+        "code": [normalization_fingerprint(), inspect.getsource(build_pipeline), inspect.getsource(encoders),
+                 sklearn.__version__] + ([inspect.getsource(history_features_module)] if history_features else []),
     }
+    return fingerprint(parts), parts
 
-    # Save model
-    save_model(pipe, model_out)
+# Estimator parameter that counts trees/iterations; fits that grow it with warm_start equal one full fit
+_ENSEMBLE_SIZE_PARAMS = {RandomForestClassifier: "n_estimators", HistGradientBoostingClassifier: "max_iter"}
+
+def fit_with_progress(clf, X, y, progress: Optional[Callable] = None, steps: int = 10,
+                      start: float = 0.0, end: float = 1.0):
+    """
+    clf.fit(X, y), growing the ensemble in `steps` warm-started slices when `progress` is given so
+    progress("fit", fraction, trees=n) can be reported along the way (fraction in [start, end]).
+    """
+    size_param = _ENSEMBLE_SIZE_PARAMS.get(type(clf))
+    if progress is None or size_param is None or getattr(clf, "early_stopping", False) is True:
+        clf.fit(X, y)
+        return clf
+    total = clf.get_params()[size_param]
+    warm_start = clf.get_params()["warm_start"]
+    clf.set_params(warm_start=True)
+    for n in np.unique(np.linspace(total / steps, total, steps).round().astype(int).clip(min=1)):  # < 2 * steps trees: first slices round to 0
+        clf.set_params(**{size_param: int(n)})
+        clf.fit(X, y)
+        progress("fit", float(start + (end - start) * n / total), trees=int(n))
+    clf.set_params(warm_start=warm_start)
+    return clf
+
+@instrumented("model.train", rows=lambda res, args, kwargs: res["n_train"] + res["n_test"])
+def train_profit_classifier(csv_path: Union[str, pd.DataFrame], model_out: str = DEFAULT_MODEL_PATH, test_size: float = 0.2,
+                            random_state: int = 42, chunksize: Optional[int] = None, artifact: bool = True,
+                            engine: str = "rf_dense", high_card_encoding: Optional[str] = None,
+                            clf_params: Optional[Dict] = None, feature_store: Union[None, str, FeatureStore] = None,
+                            progress: Optional[Callable] = None, history_features: bool = False,
+                            cv: Optional[str] = None, cv_folds: int = DEFAULT_CV_FOLDS, cv_workers: Optional[int] = None,
+                            cost_fp: float = DEFAULT_COST_FP, cost_fn: float = DEFAULT_COST_FN) -> Dict:
+    """
+    `csv_path` may also be an already featurized frame (e.g. the dashboard's data_df).
+    clf_params override classifier hyperparameters (e.g. {"n_estimators": 100, "max_depth": 12}).
+    With `feature_store` (a FeatureStore or its directory) the fitted preprocessing and encoded
+    train/test matrices are cached per data hash + feature/split/prep configuration, so repeated
+    runs and sweeps skip parsing, featurizing, splitting and encoding and go straight to fitting.
+    `progress(stage, fraction, **info)` is called as loading, encoding, fitting and saving advance.
+    With `history_features`, per-customer/product/sub-category history from orders strictly before
+    each Order Date is added as numeric features (see history_features.py). Only training-row labels
+    feed the rates (test rows count as orders, not outcomes); the state of all rows is saved with
+    the model for scoring.
+    With `cv` ("stratified" or "time", see model_evaluation.cv_folds), `cv_folds`-fold CV runs on
+    the training rows in a process pool first; its out-of-fold probabilities give a PR curve and
+    the threshold minimizing cost_fp * FP + cost_fn * FN, which is saved with the model and used
+    by the dashboard, batch scoring and serving instead of 0.5.
+    """
+    report = progress or (lambda stage, fraction, **info: None)
+    report("load", 0.0)
+    in_memory = isinstance(csv_path, pd.DataFrame)
+    data_fingerprint = frame_fingerprint(csv_path) if in_memory else file_fingerprint(csv_path)
+    store = FeatureStore(feature_store) if isinstance(feature_store, str) else feature_store
+    key, parts = (feature_store_key(data_fingerprint, engine, high_card_encoding, test_size, random_state,
+                                    history_features)
+                  if store is not None else (None, None))
+    matrices = store.get(key) if store is not None else None
+    store_status = None if store is None else ("hit" if matrices is not None else "miss")
+
+    if matrices is None:
+        # Feature columns per frame (+ City/State/... when a high-cardinality encoding is requested,
+        # + the history keys when history features are computed after loading, + Order Date for time-based CV)
+        def training_columns(frame: pd.DataFrame) -> Tuple[list, list]:
+            num_features, cat_features = get_feature_columns(frame)
+            extra = get_high_cardinality_columns(frame) if high_card_encoding else []
+            keep = ["Order Date"] + (list(HISTORY_KEYS) if history_features else [])
+            extra += [c for c in keep if c in frame.columns and c not in cat_features + extra]
+            return num_features, cat_features + extra
+
+        # Load & FE (chunked: keep only feature/target columns while streaming large exports)
+        if in_memory:
+            df = csv_path
+        elif chunksize:
+            df = collect_training_frame(iter_superstore_csv(csv_path, chunksize=chunksize), training_columns)
+        else:
+            df = load_superstore_dataset(csv_path)
+        high_card = get_high_cardinality_columns(df) if high_card_encoding else []
+
+        # Train-test split (rows without target dropped)
+        if not df.index.is_unique:
+            df = df.reset_index(drop=True)
+        X_train, X_test, y_train, y_test, feature_cols, num_features, cat_features = training_split(
+            df, test_size=test_size, random_state=random_state, extra_features=high_card
+        )
+        history, history_state = [], None
+        if history_features:
+            # Every row counts as an order, but only training labels feed the profit rates:
+            # held-out outcomes must not leak into the features they are evaluated on
+            with track_stage("features.history", rows=len(df)):
+                train_labels = df["Profitable"].where(df.index.isin(X_train.index))
+                feats = HistoryState().features(df.assign(Profitable=train_labels))
+                history = [c for c in history_feature_columns() if c in feats.columns]
+                X_train = X_train.join(feats[history])
+                X_test = X_test.join(feats[history])
+                feature_cols = feature_cols + history
+                del feats
+                # Scoring later sees all of these orders with their known outcomes
+                history_state = HistoryState()
+                history_state.absorb(df)
+        # Order Date as days since epoch (NaN when missing) for time-based CV
+        days = ((df["Order Date"] - pd.Timestamp(0)).dt.days.astype("float64") if "Order Date" in df.columns
+                else None)
+        del df
+        report("encode", 0.2, n_train=int(len(y_train)), n_test=int(len(y_test)))
+
+        # Preprocess (fit on train only; same as Pipeline.fit's fit_transform step)
+        prep = build_pipeline(num_features, cat_features, engine=engine, random_state=random_state,
+                              high_card_features=high_card, high_card_encoding=high_card_encoding or "target",
+                              history_features=history)[:-1]
+        matrices = {
+            "prep": prep,
+            "X_train": _numeric_matrix(prep.fit_transform(X_train, y_train)),
+            "X_test": _numeric_matrix(prep.transform(X_test)),
+            "y_train": y_train.to_numpy(),
+            "y_test": y_test.to_numpy(),
+            "day_train": days.loc[X_train.index].to_numpy() if days is not None else None,
+            "day_test": days.loc[X_test.index].to_numpy() if days is not None else None,
+            "feature_cols": feature_cols,
+            "num_features": num_features,
+            "cat_features": cat_features,
+            "high_card": high_card,
+            "history": history,
+            "history_state": history_state,
+        }
+        if store is not None:
+            store.put(key, matrices, parts)
+
+    # Model on the encoded matrices, reassembled with the fitted preprocessing into one Pipeline
+    clf = build_pipeline(matrices["num_features"], matrices["cat_features"], engine=engine, random_state=random_state,
+                         high_card_features=matrices["high_card"],
+                         high_card_encoding=high_card_encoding or "target").named_steps["clf"]
+    if clf_params:
+        clf.set_params(**clf_params)
+
+    # Cross-validation on the training rows -> out-of-fold PR curve + cost-optimal threshold
+    cv_result, threshold = None, None
+    if cv:
+        report("cv", 0.3, feature_store=store_status, folds=cv_folds)
+        cv_result = cross_validate_oof(matrices["X_train"], matrices["y_train"], clf, scheme=cv, n_splits=cv_folds,
+                                       days=matrices.get("day_train"), workers=cv_workers,
+                                       cost_fp=cost_fp, cost_fn=cost_fn, random_state=random_state)
+        threshold = cv_result["threshold"]["threshold"]
+
+    # Fit
+    fit_start = 0.6 if cv else 0.3
+    report("fit", fit_start, feature_store=store_status)
+    fit_with_progress(clf, matrices["X_train"], matrices["y_train"], progress, start=fit_start, end=0.9)
+    pipe = Pipeline(steps=list(matrices["prep"].steps) + [("clf", clf)])
+    if matrices.get("history"):
+        pipe.history_features_ = list(matrices["history"])
+        pipe.history_state_ = matrices["history_state"]  # scores in memory; saved next to the model
+
+    # Evaluate (at 0.5, as before, and at the tuned threshold)
+    proba = clf.predict_proba(matrices["X_test"])
+    y_pred = clf.classes_.take(proba.argmax(axis=1))
+    metrics = classification_metrics(matrices["y_test"], y_pred)
+    if cv_result is not None:
+        pos = int(np.flatnonzero(clf.classes_ == 1)[0]) if (clf.classes_ == 1).any() else proba.shape[1] - 1
+        at_threshold = classification_metrics(matrices["y_test"], (proba[:, pos] >= threshold).astype(int))
+        metrics["threshold"] = threshold
+        metrics["at_threshold"] = {k: v for k, v in at_threshold.items() if k != "report"}
+        metrics["cv"] = {k: v for k, v in cv_result.items() if k != "oof"}
+    report("save", 0.95, accuracy=metrics["accuracy"], f1=metrics["f1"])
+
+    # Save model (+ memory-mapped artifact next to it, e.g. models/model_profit_clf.artifact)
+    feature_cols = matrices["feature_cols"]
+    artifact_path = save_trained_model(pipe, model_out, feature_cols, metrics, data_fingerprint, artifact, threshold)
 
     return {
-        "n_train": int(len(X_train)),
-        "n_test": int(len(X_test)),
+        "engine": engine,
+        "high_card_encoding": high_card_encoding,
+        "history_features": matrices.get("history", []),
+        "n_train": int(len(matrices["y_train"])),
+        "n_test": int(len(matrices["y_test"])),
         "feature_cols": feature_cols,
         "metrics": metrics,
-        "model_path": model_out
+        "model_path": model_out,
+        "artifact_path": artifact_path,
+        "feature_store": store_status,
+        "threshold": threshold,
+        "cv": cv_result,
+    }
+
+def export_compiled_forest(pipe: Pipeline) -> CompiledForest:
+    """
+    Flatten a fitted Pipeline(ColumnTransformer(OneHotEncoder, passthrough), RandomForestClassifier)
+    into contiguous NumPy arrays evaluated by CompiledForest (no sklearn needed at inference).
+    Raises ValueError for other pipeline shapes.
+    """
+    prep, clf = pipe.named_steps.get("prep"), pipe.named_steps.get("clf")
+    if list(pipe.named_steps) != ["prep", "clf"] or not isinstance(prep, ColumnTransformer) \
+            or not isinstance(clf, RandomForestClassifier):
+        raise ValueError("Only Pipeline(prep=ColumnTransformer, clf=RandomForestClassifier) can be compiled")
+
+    input_columns = list(prep.feature_names_in_)
+    n_out = sum(s.stop - s.start for s in prep.output_indices_.values())
+    enc_source = np.full(n_out, -1, dtype=np.int32)
+    categories = {}
+    for name, trans, cols in prep.transformers_:
+        out_slice = prep.output_indices_[name]
+        if out_slice.stop == out_slice.start:
+            continue
+        cols = [input_columns[c] if isinstance(c, (int, np.integer)) else c for c in cols]
+        if isinstance(trans, OneHotEncoder):
+            if trans.drop is not None or getattr(trans, "_infrequent_enabled", False):
+                raise ValueError("OneHotEncoder with drop/infrequent categories is not supported")
+            pos = out_slice.start
+            for col, cats in zip(cols, trans.categories_):
+                enc_source[pos:pos + len(cats)] = input_columns.index(col)
+                categories[col] = [None if pd.isna(c) else c for c in cats.tolist()]
+                pos += len(cats)
+        elif trans == "passthrough" or (name == "remainder" and getattr(trans, "func", None) is None):
+            for k, col in enumerate(cols):
+                enc_source[out_slice.start + k] = input_columns.index(col)
+        else:
+            raise ValueError(f"Unsupported transformer {name!r}: {trans!r}")
+
+    lefts, rights, feats, thrs, miss, probas, roots = [], [], [], [], [], [], []
+    offset = 0
+    for est in clf.estimators_:
+        t = est.tree_
+        is_leaf = t.children_left < 0
+        lefts.append(np.where(is_leaf, -1, t.children_left + offset))
+        rights.append(np.where(is_leaf, -1, t.children_right + offset))
+        feats.append(np.where(is_leaf, 0, t.feature))
+        thrs.append(t.threshold)
+        miss.append(getattr(t, "missing_go_to_left", np.zeros(t.node_count, dtype=np.uint8)).astype(bool))
+        v = t.value[:, 0, :]
+        probas.append(v / np.maximum(v.sum(axis=1, keepdims=True), 1e-300))
+        roots.append(offset)
+        offset += t.node_count
+
+    arrays = {
+        "left": np.concatenate(lefts).astype(np.int32),
+        "right": np.concatenate(rights).astype(np.int32),
+        "feature": np.concatenate(feats).astype(np.int32),
+        "threshold": np.concatenate(thrs).astype(np.float64),
+        "missing_left": np.concatenate(miss),
+        "leaf_proba": np.concatenate(probas).astype(np.float64),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "enc_source": enc_source,
     }
+    meta = {"input_columns": input_columns, "categories": categories, "classes": clf.classes_.tolist(),
+            "threshold": getattr(pipe, "decision_threshold_", None)}
+    return CompiledForest(arrays, meta)
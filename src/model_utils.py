@@ -1,9 +1,148 @@
+import json
+import os
+import shutil
+import time
 from pathlib import Path
+from typing import Dict, Optional
+import numpy as np
 from joblib import dump, load
 
+from .compiled_model import CompiledForest, FOREST_ARRAYS, DERIVED_ARRAYS
+from .history_features import HISTORY_META, HistoryState, history_feature_columns
+
+ARTIFACT_FORMAT_VERSION = 1
+ARTIFACT_SUFFIX = ".artifact"
+ARTIFACT_META = "meta.json"
+HISTORY_SUFFIX = ".history"
+DEFAULT_THRESHOLD = 0.5
+
 def save_model(pipeline, path: str):
     Path(path).parent.mkdir(parents=True, exist_ok=True)
     dump(pipeline, path)
 
+def model_threshold(model) -> float:
+    """Decision threshold stored with the model (tuned by CV at training), DEFAULT_THRESHOLD otherwise."""
+    meta = getattr(model, "meta", None)
+    t = meta.get("threshold") if isinstance(meta, dict) else getattr(model, "decision_threshold_", None)
+    return DEFAULT_THRESHOLD if t is None else float(t)
+
 def load_model(path: str):
-    return load(path)
+    """
+    joblib pipeline, or a CompiledForest when `path` is a model artifact directory.
+    A pipeline trained with history features gets its saved HistoryState as `history_state_`
+    (ValueError when the state is missing: scoring without it would silently fill NaN).
+    """
+    if is_model_artifact(path):
+        return load_model_artifact(path)
+    model = load(path)
+    if model_history_columns(model):
+        history = history_path_for(path)
+        if not (Path(history) / HISTORY_META).is_file():
+            raise ValueError(f"{path} was trained with history features but has no saved history state "
+                             f"({history}); retrain the model")
+        model.history_state_ = HistoryState.load(history)
+    return model
+
+# ------------------------------ History state ---------------------------------
+def history_path_for(model_path: str) -> str:
+    """models/model_profit_clf.joblib -> models/model_profit_clf.history"""
+    return str(Path(model_path).with_suffix(HISTORY_SUFFIX))
+
+def model_history_columns(model) -> list:
+    """History feature columns the model was trained with ([] for models without them)."""
+    cols = getattr(model, "history_features_", None)
+    if cols is None:  # pipelines saved before the attribute existed: the filler step lists them
+        fill = getattr(model, "named_steps", {}).get("fill")
+        cols = [c for c in getattr(fill, "columns", ()) if c in history_feature_columns()]
+    return list(cols)
+
+def save_history_state(state: Optional[HistoryState], model_path: str):
+    """Write `state` next to the model (swapped in whole); None removes a stale one."""
+    target = Path(history_path_for(model_path))
+    if state is None:
+        shutil.rmtree(target, ignore_errors=True)
+        return
+    tmp = target.with_name(f".{target.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    state.save(tmp)
+    old = target.with_name(f".{target.name}.old-{os.getpid()}")
+    if target.exists():
+        target.rename(old)
+    tmp.rename(target)
+    shutil.rmtree(old, ignore_errors=True)
+
+# --------------------------- Memory-mapped artifact ---------------------------
+def artifact_path_for(model_path: str) -> str:
+    """models/model_profit_clf.joblib -> models/model_profit_clf.artifact"""
+    return str(Path(model_path).with_suffix(ARTIFACT_SUFFIX))
+
+def is_model_artifact(path: str) -> bool:
+    return (Path(path) / ARTIFACT_META).is_file()
+
+def save_model_artifact(model, path: str, feature_columns: Optional[list] = None, metrics: Optional[Dict] = None,
+                        data_fingerprint: Optional[str] = None, threshold: Optional[float] = None) -> str:
+    """
+    Write a fitted RandomForest pipeline (or an already exported CompiledForest) as a directory of
+    uncompressed .npy arrays plus meta.json (feature columns, category vocabularies, classes,
+    metrics, data fingerprint, decision threshold). The directory is swapped in whole, so readers never see a partial one.
+    """
+    if not isinstance(model, CompiledForest):
+        from .model_training import export_compiled_forest  # model_training imports this module
+        model = export_compiled_forest(model)
+
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir()
+
+    arrays = {**{k: model.arrays[k] for k in FOREST_ARRAYS}, **model.derived_arrays()}
+    for name, arr in arrays.items():
+        np.save(tmp / f"{name}.npy", np.ascontiguousarray(arr), allow_pickle=False)
+
+    meta = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "model_type": "compiled_forest",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "feature_columns": list(feature_columns or model.input_columns),
+        "input_columns": model.input_columns,
+        "categories": model.categories,
+        "classes": model.classes_.tolist(),
+        "n_trees": int(model.n_trees),
+        "metrics": metrics or {},
+        "data_fingerprint": data_fingerprint,
+        "threshold": threshold if threshold is not None else model.meta.get("threshold"),
+        "arrays": {k: {"dtype": str(v.dtype), "shape": list(v.shape)} for k, v in arrays.items()},
+    }
+    with open(tmp / ARTIFACT_META, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2, default=str)
+
+    old = target.with_name(f".{target.name}.old-{os.getpid()}")
+    if target.exists():
+        target.rename(old)
+    tmp.rename(target)
+    shutil.rmtree(old, ignore_errors=True)
+    return str(target)
+
+def remove_model_artifact(path: str):
+    if is_model_artifact(path):
+        shutil.rmtree(path)
+
+def read_model_meta(path: str) -> Dict:
+    """Artifact header only (cheap: no arrays are opened)."""
+    with open(Path(path) / ARTIFACT_META, encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported model artifact version: {meta.get('format_version')}")
+    return meta
+
+def load_model_artifact(path: str, mmap: bool = True) -> CompiledForest:
+    """
+    CompiledForest over the artifact arrays. With mmap=True the arrays are read-only memory maps,
+    so processes loading the same artifact share the page cache instead of holding private copies.
+    """
+    meta = read_model_meta(path)
+    mode = "r" if mmap else None
+    names = [k for k in FOREST_ARRAYS + DERIVED_ARRAYS if k in meta["arrays"]]
+    arrays = {k: np.load(Path(path) / f"{k}.npy", mmap_mode=mode, allow_pickle=False) for k in names}
+    return CompiledForest(arrays, meta)
@@ -0,0 +1,305 @@
+"""
+Out-of-core analytics backend: the normalized data as a Parquet dataset partitioned by
+Order_Year/Region (hive layout), queried with pyarrow predicate pushdown.
+
+    python -m src.parquet_dataset --source data/raw/USSuperstoreData.csv --out data/dataset
+    SUPERSTORE_DATASET=data/dataset streamlit run app/app.py
+
+Date ranges prune Order_Year directories and, since every partition is sorted by Order Date,
+row groups through their min/max statistics; Region prunes directories. Aggregates stream the
+matching fragments batch by batch into mergeable rollup cells, so memory is bounded by the
+rollup, not by the data.
+"""
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from .data_preprocessing import DEFAULT_CHUNKSIZE, iter_superstore_csv, resolve_superstore_files, file_fingerprint
+from .instrumentation import instrumented
+from .chunked_aggregation import reduce_eda_aggregates
+from .rollup import ROLLUP_DIMENSIONS, RollupView, rollup_cells
+
+DEFAULT_DATASET_DIR = "data/dataset"
+DATASET_FORMAT_VERSION = 1
+DATASET_MANIFEST = "_manifest.json"   # '_' prefix: ignored by pyarrow dataset discovery
+PARTITION_COLUMNS = ["Order_Year", "Region"]
+ROW_GROUP_ROWS = 64_000
+SCAN_BATCH_ROWS = 256_000
+ROLLUP_CACHE_ENTRIES = 32
+ROLLUP_COLUMNS = ["Order Date", "Order ID", "Sales", "Profit", "Profitable"] + ROLLUP_DIMENSIONS
+VOCABULARY_COLUMNS = ["Region", "Category", "Sub-Category", "Segment", "Ship Mode"]
+FLOAT_COLUMNS = ["Sales", "Profit", "Discount", "Days_to_Ship"]
+
+def _partitioning():
+    return ds.partitioning(pa.schema([("Order_Year", pa.int32()), ("Region", pa.string())]), flavor="hive")
+
+def _arrow_schema(chunk: pd.DataFrame) -> pa.Schema:
+    """
+    One schema for every chunk: integers as int64 (Order_Year int32), columns that may get NaN
+    as float64, strings as string and timestamps in microseconds, whatever the first chunk held.
+    """
+    fields = []
+    for f in pa.Schema.from_pandas(chunk, preserve_index=False):
+        t = f.type
+        if f.name == "Order_Year":
+            t = pa.int32()
+        elif f.name in FLOAT_COLUMNS:
+            t = pa.float64()
+        elif pa.types.is_integer(t):
+            t = pa.int64()
+        elif pa.types.is_timestamp(t):
+            t = pa.timestamp("us")
+        elif pa.types.is_string(t) or pa.types.is_large_string(t) or pa.types.is_dictionary(t) or pa.types.is_null(t):
+            t = pa.string()
+        fields.append(pa.field(f.name, t))
+    return pa.schema(fields)
+
+def _to_arrow(chunk: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    chunk = chunk.reindex(columns=schema.names)
+    chunk["Order_Year"] = chunk["Order_Year"].astype("Int32")
+    return pa.Table.from_pandas(chunk, preserve_index=False).cast(schema)
+
+# ------------------------------- Writing --------------------------------------
+def write_partitioned_dataset(sources, out_dir: str = DEFAULT_DATASET_DIR, chunksize: int = DEFAULT_CHUNKSIZE,
+                              row_group_rows: int = ROW_GROUP_ROWS, sort_partitions: bool = True) -> Dict:
+    """
+    Stream one or many exports (path, directory or glob) chunk by chunk into a hive-partitioned
+    Parquet dataset at `out_dir`. With `sort_partitions`, each Order_Year/Region partition is then
+    rewritten sorted by Order Date (one partition in memory at a time) so row-group statistics
+    prune date ranges. The new dataset replaces `out_dir` only once complete.
+    """
+    files = resolve_superstore_files(sources)
+    if not files:
+        raise FileNotFoundError(f"No Superstore CSV files found in {sources!r}")
+    out = Path(out_dir)
+    staging, tmp, old = (out.with_name(out.name + s) for s in (".staging", ".tmp", ".old"))
+    for d in (staging, tmp, old):
+        shutil.rmtree(d, ignore_errors=True)
+
+    t0 = time.perf_counter()
+    stats = {"rows": 0, "date_min": None, "date_max": None, "vocabularies": {c: set() for c in VOCABULARY_COLUMNS}}
+
+    def observe(chunk: pd.DataFrame) -> pd.DataFrame:
+        stats["rows"] += len(chunk)
+        if "Order Date" in chunk.columns and chunk["Order Date"].notna().any():
+            lo, hi = chunk["Order Date"].min(), chunk["Order Date"].max()
+            stats["date_min"] = lo if stats["date_min"] is None else min(stats["date_min"], lo)
+            stats["date_max"] = hi if stats["date_max"] is None else max(stats["date_max"], hi)
+        for c in VOCABULARY_COLUMNS:
+            if c in chunk.columns:
+                stats["vocabularies"][c].update(chunk[c].dropna().unique().tolist())
+        return chunk
+
+    chunks = (observe(c) for f in files for c in iter_superstore_csv(f, chunksize=chunksize, engine="fast"))
+    first = next(chunks)
+    schema = _arrow_schema(first)
+    batches = (b for c in chain([first], chunks) for b in _to_arrow(c, schema).to_batches())
+    ds.write_dataset(batches, staging, schema=schema, format="parquet", partitioning=_partitioning(),
+                     max_rows_per_group=row_group_rows, min_rows_per_group=min(row_group_rows, 8_192),
+                     existing_data_behavior="overwrite_or_ignore", max_partitions=4096)
+
+    if sort_partitions:
+        for leaf in sorted({p.parent for p in staging.rglob("*.parquet")}):
+            table = pq.read_table(leaf)
+            if "Order Date" in table.column_names:
+                table = table.sort_by([("Order Date", "ascending")])
+            dest = tmp / leaf.relative_to(staging)
+            dest.mkdir(parents=True, exist_ok=True)
+            pq.write_table(table, dest / "part-0.parquet", row_group_size=row_group_rows, compression="zstd")
+            del table
+        shutil.rmtree(staging)
+    else:
+        staging.rename(tmp)
+
+    manifest = {
+        "format": DATASET_FORMAT_VERSION,
+        "sources": [{"path": f, "fingerprint": file_fingerprint(f)} for f in files],
+        "rows": stats["rows"],
+        "columns": schema.names,
+        "partitioning": PARTITION_COLUMNS,
+        "sorted_by": "Order Date" if sort_partitions else None,
+        "date_min": stats["date_min"].isoformat() if stats["date_min"] is not None else None,
+        "date_max": stats["date_max"].isoformat() if stats["date_max"] is not None else None,
+        "vocabularies": {c: sorted(v) for c, v in stats["vocabularies"].items() if v},
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    (tmp / DATASET_MANIFEST).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    if out.exists():
+        out.rename(old)
+    tmp.rename(out)
+    shutil.rmtree(old, ignore_errors=True)
+    return {"path": str(out), "rows": stats["rows"], "files": len(files),
+            "bytes": sum(p.stat().st_size for p in out.rglob("*.parquet")), "seconds": time.perf_counter() - t0}
+
+def is_partitioned_dataset(path: str) -> bool:
+    return (Path(path) / DATASET_MANIFEST).is_file()
+
+# ------------------------------- Querying -------------------------------------
+def dataset_filter(date_range: Optional[Sequence] = None,
+                   filters: Optional[Dict[str, Iterable]] = None) -> Optional[ds.Expression]:
+    """
+    pyarrow filter for a (start, end) inclusive date range and {column: values} filters (empty
+    lists mean no filter), i.e. FilterIndex.select semantics. The Order_Year term prunes partitions;
+    the Order Date terms are checked against row-group statistics before any row is decoded.
+    """
+    terms = []
+    if date_range:
+        start, end = pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1])
+        terms.append(ds.field("Order_Year").isin(list(range(start.year, end.year + 1))))
+        terms.append(ds.field("Order Date") >= pa.scalar(start.as_unit("us").to_datetime64(), pa.timestamp("us")))
+        terms.append(ds.field("Order Date") <= pa.scalar(end.as_unit("us").to_datetime64(), pa.timestamp("us")))
+    for col, picked in (filters or {}).items():
+        if picked:
+            terms.append(ds.field(col).isin([str(v) for v in picked]))
+    expr = None
+    for t in terms:
+        expr = t if expr is None else expr & t
+    return expr
+
+class PartitionedDataset:
+    """Read side of write_partitioned_dataset: filtered scans, fragment-wise rollups and samples."""
+
+    def __init__(self, path: str = DEFAULT_DATASET_DIR):
+        self.path = Path(path)
+        self.manifest = json.loads((self.path / DATASET_MANIFEST).read_text(encoding="utf-8"))
+        self.dataset = ds.dataset(str(self.path), format="parquet", partitioning=_partitioning())
+        self.columns = self.dataset.schema.names
+        self.n_rows = int(self.manifest["rows"])
+        self._rollups: "OrderedDict[str, RollupView]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def date_bounds(self):
+        lo, hi = self.manifest.get("date_min"), self.manifest.get("date_max")
+        return (pd.Timestamp(lo), pd.Timestamp(hi)) if lo and hi else (None, None)
+
+    def vocabulary(self, col: str) -> list:
+        return list(self.manifest.get("vocabularies", {}).get(col, []))
+
+    def fragments(self, date_range=None, filters=None) -> List[str]:
+        """Parquet files left after partition pruning (row groups are pruned further while scanning)."""
+        return [f.path for f in self.dataset.get_fragments(filter=dataset_filter(date_range, filters))]
+
+    def _columns(self, columns: Optional[Sequence[str]]) -> Optional[List[str]]:
+        return None if columns is None else [c for c in columns if c in self.columns]
+
+    def iter_batches(self, columns: Optional[Sequence[str]] = None, date_range=None, filters=None,
+                     batch_rows: int = SCAN_BATCH_ROWS) -> Iterator[pd.DataFrame]:
+        """Matching rows as pandas frames of up to `batch_rows` rows, reading only `columns`."""
+        scanner = self.dataset.scanner(columns=self._columns(columns), filter=dataset_filter(date_range, filters),
+                                       batch_size=batch_rows)
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    @instrumented("load.dataset_scan")
+    def scan(self, columns: Optional[Sequence[str]] = None, date_range=None, filters=None,
+             limit: Optional[int] = None) -> pd.DataFrame:
+        """Matching rows (first `limit` only when given) as one frame."""
+        cols, expr = self._columns(columns), dataset_filter(date_range, filters)
+        table = (self.dataset.head(limit, columns=cols, filter=expr) if limit is not None
+                 else self.dataset.to_table(columns=cols, filter=expr))
+        return table.to_pandas()
+
+    def count_rows(self, date_range=None, filters=None) -> int:
+        return int(self.dataset.count_rows(filter=dataset_filter(date_range, filters)))
+
+    def rollup(self, date_range=None, filters=None) -> RollupView:
+        """
+        RollupView (KPIs, per Category/Sub-Category, monthly) over the matching fragments, kept in a
+        small LRU per (date range, filters) so reruns and other sessions reuse it.
+        """
+        key = repr((date_range and tuple(pd.Timestamp(d) for d in date_range),
+                    sorted((k, sorted(map(str, v))) for k, v in (filters or {}).items() if v)))
+        with self._lock:
+            if key in self._rollups:
+                self._rollups.move_to_end(key)
+                return self._rollups[key]
+        view = self._scan_rollup(date_range, filters)
+        with self._lock:
+            self._rollups[key] = view
+            while len(self._rollups) > ROLLUP_CACHE_ENTRIES:
+                self._rollups.popitem(last=False)
+        return view
+
+    @instrumented("aggregate.dataset_rollup", rows=lambda view, args, kwargs: int(view.cells["rows"].sum()))
+    def _scan_rollup(self, date_range=None, filters=None, merge_every: int = 16) -> RollupView:
+        """Batches reduced with reduce_eda_aggregates: only the rollup is held in memory."""
+        view = reduce_eda_aggregates(self.iter_batches(ROLLUP_COLUMNS, date_range, filters), merge_every)
+        if view is None:  # nothing matches: empty cells with the usual columns
+            c, p = rollup_cells(self.scan(ROLLUP_COLUMNS, limit=0))
+            view = RollupView(c, p, has_orders="Order ID" in self.columns, has_target="Profitable" in self.columns)
+        return view
+
+    @instrumented("load.dataset_sample")
+    def sample_rows(self, columns: Sequence[str], date_range=None, filters=None, max_rows: int = 20_000,
+                    expected_rows: Optional[int] = None, tail_share: float = 0.25,
+                    random_state: int = 0) -> pd.DataFrame:
+        """
+        Plotting sample gathered batch by batch: a random ~4 x `max_rows` share of the matching rows
+        plus the `tail_share * max_rows` lowest-Profit rows overall (what sample_for_scatter keeps),
+        so scatter_sales_profit can reduce it further without the full selection in memory.
+        `expected_rows` (e.g. from a rollup) avoids a counting pass.
+        """
+        n = expected_rows if expected_rows is not None else self.count_rows(date_range, filters)
+        frac = min(1.0, 4 * max_rows / n) if n else 1.0
+        n_tail = int(max_rows * tail_share)
+        rng = np.random.default_rng(random_state)
+        parts, tail = [], None
+        for batch in self.iter_batches(columns, date_range, filters):
+            if frac >= 1.0:
+                parts.append(batch)
+                continue
+            picked = rng.random(len(batch)) < frac
+            parts.append(batch[picked])
+            if n_tail and "Profit" in batch.columns:  # running lowest-Profit rows among those not sampled
+                rest = batch[~picked].nsmallest(n_tail, "Profit")
+                tail = rest if tail is None else pd.concat([tail, rest]).nsmallest(n_tail, "Profit")
+        if tail is not None:
+            parts.append(tail)
+        return pd.concat(parts, ignore_index=True) if parts else self.scan(columns, limit=0)
+
+_open_datasets: Dict[str, PartitionedDataset] = {}
+
+def dataset_version(path: str = DEFAULT_DATASET_DIR) -> str:
+    """Resolved path + manifest mtime: changes whenever the dataset is rewritten (the manifest is swapped in last)."""
+    return f"{Path(path).resolve()}|{os.stat(Path(path) / DATASET_MANIFEST).st_mtime_ns}"
+
+def open_dataset(path: str = DEFAULT_DATASET_DIR) -> PartitionedDataset:
+    """Shared PartitionedDataset for `path`, reopened when the dataset has been rewritten."""
+    root = str(Path(path).resolve())
+    key = dataset_version(path)
+    dataset = _open_datasets.get(key)
+    if dataset is None:
+        for stale in [k for k in _open_datasets if k.startswith(root + "|")]:
+            del _open_datasets[stale]
+        dataset = _open_datasets[key] = PartitionedDataset(path)
+    return dataset
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write the Superstore data as a partitioned Parquet dataset")
+    parser.add_argument("--source", required=True, help="CSV file, directory of CSVs or glob")
+    parser.add_argument("--out", default=DEFAULT_DATASET_DIR)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--row-group-rows", type=int, default=ROW_GROUP_ROWS)
+    parser.add_argument("--no-sort", action="store_true", help="skip the per-partition sort by Order Date")
+    args = parser.parse_args(argv)
+
+    stats = write_partitioned_dataset(args.source, args.out, args.chunksize, args.row_group_rows, not args.no_sort)
+    print(f"Wrote {stats['rows']:,} rows from {stats['files']} file(s) to {stats['path']} "
+          f"({stats['bytes'] / 1e6:.1f} MB) in {stats['seconds']:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+from typing import Dict, Iterable, List, MutableMapping, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+from .filter_index import FilterIndex, get_filter_index
+from .instrumentation import instrumented
+
+ROLLUP_DIMENSIONS = ["Region", "Category", "Sub-Category"]
+HLL_PRECISION = 14  # 2**14 registers -> ~0.8% standard error, exact-ish (linear counting) below ~40k
+
+# ------------------------------ HyperLogLog -----------------------------------
+def hll_pairs(values: pd.Series, precision: int = HLL_PRECISION) -> pd.DataFrame:
+    """(bucket, rho) per value; a sketch is the max rho per bucket, so sketches merge by max."""
+    h = pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+    bucket = (h >> np.uint64(64 - precision)).astype(np.int32)
+    rest = (h & np.uint64((1 << (64 - precision)) - 1)).astype(np.float64)  # exact: < 2**53
+    _, exp = np.frexp(rest)  # rest = m * 2**exp with 0.5 <= m < 1 -> floor(log2(rest)) = exp - 1
+    rho = np.where(rest > 0, (64 - precision) - (exp - 1), 64 - precision + 1).astype(np.uint8)
+    return pd.DataFrame({"bucket": bucket, "rho": rho})
+
+def hll_estimate(rho_by_bucket: np.ndarray, precision: int = HLL_PRECISION) -> float:
+    """Cardinality estimate from the non-empty registers (max rho per bucket)."""
+    m = 1 << precision
+    n_set = len(rho_by_bucket)
+    if n_set == 0:
+        return 0.0
+    alpha = 0.7213 / (1 + 1.079 / m)
+    z = np.sum(np.exp2(-rho_by_bucket.astype(np.float64))) + (m - n_set)  # empty registers count 2**0
+    est = alpha * m * m / z
+    if est <= 2.5 * m and n_set < m:
+        est = m * np.log(m / (m - n_set))  # linear counting for small cardinalities
+    return float(est)
+
+# -------------------------------- Cube ----------------------------------------
+def _month_key(dates: pd.Series) -> np.ndarray:
+    """year*12 + month-1, -1 for missing dates."""
+    key = (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype="float64", na_value=np.nan)
+    return np.where(np.isnan(key), -1, key).astype(np.int32)
+
+def rollup_cells(df: pd.DataFrame, dims: Optional[Sequence[str]] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    (cells, pairs) of `df` at (month, *dims) grain: summed measures per cell and the Order ID
+    sketch pairs (cell, bucket, max rho, dims) per cell.
+    """
+    dims = [d for d in (ROLLUP_DIMENSIONS if dims is None else dims) if d in df.columns]
+    month = _month_key(df["Order Date"]) if "Order Date" in df.columns else np.full(len(df), -1, np.int32)
+    keys = pd.DataFrame({"month": month}, index=df.index)
+    for d in dims:
+        keys[d] = df[d]
+    measures = pd.DataFrame({
+        "Sales": df["Sales"] if "Sales" in df else 0.0,
+        "Profit": df["Profit"] if "Profit" in df else 0.0,
+        "sales_count": df["Sales"].notna().astype(np.int64) if "Sales" in df else 0,
+        "rows": np.ones(len(df), dtype=np.int64),
+    }, index=df.index)
+    if "Profitable" in df.columns:
+        measures["profitable_sum"] = df["Profitable"].fillna(0).astype(np.int64)
+        measures["profitable_count"] = df["Profitable"].notna().astype(np.int64)
+
+    key_cols = ["month"] + dims
+    grouped = pd.concat([keys, measures], axis=1).groupby(key_cols, observed=True, dropna=False, sort=False)
+    cells = grouped.sum().reset_index()
+    cell_id = grouped.ngroup().to_numpy()
+
+    if "Order ID" in df.columns:
+        pairs = hll_pairs(df["Order ID"])
+        pairs["cell"] = cell_id
+        pairs = pairs[df["Order ID"].notna().to_numpy()]
+        pairs = pairs.groupby(["cell", "bucket"], sort=False)["rho"].max().reset_index()
+        # Carry the dimensions so views can merge sketches per Category/Sub-Category directly
+        pairs = pairs.join(cells[dims], on="cell")
+    else:
+        pairs = pd.DataFrame(columns=["cell", "bucket", "rho"] + dims)
+    return cells, pairs
+
+def merge_rollups(cells: List[pd.DataFrame], pairs: List[pd.DataFrame]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Combine rollup_cells results of disjoint row sets (e.g. dataset fragments): measures add up
+    per (month, dims) cell, sketches merge by max rho per (dims, bucket).
+    """
+    cells = pd.concat(cells, ignore_index=True)
+    dims = [c for c in cells.columns if c in ROLLUP_DIMENSIONS]
+    cells = cells.groupby(["month"] + dims, observed=True, dropna=False, sort=False).sum().reset_index()
+    pairs = pd.concat([p.drop(columns="cell", errors="ignore") for p in pairs], ignore_index=True)
+    pairs = pairs.groupby(dims + ["bucket"], observed=True, dropna=False, sort=False)["rho"].max().reset_index()
+    return cells, pairs
+
+class RollupView:
+    """Aggregates for one filter selection: selected cube cells plus their order-ID sketch pairs."""
+
+    def __init__(self, cells: pd.DataFrame, pairs: pd.DataFrame, has_orders: bool, has_target: bool):
+        self.cells = cells
+        self.pairs = pairs
+        self.has_orders = has_orders
+        self.has_target = has_target
+
+    def _distinct_orders(self, by: Optional[str] = None):
+        if by is None:
+            rho = self.pairs.groupby("bucket")["rho"].max().to_numpy()
+            return int(round(hll_estimate(rho)))
+        merged = self.pairs.groupby([by, "bucket"], observed=True, dropna=False)["rho"].max()
+        return merged.groupby(level=0, dropna=False).apply(lambda s: int(round(hll_estimate(s.to_numpy()))))
+
+    def kpi(self) -> dict:
+        """Same keys/meaning as visualization.kpi_summary (n_orders is an HLL estimate)."""
+        c = self.cells
+        n_rows = int(c["rows"].sum())
+        n_orders = self._distinct_orders() if self.has_orders else n_rows
+        profit_ratio = None
+        if self.has_target:
+            cnt = c["profitable_count"].sum()
+            profit_ratio = float(c["profitable_sum"].sum() / cnt * 100.0) if cnt else float("nan")
+        return dict(total_sales=float(c["Sales"].sum()), total_profit=float(c["Profit"].sum()),
+                    n_orders=n_orders, profit_ratio=profit_ratio)
+
+    def where(self, filters: Optional[Dict[str, Iterable]] = None) -> "RollupView":
+        """View restricted to {dimension: values} (empty lists mean no filter, as in FilterIndex)."""
+        cells, pairs = self.cells, self.pairs
+        for col, picked in (filters or {}).items():
+            if picked and col in cells.columns:
+                cells = cells[cells[col].isin(list(picked))]
+                if col in pairs.columns:
+                    pairs = pairs[pairs[col].isin(list(picked))]
+        return RollupView(cells, pairs, self.has_orders, self.has_target)
+
+    def values_in(self, col: str) -> list:
+        """Distinct values of a dimension among the view's cells (for cascading filter widgets)."""
+        return self.cells[col].dropna().unique().tolist() if col in self.cells.columns else []
+
+    def by_category(self) -> pd.DataFrame:
+        return self.cells.groupby("Category", as_index=False, observed=True)[["Sales", "Profit"]].sum()
+
+    def by_subcategory(self) -> pd.DataFrame:
+        """Sales, Profit and Orders (distinct Order ID, or Sales count without IDs) per Sub-Category."""
+        g = self.cells.groupby("Sub-Category", observed=True)[["Sales", "Profit", "sales_count"]].sum()
+        if self.has_orders:
+            g["Orders"] = self._distinct_orders("Sub-Category").reindex(g.index).fillna(0).astype(int)
+        else:
+            g["Orders"] = g["sales_count"].astype(int)
+        return g.drop(columns="sales_count").reset_index()
+
+    def monthly(self) -> pd.DataFrame:
+        """Monthly Sales/Profit labelled by month end, gaps filled with 0 (like resample('ME').sum())."""
+        c = self.cells[self.cells["month"] >= 0]
+        g = c.groupby("month")[["Sales", "Profit"]].sum()
+        if g.empty:
+            return pd.DataFrame(columns=["Order Date", "Sales", "Profit"])
+        g = g.reindex(np.arange(g.index.min(), g.index.max() + 1), fill_value=0)
+        first_day = pd.to_datetime(pd.DataFrame({"year": g.index // 12, "month": g.index % 12 + 1, "day": 1}))
+        g.index = pd.DatetimeIndex(first_day + pd.offsets.MonthEnd(0), name="Order Date")
+        return g.reset_index()
+
+class RollupCube:
+    """
+    Materialized rollup at (month, Region, Category, Sub-Category) grain with mergeable measures:
+    sums of Sales/Profit/Profitable, row counts and a sparse HyperLogLog of Order ID per cell.
+    Built once per dataset; query() answers the dashboard filters from cells, touching raw rows
+    only for boundary months that the date range covers partially.
+    """
+
+    @instrumented("aggregate.rollup_build")
+    def __init__(self, df: pd.DataFrame, index: Optional[FilterIndex] = None):
+        self._df = df
+        self.index = index if index is not None else FilterIndex(df)
+        self.dims = [d for d in ROLLUP_DIMENSIONS if d in df.columns]
+        self.has_orders = "Order ID" in df.columns
+        self.has_target = "Profitable" in df.columns
+        self.cells, self.pairs = self._aggregate(df)
+        self.n_cells = len(self.cells)
+
+        if "Order Date" in df.columns:
+            od = df["Order Date"]
+            bounds = od.groupby(_month_key(od)).agg(["min", "max"])
+            self.month_bounds = bounds[bounds.index >= 0]
+        else:
+            self.month_bounds = pd.DataFrame(columns=["min", "max"])
+
+    def _aggregate(self, df: pd.DataFrame):
+        return rollup_cells(df, self.dims)
+
+    @instrumented("aggregate.rollup_query")
+    def query(self, date_range: Optional[Sequence] = None,
+              filters: Optional[Dict[str, Iterable]] = None) -> RollupView:
+        """Aggregates for a (start, end) date range and {column: values} filters (FilterIndex semantics)."""
+        filters = {k: list(v) for k, v in (filters or {}).items() if v}
+        sel = np.ones(self.n_cells, dtype=bool)
+        for col, picked in filters.items():
+            if col in self.cells.columns:
+                sel &= self.cells[col].isin(picked).to_numpy()
+
+        extra_cells, extra_pairs = [], []
+        if date_range and "Order Date" in self._df.columns:
+            start, end = pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1])
+            b = self.month_bounds
+            full = b.index[(b["min"] >= start) & (b["max"] <= end)]
+            partial = b.index[(b["max"] >= start) & (b["min"] <= end) & ~b.index.isin(full)]
+            sel &= np.isin(self.cells["month"].to_numpy(), full.to_numpy())
+
+            # Boundary months: aggregate the raw rows that fall inside the range
+            for key in partial:
+                lo = max(start, b.at[key, "min"])
+                hi = min(end, b.at[key, "max"])
+                rows = self.index.select((lo, hi), filters)
+                if len(rows):
+                    cells, pairs = self._aggregate(self._df.take(rows))
+                    extra_cells.append(cells)
+                    extra_pairs.append(pairs)
+
+        cells = pd.concat([self.cells[sel]] + extra_cells, ignore_index=True)
+        if self.has_orders:
+            sel_pairs = self.pairs[np.isin(self.pairs["cell"].to_numpy(), np.flatnonzero(sel))]
+            pairs = pd.concat([sel_pairs] + extra_pairs, ignore_index=True)
+        else:
+            pairs = self.pairs
+        return RollupView(cells, pairs, self.has_orders, self.has_target)
+
+    def is_for(self, df: pd.DataFrame) -> bool:
+        return self._df is df
+
+def get_rollup_cube(df: pd.DataFrame, store: MutableMapping, key: str = "rollup_cube") -> RollupCube:
+    """RollupCube for `df`, reused from `store` (e.g. st.session_state) until the frame is replaced."""
+    cube = store.get(key)
+    if not isinstance(cube, RollupCube) or not cube.is_for(df):
+        cube = RollupCube(df, index=get_filter_index(df, store))
+        store[key] = cube
+    return cube
@@ -0,0 +1,287 @@
+"""
+Headless profitability scoring service.
+
+    python -m src.serving --model models/model_profit_clf.joblib --port 8000 [--compiled]
+    python -m src.serving --model models/model_profit_clf.artifact   (memory-mapped, always compiled)
+
+POST /predict  body: one record, a list of records or {"instances": [...]} with the
+               get_feature_columns features (+ Order Date as YYYY-MM-DD, Customer ID and Product ID
+               for models trained with history features); returns label (at the model's decision
+               threshold) + probability per record
+GET  /metrics  latency percentiles (ms), throughput and batching counters
+GET  /metrics/stages (JSON) or /metrics/stages.txt (Prometheus text): per-stage timings
+GET  /health
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .batch_scoring import REQUIRED_COLUMNS, add_model_history, history_input_columns
+from .model_training import DEFAULT_MODEL_PATH, HIGH_CARDINALITY_COLUMNS, get_feature_columns, export_compiled_forest
+from .model_utils import load_model, model_threshold
+from .compiled_model import CompiledForest
+from .instrumentation import metrics_json, metrics_text, track_stage
+
+NUM_FEATURES, CAT_FEATURES = get_feature_columns(pd.DataFrame(columns=REQUIRED_COLUMNS))
+FEATURE_COLUMNS = NUM_FEATURES + CAT_FEATURES
+
+def records_to_frame(records: List[Dict], history_inputs: Sequence[str] = ()) -> pd.DataFrame:
+    """
+    Validate JSON records against the training feature schema and build the model input
+    (optional high-cardinality features are kept when any record carries them). `history_inputs`
+    (see batch_scoring.history_input_columns) are required too; Order Date must be ISO formatted.
+    Raises ValueError naming the features with non-scalar, non-numeric or unparseable values.
+    """
+    required = FEATURE_COLUMNS + [c for c in history_inputs if c not in FEATURE_COLUMNS]
+    missing = sorted({c for r in records for c in required if c not in r})
+    if missing:
+        raise ValueError(f"missing features: {missing}")
+    optional = [c for c in HIGH_CARDINALITY_COLUMNS if c not in required and any(c in r for r in records)]
+    # Lists/objects would reach the encoders as unhashable values and fail the whole micro-batch
+    bad = sorted({c for r in records for c in required + optional if isinstance(r.get(c), (list, dict))})
+    if bad:
+        raise ValueError(f"features must be scalar values: {bad}")
+    df = pd.DataFrame.from_records(records, columns=required + optional)
+    not_numeric = []
+    for c in NUM_FEATURES:
+        values = pd.to_numeric(df[c], errors="coerce")
+        if (values.isna() & df[c].notna()).any():  # e.g. "abc"; null stays a missing value
+            not_numeric.append(c)
+        df[c] = values
+    if not_numeric:
+        raise ValueError(f"features must be numeric: {not_numeric}")
+    if "Order Date" in df.columns:
+        dates = pd.to_datetime(df["Order Date"], errors="coerce", format="ISO8601")
+        if (dates.isna() & df["Order Date"].notna()).any():
+            raise ValueError("Order Date must be formatted YYYY-MM-DD")
+        df["Order Date"] = dates
+    return df
+
+class ServingStats:
+    """Rolling request latencies plus throughput/batching counters (thread-safe)."""
+
+    def __init__(self, window: int = 10_000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.started = time.time()
+        self.requests = self.rows = self.batches = self.errors = 0
+
+    def record_request(self, seconds: float, rows: int):
+        with self._lock:
+            self._latencies.append(seconds)
+            self.requests += 1
+            self.rows += rows
+
+    def record_batch(self):
+        with self._lock:
+            self.batches += 1
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            lat = np.asarray(self._latencies) * 1000.0
+            uptime = time.time() - self.started
+            return {
+                "uptime_s": uptime,
+                "requests": self.requests,
+                "rows": self.rows,
+                "errors": self.errors,
+                "batches": self.batches,
+                "avg_rows_per_batch": self.rows / self.batches if self.batches else 0.0,
+                "latency_ms_p50": float(np.percentile(lat, 50)) if len(lat) else None,
+                "latency_ms_p99": float(np.percentile(lat, 99)) if len(lat) else None,
+                "requests_per_s": self.requests / uptime if uptime > 0 else 0.0,
+                "rows_per_s": self.rows / uptime if uptime > 0 else 0.0,
+            }
+
+class MicroBatcher:
+    """
+    Collects concurrent requests for up to `max_wait_ms` (or `max_batch_rows` rows) and scores
+    them with one predict_proba call on a single worker thread.
+    """
+
+    def __init__(self, model, stats: ServingStats, max_batch_rows: int = 256, max_wait_ms: float = 5.0,
+                 threshold: Optional[float] = None):
+        self.model = model
+        self.stats = stats
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000.0
+        self.threshold = model_threshold(model) if threshold is None else threshold
+        self.history_inputs = history_input_columns(model)
+        classes = np.asarray(model.classes_)
+        self._pos = int(np.flatnonzero(classes == 1)[0]) if (classes == 1).any() else len(classes) - 1
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, df: pd.DataFrame) -> Future:
+        fut: Future = Future()
+        self._queue.put((df, fut))
+        return fut
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            n_rows = len(items[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            while n_rows < self.max_batch_rows:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                items.append(item)
+                n_rows += len(item[0])
+            self._score(items)
+
+    def _predict(self, df: pd.DataFrame) -> list:
+        proba = self.model.predict_proba(df)[:, self._pos]
+        return [{"label": int(v >= self.threshold), "proba": float(v)} for v in proba]
+
+    def _score(self, items):
+        try:
+            batch = pd.concat([df for df, _ in items], ignore_index=True) if len(items) > 1 else items[0][0]
+            with track_stage("serving.batch", rows=len(batch)):
+                preds = self._predict(batch)
+            self.stats.record_batch()
+        except Exception as e:
+            if len(items) == 1:
+                items[0][1].set_exception(e)
+                return
+            # One bad request must not fail the others batched with it: score each on its own
+            for df, fut in items:
+                try:
+                    fut.set_result(self._predict(df))
+                except Exception as item_error:
+                    fut.set_exception(item_error)
+            return
+        start = 0
+        for df, fut in items:
+            fut.set_result(preds[start:start + len(df)])
+            start += len(df)
+
+def make_handler(batcher: MicroBatcher, stats: ServingStats, timeout_s: float = 30.0):
+    schema = FEATURE_COLUMNS + [c for c in batcher.history_inputs if c not in FEATURE_COLUMNS]
+
+    class ScoringHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, code: int, payload, content_type: str = "application/json"):
+            body = (payload if isinstance(payload, str) else json.dumps(payload)).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "ok"})
+            elif self.path == "/metrics":
+                self._send(200, stats.snapshot())
+            elif self.path == "/metrics/stages":
+                self._send(200, metrics_json(recent=False))
+            elif self.path == "/metrics/stages.txt":
+                self._send(200, metrics_text(), content_type="text/plain; version=0.0.4")
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._send(404, {"error": "not found"})
+                return
+            t0 = time.perf_counter()
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"null")
+                if isinstance(payload, dict):
+                    payload = payload.get("instances", payload)
+                records = payload if isinstance(payload, list) else [payload]
+                if not records or not all(isinstance(r, dict) for r in records):
+                    raise ValueError("expected a JSON object or a list of objects")
+                df = records_to_frame(records, batcher.history_inputs)
+            except ValueError as e:  # includes JSONDecodeError
+                stats.record_error()
+                self._send(400, {"error": str(e), "features": schema})
+                return
+            try:
+                # History features per request (its own earlier-day lines count, other requests' do not)
+                df = add_model_history(batcher.model, df)
+                preds = batcher.submit(df).result(timeout=timeout_s)
+            except Exception as e:
+                stats.record_error()
+                self._send(500, {"error": str(e)})
+                return
+            stats.record_request(time.perf_counter() - t0, len(df))
+            self._send(200, {"predictions": preds})
+
+        def log_message(self, format, *args):  # keep the hot path quiet
+            pass
+
+    return ScoringHandler
+
+class ScoringServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # listen backlog; the default (5) resets bursts of concurrent clients
+
+def prepare_model_for_serving(model, n_jobs: Optional[int] = 1, compiled: bool = False):
+    """
+    Small micro-batches are faster without joblib worker fan-out per call; compiled=True swaps the
+    RandomForest pipeline for its array-based CompiledForest (same probabilities, lower latency).
+    """
+    if isinstance(model, CompiledForest):  # artifact directories load compiled already
+        return model
+    if compiled:
+        return export_compiled_forest(model)
+    if n_jobs is not None and hasattr(model, "set_params"):
+        try:
+            model.set_params(clf__n_jobs=n_jobs)
+        except ValueError:
+            pass
+    return model
+
+def build_server(model_path: str = DEFAULT_MODEL_PATH, host: str = "127.0.0.1", port: int = 8000,
+                 max_batch_rows: int = 256, max_wait_ms: float = 5.0, n_jobs: Optional[int] = 1,
+                 compiled: bool = False) -> ScoringServer:
+    model = prepare_model_for_serving(load_model(model_path), n_jobs, compiled)
+    stats = ServingStats()
+    batcher = MicroBatcher(model, stats, max_batch_rows=max_batch_rows, max_wait_ms=max_wait_ms)
+    return ScoringServer((host, port), make_handler(batcher, stats))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Superstore profitability scoring server")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-rows", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--n-jobs", type=int, default=1, help="forest n_jobs per predict call")
+    parser.add_argument("--compiled", action="store_true", help="score with the array-based CompiledForest")
+    args = parser.parse_args(argv)
+
+    server = build_server(args.model, args.host, args.port, args.max_batch_rows, args.max_wait_ms, args.n_jobs,
+                          args.compiled)
+    print(f"Serving {args.model} on http://{args.host}:{args.port} (POST /predict, GET /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
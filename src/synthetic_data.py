@@ -0,0 +1,195 @@
+"""
+Synthetic Superstore exports at arbitrary scale, in the raw file format
+(';' separator, ',' decimals, dd/mm/yy dates, CRLF, UTF-8 BOM header).
+
+    python -m src.synthetic_data --rows 1000000 --out data/synthetic/superstore_1m.csv [--seed 0]
+
+Distributions are learned from the reference file: order sizes, dates (seasonality and
+growth), ship mode x shipping days, customer segment mix, location and product frequencies,
+quantity, discount per (Region, Sub-Category), list prices per product and the profit margin
+per (Sub-Category, Discount), which keeps the loss-making share of discounted lines realistic.
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+import numpy as np
+import pandas as pd
+
+from .data_preprocessing import read_superstore_csv, row_id_column
+
+DEFAULT_REFERENCE_CSV = "data/raw/USSuperstoreData.csv"
+DEFAULT_SYNTHETIC_CHUNK = 250_000
+LOCATION_COLUMNS = ["Country", "City", "State", "Postal Code", "Region"]
+PRODUCT_COLUMNS = ["Product ID", "Category", "Sub-Category", "Product Name"]
+
+def _grouped_sampler(keys: pd.Series, values: np.ndarray):
+    """Draw values from the empirical distribution of the rows sharing the same key."""
+    codes, uniques = pd.factorize(keys)
+    order = np.argsort(codes, kind="stable")
+    sorted_values = values[order]
+    counts = np.bincount(codes, minlength=len(uniques))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    lookup = pd.Index(uniques)
+
+    def sample(rng: np.random.Generator, query_keys) -> np.ndarray:
+        g = lookup.get_indexer(query_keys)
+        missing = g < 0
+        g[missing] = 0
+        out = sorted_values[starts[g] + (rng.random(len(g)) * counts[g]).astype(np.int64)]
+        if missing.any():  # unseen key -> overall distribution
+            out[missing] = values[rng.integers(0, len(values), missing.sum())]
+        return out
+    return sample
+
+class SuperstoreProfile:
+    """Empirical distributions of a reference Superstore frame, sampled order by order."""
+
+    def __init__(self, ref: pd.DataFrame):
+        ref = ref.dropna(subset=["Order Date", "Sales", "Quantity", "Discount", "Profit"]).reset_index(drop=True)
+        self.columns = list(ref.columns)
+        self.row_id_col = row_id_column(ref) or "Row ID"
+
+        # Orders: lines per order, order-level attributes sampled together
+        lines = ref.groupby("Order ID", sort=False).size()
+        self.lines_per_order = lines.to_numpy()
+        first = ref.drop_duplicates("Order ID")
+        self.order_dates = first["Order Date"].to_numpy()
+        self.order_prefixes = first["Order ID"].str.split("-").str[0].to_numpy(dtype=object)
+        ship_days = (first["Ship Date"] - first["Order Date"]).dt.days
+        ok = ship_days.notna().to_numpy()
+        self.ship_modes = first["Ship Mode"].to_numpy(dtype=object)[ok]
+        self.ship_days = ship_days.to_numpy()[ok].astype(np.int64)
+        self.locations = first[LOCATION_COLUMNS].astype(object).to_numpy()
+
+        # Customers (scaled with the row count; new IDs keep the template's initials and segment)
+        cust = ref.drop_duplicates("Customer ID")
+        self.customers = cust[["Customer ID", "Customer Name", "Segment"]].astype(object).to_numpy()
+        self.rows_per_customer = len(ref) / max(len(cust), 1)
+
+        # Products: line frequency, median list price (before discount)
+        list_price = ref["Sales"] / ref["Quantity"].astype(float) / (1 - ref["Discount"]).clip(lower=0.05)
+        prod = ref.assign(_p=list_price).groupby("Product ID", sort=False).agg(
+            n=("_p", "size"), price=("_p", "median"))
+        meta = ref.drop_duplicates("Product ID").set_index("Product ID")
+        self.products = meta.loc[prod.index].reset_index()[PRODUCT_COLUMNS].astype(object).to_numpy()
+        self.product_weights = (prod["n"] / prod["n"].sum()).to_numpy()
+        self.product_prices = prod["price"].to_numpy()
+
+        self.quantities = ref["Quantity"].to_numpy(dtype=np.int64)
+        self.discount_given = _grouped_sampler(ref["Region"] + "|" + ref["Sub-Category"], ref["Discount"].to_numpy())
+
+        # Profit margin drawn from reference lines with the same Sub-Category and Discount
+        margin = (ref["Profit"] / ref["Sales"]).replace([np.inf, -np.inf], np.nan).fillna(0.0).to_numpy()
+        self.margin_given = _grouped_sampler(ref["Sub-Category"] + "|" + ref["Discount"].round(4).astype(str), margin)
+        self.date_range = (ref["Order Date"].min().to_datetime64(), ref["Order Date"].max().to_datetime64())
+
+    def sample(self, rng: np.random.Generator, n_rows: int, first_row_id: int = 1, first_order_no: int = 0,
+               n_customers: Optional[int] = None) -> pd.DataFrame:
+        """About `n_rows` lines (whole orders, trimmed to n_rows) in the reference column layout."""
+        n_orders = max(int(n_rows / self.lines_per_order.mean() * 1.1) + 1, 1)
+        lines = self.lines_per_order[rng.integers(0, len(self.lines_per_order), n_orders)]
+        n_orders = int(np.searchsorted(np.cumsum(lines), n_rows) + 1)
+        lines = lines[:n_orders]
+        order_of_line = np.repeat(np.arange(n_orders), lines)[:n_rows]
+        n = len(order_of_line)
+
+        # Order-level draws
+        dates = self.order_dates[rng.integers(0, len(self.order_dates), n_orders)] \
+            + rng.integers(-3, 4, n_orders).astype("timedelta64[D]")
+        dates = np.clip(dates, *self.date_range)
+        ship_pick = rng.integers(0, len(self.ship_modes), n_orders)
+        loc = self.locations[rng.integers(0, len(self.locations), n_orders)]
+        n_customers = n_customers or len(self.customers)
+        cust_no = rng.integers(0, n_customers, n_orders)
+        template = self.customers[cust_no % len(self.customers)]
+        cust_ids = template[:, 0].astype(str)
+        extra = cust_no >= len(self.customers)  # synthetic customers beyond the reference pool
+        if extra.any():
+            initials = np.char.partition(cust_ids[extra], "-")[:, 0]
+            cust_ids = cust_ids.astype(object)
+            cust_ids[extra] = [f"{i}-{10000 + k}" for i, k in zip(initials, cust_no[extra])]
+        years = pd.DatetimeIndex(dates).year.to_numpy()
+        prefixes = self.order_prefixes[rng.integers(0, len(self.order_prefixes), n_orders)]
+        order_ids = [f"{p}-{y}-{100000 + first_order_no + k}" for k, (p, y) in enumerate(zip(prefixes, years))]
+
+        # Line-level draws
+        prod_idx = rng.choice(len(self.products), size=n, p=self.product_weights)
+        prod = self.products[prod_idx]
+        region = loc[order_of_line, 4].astype(str)
+        sub = prod[:, 2].astype(str)
+        qty = self.quantities[rng.integers(0, len(self.quantities), n)]
+        disc = self.discount_given(rng, np.char.add(np.char.add(region, "|"), sub))
+        sales = np.round(self.product_prices[prod_idx] * qty * (1 - disc), 4)
+        margin = self.margin_given(rng, np.char.add(np.char.add(sub, "|"), np.round(disc, 4).astype(str)))
+        profit = np.round(sales * margin, 4)
+
+        od = pd.DatetimeIndex(dates)[order_of_line]
+        out = {
+            self.row_id_col: np.arange(first_row_id, first_row_id + n),
+            "Order ID": np.asarray(order_ids, dtype=object)[order_of_line],
+            "Order Date": od,
+            "Ship Date": od + pd.to_timedelta(self.ship_days[ship_pick][order_of_line], unit="D"),
+            "Ship Mode": self.ship_modes[ship_pick][order_of_line],
+            "Customer ID": np.asarray(cust_ids, dtype=object)[order_of_line],
+            "Customer Name": template[order_of_line, 1],
+            "Segment": template[order_of_line, 2],
+        }
+        for j, c in enumerate(LOCATION_COLUMNS):
+            out[c] = loc[order_of_line, j]
+        for j, c in enumerate(PRODUCT_COLUMNS):
+            out[c] = prod[:, j]
+        out.update({"Sales": sales, "Quantity": qty, "Discount": disc, "Profit": profit})
+        return pd.DataFrame(out)[[c for c in self.columns if c in out]]
+
+def load_profile(reference: str = DEFAULT_REFERENCE_CSV) -> SuperstoreProfile:
+    return SuperstoreProfile(read_superstore_csv(reference))
+
+def generate_superstore(n_rows: int, seed: int = 0, reference: str = DEFAULT_REFERENCE_CSV,
+                        profile: Optional[SuperstoreProfile] = None) -> pd.DataFrame:
+    """In-memory synthetic frame (parsed dtypes, like read_superstore_csv) of `n_rows` lines."""
+    profile = profile or load_profile(reference)
+    n_customers = max(len(profile.customers), int(n_rows / profile.rows_per_customer))
+    return profile.sample(np.random.default_rng(seed), n_rows, n_customers=n_customers)
+
+def write_synthetic_csv(path: str, n_rows: int, seed: int = 0, reference: str = DEFAULT_REFERENCE_CSV,
+                        chunk_rows: int = DEFAULT_SYNTHETIC_CHUNK,
+                        progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+    """
+    Stream `n_rows` synthetic lines to `path` in the raw export format, `chunk_rows` at a time
+    (memory stays bounded at any scale). Deterministic for a given seed and chunk size.
+    """
+    profile = load_profile(reference)
+    rng = np.random.default_rng(seed)
+    n_customers = max(len(profile.customers), int(n_rows / profile.rows_per_customer))
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    done, orders = 0, 0
+    with open(path, "w", encoding="latin1", newline="") as f:  # latin1 round-trips the reference bytes (BOM included)
+        while done < n_rows:
+            chunk = profile.sample(rng, min(chunk_rows, n_rows - done), first_row_id=done + 1,
+                                   first_order_no=orders, n_customers=n_customers)
+            orders += chunk["Order ID"].nunique()
+            chunk.to_csv(f, sep=";", decimal=",", index=False, header=(done == 0), date_format="%d/%m/%y",
+                         lineterminator="\r\n")
+            done += len(chunk)
+            if progress is not None:
+                progress(done, n_rows)
+    seconds = time.perf_counter() - t0
+    return {"path": str(path), "rows": done, "bytes": Path(path).stat().st_size, "seconds": seconds}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic Superstore CSV generator")
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reference", default=DEFAULT_REFERENCE_CSV)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_SYNTHETIC_CHUNK)
+    args = parser.parse_args(argv)
+
+    report = lambda done, total: print(f"\r{done:,}/{total:,} rows", end="", flush=True)
+    stats = write_synthetic_csv(args.out, args.rows, args.seed, args.reference, args.chunk_rows, progress=report)
+    print(f"\nWrote {stats['rows']:,} rows ({stats['bytes'] / 1e6:.1f} MB) to {stats['path']} in {stats['seconds']:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+import pandas as pd
+
+from .model_training import DEFAULT_MODEL_PATH, train_profit_classifier
+from .compiled_model import CompiledForest
+from .model_utils import artifact_path_for, history_path_for, is_model_artifact, load_model, remove_model_artifact
+from .instrumentation import track_stage
+from .worker_pool import worker_context
+
+JOB_STATES = ("queued", "running", "done", "failed", "cancelled")
+DEFAULT_MAX_RUNNING = 1
+DEFAULT_MAX_QUEUED = 2
+JOB_HISTORY = 20
+
+# ------------------------------ Worker side -----------------------------------
+_progress_queue = None
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+def _report(job_id: str, stage: str, fraction: float, **info):
+    if _progress_queue is not None:
+        _progress_queue.put((job_id, stage, fraction, info))
+
+def _run_job(job_id: str, data: Union[str, pd.DataFrame], staged_out: str, params: Dict) -> Dict:
+    """Runs in the pool: train into the staging path, reporting progress through the shared queue."""
+    _report(job_id, "start", 0.0, pid=os.getpid())
+    result = train_profit_classifier(data, staged_out,
+                                     progress=lambda stage, fraction, **info: _report(job_id, stage, fraction, **info),
+                                     **params)
+    if result.get("cv"):  # out-of-fold probabilities (one per training row) stay in the worker
+        result["cv"] = {k: v for k, v in result["cv"].items() if k != "oof"}
+    return result
+
+# ------------------------------ Model swapping --------------------------------
+def staged_model_path(model_out: str, job_id: str) -> str:
+    """models/model_profit_clf.joblib -> models/model_profit_clf.job-<id>.joblib (same directory, same disk)"""
+    p = Path(model_out)
+    return str(p.with_name(f"{p.stem}.job-{job_id}{p.suffix}"))
+
+def _replace_dir(staged: str, target: str):
+    """Move directory `staged` over `target` (dropped when nothing was staged)."""
+    old = target + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(target):
+        os.replace(target, old)
+    if os.path.exists(staged):
+        os.replace(staged, target)
+    shutil.rmtree(old, ignore_errors=True)
+
+def promote_model(staged: str, model_out: str):
+    """
+    Move a staged model (+ its artifact and history state) over `model_out` with os.replace, so
+    readers see the old or the new file, never a partial one. A stale artifact or history state is
+    dropped when none was staged. The directories move first: a reader loading the joblib never
+    finds it without its history state.
+    """
+    staged_art, target_art = artifact_path_for(staged), artifact_path_for(model_out)
+    if is_model_artifact(staged_art):
+        _replace_dir(staged_art, target_art)
+    else:
+        remove_model_artifact(target_art)
+    _replace_dir(history_path_for(staged), history_path_for(model_out))
+    os.replace(staged, model_out)
+
+def discard_staged(staged: str):
+    Path(staged).unlink(missing_ok=True)
+    shutil.rmtree(artifact_path_for(staged), ignore_errors=True)
+    shutil.rmtree(history_path_for(staged), ignore_errors=True)
+
+class ModelSlot:
+    """
+    The model currently served for `path`, loaded lazily. get() prefers the memory-mapped
+    artifact (fast to load, lowest latency for single rows, what-if grids and serving);
+    get_batch() returns the joblib pipeline, whose vectorized predict_proba scores large batches
+    faster. swap()/reload() replace both with one reference assignment; `version` counts the swaps.
+    """
+
+    def __init__(self, path: str = DEFAULT_MODEL_PATH):
+        self.path = path
+        self.version = 0
+        self.info: Optional[Dict] = None
+        self._model = None
+        self._batch_model = None
+        self._lock = threading.Lock()
+
+    def _load(self, artifact_first: bool = True):
+        artifact = artifact_path_for(self.path)
+        has_artifact, has_pipeline = is_model_artifact(artifact), Path(self.path).exists()
+        if not has_artifact and not has_pipeline:
+            return None
+        with track_stage("model.load"):
+            return load_model(artifact if has_artifact and (artifact_first or not has_pipeline) else self.path)
+
+    def get(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._load()
+        return self._model
+
+    def get_batch(self):
+        """The sklearn pipeline for batch scoring (the artifact when no joblib exists)."""
+        model = self.get()
+        if not isinstance(model, CompiledForest):
+            return model
+        if self._batch_model is None:
+            with self._lock:
+                if self._batch_model is None:
+                    self._batch_model = self._load(artifact_first=False)
+        return self._batch_model
+
+    def swap(self, model, info: Optional[Dict] = None):
+        with self._lock:
+            self._model = model
+            self._batch_model = None  # loaded again on demand, from the files of the new model
+            self.info = info
+            self.version += 1
+
+    def reload(self, info: Optional[Dict] = None):
+        """Load the files now at `path` (outside the lock, readers keep the old model meanwhile) and swap."""
+        self.swap(self._load(), info)
+
+# -------------------------------- Job runner ----------------------------------
+class TrainingJobs:
+    """
+    Background train_profit_classifier runs in a process pool: at most `max_running` at once and
+    `max_queued` waiting. Workers send (stage, fraction, info) progress through a queue that a
+    listener thread folds into the job records. A finished model is trained into a staging path,
+    promoted over its `model_out` and handed to `on_done(job)` (e.g. ModelSlot.reload).
+    """
+
+    def __init__(self, max_running: int = DEFAULT_MAX_RUNNING, max_queued: int = DEFAULT_MAX_QUEUED,
+                 history: int = JOB_HISTORY):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.history = history
+        self._jobs: Dict[str, Dict] = {}
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._promote_lock = threading.Lock()
+        ctx = worker_context()
+        self._queue = ctx.Queue()
+        self._pool = ProcessPoolExecutor(max_workers=max_running, mp_context=ctx,
+                                         initializer=_init_worker, initargs=(self._queue,))
+        self._listener = threading.Thread(target=self._listen, name="training-progress", daemon=True)
+        self._listener.start()
+
+    def submit(self, data: Union[str, pd.DataFrame], model_out: str = DEFAULT_MODEL_PATH,
+               on_done: Optional[Callable[[Dict], None]] = None, **params) -> str:
+        """
+        Queue a training run on `data` (CSV path or featurized frame); `params` go to
+        train_profit_classifier (engine, clf_params, ...). Raises RuntimeError when the
+        concurrency limits are reached or a job for the same `model_out` is still active.
+        """
+        with self._lock:
+            active = [j for j in self._jobs.values() if j["status"] in ("queued", "running")]
+            if len(active) >= self.max_running + self.max_queued:
+                raise RuntimeError(f"{len(active)} training jobs already active (limit "
+                                   f"{self.max_running} running + {self.max_queued} queued)")
+            if any(j["model_out"] == model_out for j in active):
+                raise RuntimeError(f"A training job for {model_out} is already active")
+            job_id = uuid.uuid4().hex[:8]
+            staged = staged_model_path(model_out, job_id)
+            self._jobs[job_id] = {
+                "id": job_id, "status": "queued", "stage": "queued", "progress": 0.0, "info": {},
+                "model_out": model_out, "staged_path": staged,
+                "params": {k: v for k, v in params.items() if k != "feature_store"},
+                "rows": len(data) if isinstance(data, pd.DataFrame) else None,
+                "submitted_at": time.time(), "started_at": None, "finished_at": None,
+                "result": None, "error": None,
+            }
+            self._trim()
+        Path(staged).parent.mkdir(parents=True, exist_ok=True)
+        fut = self._pool.submit(_run_job, job_id, data, staged, params)
+        with self._lock:
+            self._futures[job_id] = fut
+        fut.add_done_callback(lambda f: self._finish(job_id, f, on_done))
+        return job_id
+
+    def _listen(self):
+        while True:
+            msg = self._queue.get()
+            if msg is None:
+                return
+            job_id, stage, fraction, info = msg
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] not in ("queued", "running"):
+                    continue
+                if job["status"] == "queued":
+                    job["status"], job["started_at"] = "running", time.time()
+                job["stage"] = stage
+                job["progress"] = max(job["progress"], float(fraction))
+                job["info"].update(info)
+
+    def _finish(self, job_id: str, fut: Future, on_done: Optional[Callable]):
+        with self._lock:
+            job = self._jobs[job_id]
+            self._futures.pop(job_id, None)
+        if fut.cancelled():
+            status, result, error = "cancelled", None, None
+        elif fut.exception() is not None:
+            status, result, error = "failed", None, f"{type(fut.exception()).__name__}: {fut.exception()}"
+        else:
+            status, result, error = "done", fut.result(), None
+        if status == "done":
+            try:
+                with self._promote_lock:
+                    promote_model(job["staged_path"], job["model_out"])
+                result = {**result, "model_path": job["model_out"],
+                          "artifact_path": artifact_path_for(job["model_out"]) if result["artifact_path"] else None}
+            except OSError as e:
+                status, error = "failed", f"promote: {e}"
+        if status != "done":
+            discard_staged(job["staged_path"])
+        with self._lock:
+            job.update(status=status, result=result, error=error, finished_at=time.time(),
+                       stage=status, progress=1.0 if status == "done" else job["progress"])
+            snapshot = dict(job)
+        if status == "done" and on_done is not None:
+            on_done(snapshot)
+
+    def _trim(self):
+        finished = [j for j in self._jobs.values() if j["status"] not in ("queued", "running")]
+        for job in sorted(finished, key=lambda j: j["submitted_at"])[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[job["id"]]
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started yet (a running fit cannot be interrupted)."""
+        with self._lock:
+            fut = self._futures.get(job_id)
+        return fut is not None and fut.cancel()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return None if job is None else dict(job)
+
+    def jobs(self) -> List[Dict]:
+        """Job records, newest first."""
+        with self._lock:
+            return sorted((dict(j) for j in self._jobs.values()), key=lambda j: j["submitted_at"], reverse=True)
+
+    def active(self) -> int:
+        with self._lock:
+            return sum(j["status"] in ("queued", "running") for j in self._jobs.values())
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+        self._queue.put(None)
@@ -0,0 +1,95 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Sequence, Tuple
+
+import pandas as pd
+
+from .instrumentation import track_stage
+
+DEFAULT_UPLOAD_CACHE_BYTES = 1024 ** 3
+
+def content_hash(blob: bytes) -> str:
+    return hashlib.blake2b(blob, digest_size=16).hexdigest()
+
+def upload_key(hashes: Sequence[str]) -> str:
+    """Cache key of a set of uploads: their content hashes in upload order (later files win on dedupe)."""
+    return hashlib.blake2b("|".join(hashes).encode("utf-8"), digest_size=16).hexdigest()
+
+def entry_bytes(value) -> int:
+    """Deep memory of the frames held by a cache value (a frame or a tuple/dict containing frames)."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (tuple, list)):
+        return sum(entry_bytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(entry_bytes(v) for v in value.values())
+    return 0
+
+class UploadCache:
+    """
+    Parsed uploads keyed by content hash, shared by every session of the process: the same file
+    uploaded twice (or by two users) is parsed once. Least recently used entries are dropped
+    while the frames held exceed `max_bytes`; an entry larger than the budget is not kept.
+    Cached frames are shared, callers must not modify them in place.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_UPLOAD_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[object, int]]" = OrderedDict()
+        self._loading: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key: str):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def put(self, key: str, value) -> bool:
+        size = entry_bytes(value)
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            kept = size <= self.max_bytes
+            if kept:
+                self._entries[key] = (value, size)
+                self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, old) = self._entries.popitem(last=False)
+                self.bytes -= old
+                self.evictions += 1
+        return kept
+
+    def get_or_load(self, key: str, load: Callable[[], object]):
+        """Cached value for `key`, else load() once even when several sessions ask at the same time."""
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            value = self.get(key)  # another session finished loading while we waited
+            if value is None:
+                with self._lock:
+                    self.misses += 1
+                with track_stage("load.upload_parse"):
+                    value = load()
+                self.put(key, value)
+        with self._lock:
+            self._loading.pop(key, None)
+        return value
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
@@ -1,6 +1,17 @@
+import numpy as np
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 
+from .instrumentation import instrumented
+
+try:
+    pd.tseries.frequencies.to_offset("ME")
+    MONTH_END = "ME"
+except ValueError:
+    MONTH_END = "M"  # pandas < 2.2
+
+@instrumented("aggregate.kpi_summary")
 def kpi_summary(df: pd.DataFrame) -> dict:
     total_sales = float(df["Sales"].sum()) if "Sales" in df else 0.0
     total_profit = float(df["Profit"].sum()) if "Profit" in df else 0.0
@@ -8,23 +19,114 @@ def kpi_summary(df: pd.DataFrame) -> dict:
     profit_ratio = (df["Profitable"].mean() * 100.0) if "Profitable" in df else None
     return dict(total_sales=total_sales, total_profit=total_profit, n_orders=n_orders, profit_ratio=profit_ratio)
 
+# Figures take pre-aggregated frames so they can be fed either from raw rows or from a RollupView
+@instrumented("plot.category_bar")
+def category_bar(g: pd.DataFrame):
+    return px.bar(g, x="Category", y=["Sales","Profit"], barmode="group", title="Sales & Profit per Category")
+
+@instrumented("plot.top_subcategory_bar")
+def top_subcategory_bar(g: pd.DataFrame, top_n:int=10):
+    g = g.nlargest(top_n, "Sales")
+    return px.bar(g, x="Sub-Category", y="Sales", title=f"Top {top_n} Sub-Category by Sales")
+
+@instrumented("plot.monthly_line")
+def monthly_line(ts: pd.DataFrame):
+    return px.line(ts, x="Order Date", y=["Sales","Profit"], title="Monthly Sales & Profit Trend")
+
+@instrumented("aggregate.by_category")
 def bar_sales_profit_by_category(df: pd.DataFrame):
     if not {"Category","Sales","Profit"}.issubset(df.columns): return None
-    g = df.groupby("Category", as_index=False)[["Sales","Profit"]].sum()
-    return px.bar(g, x="Category", y=["Sales","Profit"], barmode="group", title="Sales & Profit per Category")
+    g = df.groupby("Category", as_index=False, observed=True)[["Sales","Profit"]].sum()
+    return category_bar(g)
 
+@instrumented("aggregate.by_subcategory")
 def top_subcategory_by_sales(df: pd.DataFrame, top_n:int=10):
     if not {"Sub-Category","Sales"}.issubset(df.columns): return None
-    g = df.groupby("Sub-Category", as_index=False)["Sales"].sum().nlargest(top_n, "Sales")
-    return px.bar(g, x="Sub-Category", y="Sales", title=f"Top {top_n} Sub-Category by Sales")
+    g = df.groupby("Sub-Category", as_index=False, observed=True)["Sales"].sum()
+    return top_subcategory_bar(g, top_n)
 
+@instrumented("aggregate.monthly")
 def monthly_trend(df: pd.DataFrame):
     if "Order Date" not in df.columns or not {"Sales","Profit"}.issubset(df.columns): return None
-    ts = df.set_index("Order Date").sort_index().resample("M")[["Sales","Profit"]].sum().reset_index()
-    return px.line(ts, x="Order Date", y=["Sales","Profit"], title="Monthly Sales & Profit Trend")
+    ts = df.set_index("Order Date").sort_index().resample(MONTH_END)[["Sales","Profit"]].sum().reset_index()
+    return monthly_line(ts)
+
+SCATTER_POINT_BUDGET = 20_000
+SCATTER_MODES = ("auto", "points", "sample", "density")
+
+def sample_for_scatter(df: pd.DataFrame, max_points: int = SCATTER_POINT_BUDGET, tail_share: float = 0.25,
+                       stratify: str = "Category", random_state: int = 0) -> pd.DataFrame:
+    """
+    Reduce `df` to at most `max_points` rows for plotting:
+    - the most loss-making rows (lowest Profit) are always kept, up to `tail_share` of the budget
+    - the rest of the budget is a random sample stratified by `stratify` (proportional)
+    """
+    if len(df) <= max_points:
+        return df
+    n_tail = int(max_points * tail_share)
+    tail = df.nsmallest(n_tail, "Profit") if n_tail else df.iloc[:0]
+    rest = df.drop(index=tail.index)
+    n_rest = max_points - len(tail)
+    if stratify in rest.columns:
+        frac = n_rest / len(rest)
+        sample = rest.groupby(stratify, observed=True, group_keys=False).sample(frac=frac, random_state=random_state)
+    else:
+        sample = rest.sample(n=n_rest, random_state=random_state)
+    return pd.concat([tail, sample])
 
-def scatter_sales_profit(df: pd.DataFrame):
+def density_sales_profit(df: pd.DataFrame, bins: int = 120):
+    """Sales x Profit 2-D histogram binned on the server; only the bin grid is sent to the browser."""
+    d = df[["Sales", "Profit"]].dropna()
+    counts, xe, ye = np.histogram2d(d["Sales"].to_numpy(float), d["Profit"].to_numpy(float), bins=bins)
+    z = np.where(counts > 0, np.log10(counts), np.nan)  # log scale: a few bins hold most rows
+    fig = go.Figure(go.Heatmap(x=(xe[:-1] + xe[1:]) / 2, y=(ye[:-1] + ye[1:]) / 2, z=z.T,
+                               colorscale="Viridis", colorbar=dict(title="log10(rows)"),
+                               customdata=counts.T, hovertemplate="Sales %{x:,.0f}<br>Profit %{y:,.0f}<br>rows %{customdata:,.0f}<extra></extra>"))
+    fig.update_layout(title=f"Sales vs Profit density ({len(d):,} rows)", xaxis_title="Sales", yaxis_title="Profit")
+    return fig
+
+@instrumented("plot.scatter_sales_profit")
+def scatter_sales_profit(df: pd.DataFrame, max_points: int = SCATTER_POINT_BUDGET, mode: str = "auto"):
+    """
+    Sales vs Profit scatter. mode="auto" draws every point (SVG) while len(df) <= max_points and
+    switches to a WebGL scatter of sample_for_scatter() above it; "density" always bins server-side.
+    """
     if not {"Sales","Profit"}.issubset(df.columns): return None
+    if mode not in SCATTER_MODES:
+        raise ValueError(f"Unknown mode {mode!r}, expected one of {SCATTER_MODES}")
+    if mode == "density":
+        return density_sales_profit(df)
+
+    title = "Sales vs Profit (color=Discount, size=Quantity)"
+    render_mode = "auto"
+    if mode == "sample" or (mode == "auto" and len(df) > max_points):
+        n_all = len(df)
+        df = sample_for_scatter(df, max_points)
+        render_mode = "webgl"
+        title += f" - sampled {len(df):,} of {n_all:,} rows (loss tail kept)"
     return px.scatter(df, x="Sales", y="Profit", size="Quantity" if "Quantity" in df.columns else None,
                       color="Discount" if "Discount" in df.columns else None,
-                      title="Sales vs Profit (color=Discount, size=Quantity)")
+                      render_mode=render_mode, title=title)
+
+@instrumented("plot.what_if_surface")
+def what_if_surface(surface: pd.DataFrame, threshold: float = 0.5):
+    """P(profitable) heatmap over a what-if grid (rows = swept variable, columns = Discount) with the threshold contour."""
+    x, y, z = surface.columns.to_numpy(float), [str(v) for v in surface.index], surface.to_numpy()
+    fig = go.Figure(go.Heatmap(x=x, y=y, z=z, zmin=0, zmax=1, colorscale="RdYlGn", colorbar=dict(title="P(profitable)"),
+                               hovertemplate="Discount %{x:.2f}<br>" + str(surface.index.name) + " %{y}<br>P %{z:.2f}<extra></extra>"))
+    fig.add_trace(go.Contour(x=x, y=y, z=z, contours=dict(start=threshold, end=threshold, coloring="none"),
+                             line=dict(color="black", width=2, dash="dash"), showscale=False, hoverinfo="skip",
+                             name=f"P = {threshold:.2f}"))
+    fig.update_layout(title="What-if: P(profitable)", xaxis_title="Discount", yaxis_title=str(surface.index.name))
+    return fig
+
+@instrumented("plot.what_if_discount_curve")
+def what_if_discount_curve(curve: pd.DataFrame, threshold: float = 0.5, break_even: float = float("nan")):
+    """P(profitable) against Discount for the base row, with the threshold and the break-even discount marked."""
+    fig = px.line(curve, x="Discount", y="proba", markers=True, title="P(profitable) vs Discount")
+    fig.add_hline(y=threshold, line_dash="dash", line_color="gray")
+    if not np.isnan(break_even):
+        fig.add_vline(x=break_even, line_dash="dot", line_color="red",
+                      annotation_text=f"break-even {break_even:.2f}")
+    fig.update_yaxes(range=[0, 1], title="P(profitable)")
+    return fig
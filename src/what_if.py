@@ -0,0 +1,112 @@
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .batch_scoring import add_model_history, score_frame
+from .model_utils import model_threshold
+from .instrumentation import instrumented
+
+DISCOUNT_GRID = np.round(np.arange(0.0, 0.801, 0.05), 2)
+# Typical Days_to_Ship per Ship Mode, used when a sweep varies the mode without data to derive it from
+DEFAULT_SHIP_DAYS = {"Same Day": 0, "First Class": 2, "Second Class": 3, "Standard Class": 5}
+SWEEP_CHUNK_ROWS = 200_000
+
+Axis = Union[str, Tuple[str, ...]]
+
+def ship_mode_days(df: Optional[pd.DataFrame] = None) -> Dict[str, int]:
+    """Median Days_to_Ship per Ship Mode in `df` (DEFAULT_SHIP_DAYS for modes it lacks)."""
+    days = dict(DEFAULT_SHIP_DAYS)
+    if df is not None and {"Ship Mode", "Days_to_Ship"}.issubset(df.columns):
+        med = df.groupby("Ship Mode", observed=True)["Days_to_Ship"].median().dropna()
+        days.update({str(k): int(round(v)) for k, v in med.items()})
+    return days
+
+def ship_mode_axis(modes: Sequence[str], days: Optional[Dict[str, int]] = None) -> Tuple[Tuple[str, str], list]:
+    """Paired (Ship Mode, Days_to_Ship) axis for sweep_grid: changing the mode changes shipping time too."""
+    days = days or DEFAULT_SHIP_DAYS
+    return ("Ship Mode", "Days_to_Ship"), [(m, days.get(m, 4)) for m in modes]
+
+def sweep_grid(base: pd.DataFrame, grid: Dict[Axis, Sequence]) -> pd.DataFrame:
+    """
+    Every base row combined with every point of the grid (cartesian product of the axes, the last
+    axis varying fastest). An axis is a column name, or a tuple of columns whose values move
+    together (e.g. Ship Mode with its Days_to_Ship). Column "row" holds the base row position.
+    """
+    axes = list(grid.items())
+    n_points = int(np.prod([len(v) for _, v in axes])) if axes else 1
+    out = base.reset_index(drop=True).take(np.repeat(np.arange(len(base)), n_points)).reset_index(drop=True)
+    out.insert(0, "row", np.repeat(np.arange(len(base)), n_points))
+    for k, (axis, values) in enumerate(axes):
+        # position of each grid point along this axis, tiled over the base rows
+        inner = int(np.prod([len(v) for _, v in axes[k + 1:]])) if k + 1 < len(axes) else 1
+        idx = np.tile(np.repeat(np.arange(len(values)), inner), n_points // (inner * len(values)) * len(base))
+        cols = axis if isinstance(axis, tuple) else (axis,)
+        vals = [v if isinstance(axis, tuple) else (v,) for v in values]
+        for j, col in enumerate(cols):
+            out[col] = pd.Series([v[j] for v in vals]).to_numpy()[idx]
+    return out
+
+@instrumented("model.what_if", rows=lambda res, args, kwargs: len(res))
+def score_sweep(model, base: pd.DataFrame, grid: Dict[Axis, Sequence],
+                chunk_rows: int = SWEEP_CHUNK_ROWS) -> pd.DataFrame:
+    """
+    sweep_grid(base, grid) with P(profitable) in "proba", one predict_proba call per chunk of rows.
+    History features (models trained with them) are computed once per base row, not per scenario.
+    """
+    sweep = sweep_grid(add_model_history(model, base), grid)
+    proba = np.empty(len(sweep))
+    for start in range(0, len(sweep), chunk_rows):
+        part = sweep.iloc[start:start + chunk_rows]
+        proba[start:start + len(part)] = score_frame(model, part, history=False)[1]
+    sweep["proba"] = proba
+    return sweep
+
+def break_even_discount(model, base: pd.DataFrame, discounts: Sequence[float] = DISCOUNT_GRID,
+                        threshold: Optional[float] = None, grid: Optional[Dict[Axis, Sequence]] = None) -> pd.DataFrame:
+    """
+    Per base row (and per point of the optional extra `grid`): the smallest discount at which
+    P(profitable) falls below `threshold` (default: the model's, see model_threshold), linearly
+    interpolated between grid discounts.
+    break_even is NaN when the row stays profitable over the whole range and the first
+    discount when it is unprofitable from the start (see "profitable_at_min").
+    """
+    discounts = np.sort(np.asarray(discounts, dtype=float))
+    threshold = model_threshold(model) if threshold is None else threshold
+    axes = dict(grid or {})
+    axes.pop("Discount", None)
+    axes["Discount"] = discounts  # last axis: each (row, grid point) is one contiguous run of discounts
+    grid_columns = [c for a in axes if a != "Discount" for c in (a if isinstance(a, tuple) else (a,))]
+    return break_even_from_sweep(score_sweep(model, base, axes), threshold, grid_columns)
+
+def break_even_from_sweep(sweep: pd.DataFrame, threshold: float, grid_columns: Sequence[str] = ()) -> pd.DataFrame:
+    """
+    break_even_discount's result from an already scored score_sweep whose last axis is the sorted
+    Discount grid (e.g. the sweep drawn as the discount curve), without scoring again.
+    `grid_columns` are the columns of the other sweep axes, kept in the result.
+    """
+    discounts = sweep["Discount"].drop_duplicates().to_numpy(dtype=float)
+    p = sweep["proba"].to_numpy().reshape(-1, len(discounts))
+
+    below = p < threshold
+    first = np.where(below.any(axis=1), below.argmax(axis=1), -1)
+    be = np.full(len(p), np.nan)
+    at_start = first == 0
+    be[at_start] = discounts[0]
+    mid = np.flatnonzero(first > 0)
+    i = first[mid]
+    p0, p1 = p[mid, i - 1], p[mid, i]
+    d0, d1 = discounts[i - 1], discounts[i]
+    be[mid] = d0 + (p0 - threshold) / (p0 - p1) * (d1 - d0)  # p0 >= threshold > p1
+
+    keys = sweep.iloc[::len(discounts)][["row"] + list(grid_columns)].reset_index(drop=True)
+    keys["proba_min_discount"] = p[:, 0]
+    keys["proba_max_discount"] = p[:, -1]
+    keys["profitable_at_min"] = ~at_start
+    keys["break_even_discount"] = be
+    return keys
+
+def sweep_surface(sweep: pd.DataFrame, x: str, y: str, row: int = 0) -> pd.DataFrame:
+    """Probability matrix (index = y values, columns = x values) of one base row for a heatmap."""
+    s = sweep[sweep["row"] == row]
+    return s.pivot_table(index=y, columns=x, values="proba", aggfunc="mean", sort=False)
@@ -0,0 +1,10 @@
+import multiprocessing
+
+def worker_context():
+    """
+    Start method for every process pool (ingestion, CV folds, training jobs): spawn. The pools are
+    created from processes that already run threads (Streamlit's script runners, the scoring
+    server, the training-progress listener); a forked child inherits locks those threads held
+    at fork time and can deadlock on them.
+    """
+    return multiprocessing.get_context("spawn")
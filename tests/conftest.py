@@ -0,0 +1,69 @@
+import os
+import sys
+
+# Make the 'src' package importable when pytest runs from any directory
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import numpy as np
+import pandas as pd
+import pytest
+
+SUB_CATEGORIES = {"Furniture": ["Chairs", "Tables"], "Office Supplies": ["Labels", "Binders", "Paper"],
+                  "Technology": ["Phones", "Machines"]}
+
+def _superstore_frame(n: int = 3000, seed: int = 0) -> pd.DataFrame:
+    """Random order lines over two years, with missing dates, regions, sales and profits."""
+    rng = np.random.default_rng(seed)
+    sub_to_cat = {s: c for c, subs in SUB_CATEGORIES.items() for s in subs}
+    sub = rng.choice(list(sub_to_cat), n)
+    profit = rng.normal(10, 40, n)
+    df = pd.DataFrame({
+        "Order ID": [f"CA-{i}" for i in rng.integers(0, n // 2, n)],
+        "Order Date": pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 730, n), unit="D"),
+        "Region": rng.choice(["West", "East", "Central", "South"], n).astype(object),
+        "Category": [sub_to_cat[s] for s in sub],
+        "Sub-Category": sub,
+        "Sales": rng.gamma(2.0, 100.0, n),
+        "Profit": profit,
+        "Profitable": (profit > 0).astype(float),
+    })
+    df.loc[rng.choice(n, 60, replace=False), "Order Date"] = pd.NaT
+    df.loc[rng.choice(n, 60, replace=False), "Region"] = None
+    df.loc[rng.choice(n, 60, replace=False), "Sales"] = np.nan
+    missing_profit = rng.choice(n, 60, replace=False)
+    df.loc[missing_profit, ["Profit", "Profitable"]] = np.nan
+    return df
+
+@pytest.fixture(scope="module", params=["object", "category"])
+def superstore_frame(request):
+    """Dimension columns as plain values and as the categoricals compact_dataframe produces."""
+    df = _superstore_frame()
+    if request.param == "category":
+        for col in ("Region", "Category", "Sub-Category"):
+            df[col] = df[col].astype("category")
+    return df
+
+# (date_range, filters) combinations the dashboard can produce, including empty selections
+SELECTIONS = [
+    (None, {}),
+    (("2022-01-01", "2023-12-31"), {}),
+    (("2022-03-15", "2023-02-10"), {"Region": ["West"]}),
+    (("2022-03-15", "2023-02-10"), {"Region": ["West", "East"], "Category": ["Technology"]}),
+    (None, {"Sub-Category": ["Chairs", "Phones"], "Region": []}),
+    (("2023-06-30", "2023-06-30"), {"Category": ["Furniture", "Office Supplies"]}),
+    (("2022-05-01", "2022-05-31"), {"Region": ["Central"], "Sub-Category": ["Labels"]}),
+    (None, {"Region": ["Nowhere"]}),
+    (("2030-01-01", "2030-12-31"), {}),
+]
+
+def reference_mask(df: pd.DataFrame, date_range, filters) -> np.ndarray:
+    """The Series.between / isin masks the dashboard used before FilterIndex."""
+    mask = pd.Series(True, index=df.index)
+    if date_range:
+        mask &= df["Order Date"].between(pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1]))
+    for col, values in filters.items():
+        if values:
+            mask &= df[col].isin(values)
+    return mask.to_numpy()
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.batch_scoring import REQUIRED_COLUMNS
+from src.model_training import build_pipeline, export_compiled_forest, get_feature_columns
+from src.model_utils import load_model_artifact, save_model_artifact
+
+CATEGORIES = {
+    "Ship Mode": ["Standard Class", "Second Class", "First Class", "Same Day"],
+    "Segment": ["Consumer", "Corporate", "Home Office"],
+    "Category": ["Furniture", "Office Supplies", "Technology"],
+    "Sub-Category": ["Chairs", "Tables", "Labels", "Binders", "Phones", "Machines"],
+    "Region": ["West", "East", "Central", "South"],
+}
+
+def make_frame(n, seed):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "Sales": rng.gamma(2.0, 100.0, n),
+        "Quantity": rng.integers(1, 10, n).astype(float),
+        "Discount": rng.choice([0.0, 0.1, 0.2, 0.5, 0.8], n),
+        "Days_to_Ship": rng.integers(0, 7, n).astype(float),
+        **{c: rng.choice(v, n).astype(object) for c, v in CATEGORIES.items()},
+    })[REQUIRED_COLUMNS]
+    for c in ("Sales", "Discount", "Days_to_Ship"):
+        df.loc[rng.choice(n, n // 20, replace=False), c] = np.nan
+    return df
+
+def fit(X, engine="rf_dense"):
+    y = ((X["Discount"].fillna(0) < 0.3) & (X["Sub-Category"] != "Tables")).astype(int)
+    pipe = build_pipeline(*get_feature_columns(X), engine=engine)
+    pipe.set_params(clf__n_estimators=25, clf__n_jobs=1)
+    return pipe.fit(X, y)
+
+@pytest.fixture(scope="module")
+def pipeline():
+    return fit(make_frame(600, seed=0))
+
+@pytest.fixture
+def unseen():
+    X = make_frame(300, seed=1)
+    X.loc[::7, "Sub-Category"] = "Hoverboards"  # not seen in training
+    X.loc[::11, "Region"] = None
+    X.loc[::5, "Sales"] = np.nan
+    return X
+
+def test_compiled_forest_matches_pipeline(pipeline, unseen):
+    compiled = export_compiled_forest(pipeline)
+    assert np.allclose(compiled.predict_proba(unseen), pipeline.predict_proba(unseen))
+    assert (compiled.predict(unseen) == pipeline.predict(unseen)).all()
+
+def test_compiled_forest_scores_dict_records(pipeline, unseen):
+    records = unseen.head(20).to_dict("records")
+    assert np.allclose(export_compiled_forest(pipeline).predict_proba(records),
+                       pipeline.predict_proba(unseen.head(20)))
+
+def test_memory_mapped_artifact_matches_pipeline(pipeline, unseen, tmp_path):
+    path = save_model_artifact(pipeline, str(tmp_path / "model.artifact"))
+    assert np.allclose(load_model_artifact(path).predict_proba(unseen), pipeline.predict_proba(unseen))
+
+def test_sparse_engine_matches_pipeline(unseen):
+    # Sparse one-hot input has no NaN support in the forest, so numerics are complete here
+    num = ["Sales", "Quantity", "Discount", "Days_to_Ship"]
+    train = make_frame(600, seed=0)
+    train[num] = train[num].fillna(0)
+    unseen[num] = unseen[num].fillna(0)
+    pipe = fit(train, engine="rf_sparse")
+    assert np.allclose(export_compiled_forest(pipe).predict_proba(unseen), pipe.predict_proba(unseen))
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from conftest import SELECTIONS, reference_mask
+from src.filter_index import FilterIndex, global_filter_spec
+
+@pytest.mark.parametrize("date_range,filters", SELECTIONS)
+def test_select_matches_between_isin_masks(superstore_frame, date_range, filters):
+    index = FilterIndex(superstore_frame)
+    rows = index.select(date_range, filters)
+    np.testing.assert_array_equal(rows, np.flatnonzero(reference_mask(superstore_frame, date_range, filters)))
+
+def test_values_in_and_take(superstore_frame):
+    index = FilterIndex(superstore_frame)
+    rows = index.select(("2022-03-15", "2023-02-10"), {"Category": ["Technology"]})
+    assert set(index.values_in("Sub-Category", rows)) == {"Phones", "Machines"}
+    assert index.take(superstore_frame, rows).index.equals(superstore_frame.index[rows])
+    assert index.take(superstore_frame, index.select()) is superstore_frame  # nothing filtered: no copy
+
+def test_global_filter_spec():
+    spec = global_filter_spec({"date_range": ["2022-01-01", "2022-06-30"], "regions": ["West"]})
+    assert spec[0][0].year == 2022 and spec[1] == {"Region": ["West"]}
+    assert global_filter_spec({}) == (None, {"Region": []})
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from src.history_features import HISTORY_KEYS, HistoryState, add_history_features, history_feature_columns
+
+WINDOW = 5
+
+@pytest.fixture
+def orders():
+    rng = np.random.default_rng(0)
+    n = 300
+    df = pd.DataFrame({
+        "Order Date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 30, n), unit="D"),
+        "Customer ID": rng.choice(["C1", "C2", "C3", "C4"], n).astype(object),
+        "Product ID": rng.choice([f"P{i}" for i in range(8)], n).astype(object),
+        "Sub-Category": rng.choice(["Chairs", "Labels"], n).astype(object),
+        "Discount": rng.choice([0.0, 0.2, 0.5], n),
+        "Profitable": rng.integers(0, 2, n).astype(float),
+    })
+    # Unknown keys/dates and missing labels/discounts must be handled too
+    df.loc[rng.choice(n, 15, replace=False), "Customer ID"] = None
+    df.loc[rng.choice(n, 10, replace=False), "Order Date"] = pd.NaT
+    df.loc[rng.choice(n, 30, replace=False), "Profitable"] = np.nan
+    df.loc[rng.choice(n, 30, replace=False), "Discount"] = np.nan
+    return df
+
+def brute_force(df, window_days=WINDOW):
+    """Row-by-row reference: every feature from the orders dated strictly before the row's day."""
+    out = {c: np.full(len(df), np.nan) for c in history_feature_columns(window_days=window_days)}
+    for i, row in enumerate(df.itertuples(index=False)):
+        day = row[0]
+        for key, prefix in HISTORY_KEYS.items():
+            value = df[key].iloc[i]
+            if pd.isna(day) or pd.isna(value):
+                continue
+            prior = df[(df[key] == value) & (df["Order Date"] < day)]
+            recent = prior[prior["Order Date"] >= day - pd.Timedelta(days=window_days)]
+            out[f"{prefix}_prior_lines"][i] = len(prior)
+            out[f"{prefix}_prior_profit_rate"][i] = prior["Profitable"].mean()
+            out[f"{prefix}_prior_avg_discount"][i] = prior["Discount"].mean()
+            out[f"{prefix}_days_since_prev"][i] = (day - prior["Order Date"].max()).days if len(prior) else np.nan
+            out[f"{prefix}_{window_days}d_lines"][i] = len(recent)
+            out[f"{prefix}_{window_days}d_profit_rate"][i] = recent["Profitable"].mean()
+    return pd.DataFrame(out, index=df.index)
+
+def history(df):
+    return add_history_features(df, window_days=WINDOW)[history_feature_columns(window_days=WINDOW)]
+
+def test_matches_brute_force(orders):
+    assert_frame_equal(history(orders), brute_force(orders))
+
+def test_same_day_lines_do_not_see_each_other():
+    df = pd.DataFrame({"Order Date": pd.to_datetime(["2024-01-01", "2024-01-01", "2024-01-02"]),
+                       "Customer ID": ["C1", "C1", "C1"], "Profitable": [1.0, 0.0, 1.0]})
+    feats = add_history_features(df, keys={"Customer ID": "cust"})
+    assert feats["cust_prior_lines"].tolist() == [0, 0, 2]
+    assert feats["cust_prior_profit_rate"].iloc[2] == 0.5
+
+def test_incremental_matches_one_full_run(orders):
+    ordered = orders.sort_values("Order Date", kind="stable")  # NaT rows last
+    state = HistoryState(window_days=WINDOW)
+    parts = [state.update(ordered.iloc[i:i + 80]) for i in range(0, len(ordered), 80)]
+    assert_frame_equal(pd.concat(parts), history(ordered))
+
+def test_late_chunks_match_a_full_run_over_rows_seen_so_far(orders):
+    # Chunks arrive out of date order: each one must get the features of a full run over every
+    # order received up to and including it (lookups go by Order Date, not arrival)
+    chunks = [orders[orders["Order Date"] >= "2024-01-15"],
+              orders[orders["Order Date"] < "2024-01-08"],
+              orders[orders["Order Date"].isna()],
+              orders[(orders["Order Date"] >= "2024-01-08") & (orders["Order Date"] < "2024-01-15")]]
+    state = HistoryState(window_days=WINDOW)
+    for i, chunk in enumerate(chunks):
+        seen = pd.concat(chunks[:i + 1])
+        assert_frame_equal(state.update(chunk), history(seen).loc[chunk.index])
+
+def test_state_round_trip_and_copy(orders, tmp_path):
+    old, new = orders.iloc[:200], orders.iloc[200:]
+    state = HistoryState(window_days=WINDOW)
+    state.absorb(old)
+    scratch = state.copy()
+    scratch.absorb(new)
+    state.save(str(tmp_path / "state"))
+    loaded = HistoryState.load(str(tmp_path / "state"))
+    assert_frame_equal(loaded.features(new), state.features(new))
+    assert state.rows() < scratch.rows()  # absorbing into the copy left the original unchanged
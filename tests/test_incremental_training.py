@@ -0,0 +1,55 @@
+import os
+
+import pandas as pd
+import pytest
+
+from src.incremental_training import advance_watermark, select_new_rows, update_profit_classifier
+
+SHIPPED_CSV = "data/raw/USSuperstoreData.csv"
+
+def frame(dates, sales, row_ids=None):
+    df = pd.DataFrame({"Order Date": pd.to_datetime(dates), "Sales": sales})
+    if row_ids is not None:
+        df.insert(0, "Row ID", row_ids)
+    return df
+
+def test_row_id_watermark_takes_every_higher_id():
+    old = frame(["2024-01-05", "2024-01-06"], [1.0, 2.0], row_ids=[1, 2])
+    wm = advance_watermark(None, old)
+    # Appended later: one back-dated row (still new by Row ID) and one repeat of an old Row ID
+    now = pd.concat([old, frame(["2024-01-01", "2024-01-07"], [3.0, 4.0], row_ids=[3, 2])], ignore_index=True)
+    assert select_new_rows(now, wm)["Sales"].tolist() == [3.0]
+
+def test_order_date_watermark_keeps_late_rows_of_the_last_day():
+    old = frame(["2024-01-05", "2024-01-06", "2024-01-06"], [1.0, 2.0, 2.0])
+    wm = advance_watermark(None, old)
+    now = pd.concat([old, frame(["2024-01-06", "2024-01-06", "2024-01-07", "2024-01-01"], [2.0, 5.0, 6.0, 7.0])],
+                    ignore_index=True)
+    occurrences = {}
+    new = pd.concat([select_new_rows(now.iloc[:4], wm, occurrences), select_new_rows(now.iloc[4:], wm, occurrences)])
+    # A third identical 2.0 line and the 5.0 line are new; the back-dated 7.0 line is not selected
+    assert new["Sales"].tolist() == [2.0, 5.0, 6.0]
+    assert select_new_rows(now, advance_watermark(wm, new)).empty
+
+@pytest.fixture
+def shipped_without_row_ids():
+    if not os.path.exists(SHIPPED_CSV):
+        pytest.skip("shipped dataset not present")
+    raw = pd.read_csv(SHIPPED_CSV, sep=";", dtype=str, encoding="utf-8-sig", nrows=1500).drop(columns="Row ID")
+    return raw.iloc[pd.to_datetime(raw["Order Date"], format="%d/%m/%y").argsort(kind="stable")].reset_index(drop=True)
+
+def test_update_reports_backdated_rows(shipped_without_row_ids, tmp_path):
+    raw, csv, model = shipped_without_row_ids, tmp_path / "orders.csv", str(tmp_path / "model.joblib")
+    kwargs = dict(n_new_trees=5, compare_full=False, artifact=False)
+    raw.iloc[:1000].to_csv(csv, sep=";", index=False)
+    first = update_profit_classifier(str(csv), model, **kwargs)
+    assert first["new_rows"] > 0 and first["skipped_backdated"] is None
+
+    # Next export: 300 newer rows plus 5 old-dated rows appended at the end (unsorted export)
+    backdated = raw.iloc[:5].assign(**{"Customer ID": "LATE-1"})
+    pd.concat([raw.iloc[:1300], backdated]).to_csv(csv, sep=";", index=False)
+    second = update_profit_classifier(str(csv), model, **kwargs)
+    assert second["status"] == "updated" and second["skipped_backdated"] == 5
+
+    third = update_profit_classifier(str(csv), model, **kwargs)
+    assert third["status"] == "up_to_date" and third["skipped_backdated"] == 0
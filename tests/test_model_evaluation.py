@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from src.model_evaluation import cost_optimal_threshold, cv_folds
+
+def expected_cost(y, proba, t, cost_fp, cost_fn):
+    pred = proba >= t
+    return cost_fp * int((pred & (y == 0)).sum()) + cost_fn * int((~pred & (y == 1)).sum())
+
+@pytest.mark.parametrize("cost_fp,cost_fn", [(1.0, 1.0), (1.0, 3.0), (5.0, 1.0), (50.0, 1.0)])
+def test_cost_optimal_threshold_minimizes_expected_cost(cost_fp, cost_fn):
+    y = np.array([1, 0, 1, 1, 0, 0, 1, 0, 1, 0, 1, 1])
+    proba = np.array([0.95, 0.9, 0.8, 0.8, 0.7, 0.6, 0.55, 0.4, 0.4, 0.2, 0.1, 0.05])
+    res = cost_optimal_threshold(y, proba, cost_fp=cost_fp, cost_fn=cost_fn)
+    # Every cut between distinct probabilities, plus "all" and "none"
+    candidates = np.r_[np.unique(proba), 1.0 + 1e-9, 0.0]
+    best = min(expected_cost(y, proba, t, cost_fp, cost_fn) for t in candidates)
+    assert expected_cost(y, proba, res["threshold"], cost_fp, cost_fn) == best
+    assert res["cost"] == best
+    assert res["tp"] + res["fn"] == y.sum()
+
+def test_cost_optimal_threshold_can_flag_nothing():
+    y = np.array([0, 0, 1, 0])
+    proba = np.array([0.9, 0.8, 0.7, 0.1])
+    res = cost_optimal_threshold(y, proba, cost_fp=10.0, cost_fn=1.0)
+    assert (proba < res["threshold"]).all() and res["cost"] == 1.0
+
+def test_time_folds_validate_strictly_after_training():
+    rng = np.random.default_rng(0)
+    days = rng.integers(0, 60, 500).astype(float)
+    days[rng.choice(500, 20, replace=False)] = np.nan
+    y = rng.integers(0, 2, 500)
+    folds = cv_folds(y, scheme="time", n_splits=4, days=days)
+    assert len(folds) == 4
+    for train_idx, test_idx in folds:
+        assert len(train_idx) and len(test_idx)
+        assert days[train_idx].max() < days[test_idx].min()
+        assert not np.isnan(days[np.r_[train_idx, test_idx]]).any()
+    # Test blocks move forward in time and never overlap
+    for (_, earlier), (_, later) in zip(folds, folds[1:]):
+        assert days[earlier].max() < days[later].min()
+
+def test_time_folds_need_order_dates():
+    with pytest.raises(ValueError):
+        cv_folds(np.zeros(10), scheme="time")
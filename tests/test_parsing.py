@@ -0,0 +1,69 @@
+from pathlib import Path
+
+import pytest
+from pandas.testing import assert_frame_equal
+
+from src.data_preprocessing import read_superstore_csv
+
+ROOT = Path(__file__).resolve().parents[1]
+SHIPPED_CSV = ROOT / "data" / "raw" / "USSuperstoreData.csv"
+
+# Thousands separators, blank cells, padded values and dates the format guess can't cover
+EDGE_CASE_CSV = (
+    "Row ID;Order ID;Order Date;Ship Date;Ship Mode;Customer ID;Segment;Postal Code;Sub-Category;Sales;Quantity;Discount;Profit\n"
+    "1;CA-1;08/11/2016;11/11/2016;Second Class;CG-1;Consumer;05408;Bookcases;1.261,96;2;0;41,9136\n"
+    "2;CA-2;;;  Standard Class ;DV-2;Corporate;;Chairs;;;;\n"
+    "3;CA-3;2016-06-12;16/06/2016;Same Day;;Home Office;90036;Labels;14,62;2;0,2;-1.234,5\n"
+    "4;CA-4;31/02/2016;not a date;First Class;SO-4;Consumer;33311;Tables;957,5775;5;0,45;-383,031\n"
+    "5;CA-5;1/1/2017;03/01/2017;;BH-5;Consumer;28027;Phones;12.345.678,9;x;0,1;0\n"
+    "6;CA-1;08/11/2016;11/11/2016;Second Class;CG-1;Consumer;05408;Bookcases;1.261,96;2;0;41,9136\n"
+)
+
+@pytest.fixture
+def edge_case_csv(tmp_path):
+    path = tmp_path / "edge_cases.csv"
+    path.write_text(EDGE_CASE_CSV, encoding="latin1")
+    return path
+
+def _assert_engines_equal(path):
+    assert_frame_equal(read_superstore_csv(str(path)), read_superstore_csv(str(path), engine="fast"))
+
+@pytest.mark.skipif(not SHIPPED_CSV.exists(), reason="shipped dataset not present")
+def test_fast_engine_matches_pandas_on_shipped_file():
+    _assert_engines_equal(SHIPPED_CSV)
+
+def test_fast_engine_matches_pandas_on_edge_cases(edge_case_csv):
+    _assert_engines_equal(edge_case_csv)
+
+def test_edge_case_values(edge_case_csv):
+    df = read_superstore_csv(str(edge_case_csv), engine="fast")
+    assert df["Sales"].iloc[0] == 1261.96
+    assert df["Sales"].iloc[4] == 12345678.9
+    assert df["Profit"].iloc[2] == -1234.5
+    assert df["Sales"].isna().iloc[1] and df["Quantity"].isna().iloc[4]
+    assert df["Order Date"].iloc[0].strftime("%Y-%m-%d") == "2016-11-08"  # day first
+    assert df["Order Date"].isna().iloc[1] and df["Ship Date"].isna().iloc[3]
+    assert df["Ship Mode"].iloc[1] == "Standard Class"
+    assert df["Postal Code"].iloc[0] == "05408"
+
+@pytest.mark.skipif(not SHIPPED_CSV.exists(), reason="shipped dataset not present")
+@pytest.mark.parametrize("engine", ["pandas", "fast"])
+def test_no_date_format_warnings(engine, recwarn):
+    # dd/mm/yy dates have no pandas format guess; they used to fall back to dateutil per value
+    read_superstore_csv(str(SHIPPED_CSV), engine=engine)
+    assert not [w for w in recwarn if "infer format" in str(w.message)]
+
+def test_unparseable_first_date_does_not_warn(tmp_path, recwarn):
+    path = tmp_path / "odd_dates.csv"
+    path.write_text("Order Date;Sales\nsoon;1\n08/11/2016;2\n", encoding="latin1")
+    df = read_superstore_csv(str(path), engine="fast")
+    assert df["Order Date"].isna().iloc[0]
+    assert not [w for w in recwarn if "infer format" in str(w.message)]
+
+def test_na_tokens_are_missing_in_both_engines(tmp_path):
+    path = tmp_path / "na_tokens.csv"
+    path.write_text("Row ID;Ship Mode;Sales\n1;NULL;n/a\n2;#N/A;NA\n3;None;1,5\n4;Nada;nan\n", encoding="latin1")
+    _assert_engines_equal(path)
+    df = read_superstore_csv(str(path), engine="fast")
+    assert df["Ship Mode"].isna().tolist() == [True, True, True, False]
+    assert df["Sales"].isna().tolist() == [True, True, False, True]
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from conftest import SELECTIONS, reference_mask
+from src.rollup import RollupCube
+from src.visualization import MONTH_END, kpi_summary
+
+ORDER_TOLERANCE = 0.02  # HyperLogLog order counts: relative error allowed against nunique()
+
+def assert_orders_close(estimate, exact):
+    assert abs(estimate - exact) <= max(2, ORDER_TOLERANCE * exact)
+
+def by(df, col):
+    """Sales/Profit per `col` as the raw-row groupbys computed them, in a stable order."""
+    g = df.groupby(col, observed=True)[["Sales", "Profit"]].sum()
+    return g.rename(index=str).sort_index()
+
+@pytest.fixture(scope="module")
+def cube(superstore_frame):
+    return RollupCube(superstore_frame)
+
+@pytest.mark.parametrize("date_range,filters", SELECTIONS)
+def test_query_matches_raw_row_aggregates(superstore_frame, cube, date_range, filters):
+    sub = superstore_frame[reference_mask(superstore_frame, date_range, filters)]
+    view = cube.query(date_range, filters)
+
+    kpi, expected = view.kpi(), kpi_summary(sub)
+    assert np.isclose(kpi["total_sales"], expected["total_sales"])
+    assert np.isclose(kpi["total_profit"], expected["total_profit"])
+    assert np.isclose(kpi["profit_ratio"], expected["profit_ratio"], equal_nan=True)
+    assert_orders_close(kpi["n_orders"], expected["n_orders"])
+
+    assert_frame_equal(by(view.by_category(), "Category"), by(sub, "Category"), check_index_type=False)
+    subcat = view.by_subcategory().set_index("Sub-Category")
+    subcat.index = subcat.index.astype(str)
+    assert_frame_equal(subcat[["Sales", "Profit"]].sort_index(), by(sub, "Sub-Category"), check_index_type=False)
+    exact_orders = sub.groupby("Sub-Category", observed=True)["Order ID"].nunique().rename(index=str)
+    for name, exact in exact_orders.items():
+        assert_orders_close(subcat.at[name, "Orders"], exact)
+
+    monthly = view.monthly()
+    dated = sub.dropna(subset=["Order Date"])
+    if dated.empty:
+        assert monthly.empty
+    else:
+        ts = dated.set_index("Order Date").sort_index().resample(MONTH_END)[["Sales", "Profit"]].sum().reset_index()
+        assert_frame_equal(monthly.reset_index(drop=True), ts, check_dtype=False, check_freq=False)
+
+def test_where_matches_query_filters(cube):
+    narrowed = cube.query(("2022-03-15", "2023-02-10")).where({"Region": ["West"]})
+    direct = cube.query(("2022-03-15", "2023-02-10"), {"Region": ["West"]})
+    assert np.isclose(narrowed.kpi()["total_sales"], direct.kpi()["total_sales"])
+    assert sorted(narrowed.values_in("Category")) == sorted(direct.values_in("Category"))